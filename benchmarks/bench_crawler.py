@@ -0,0 +1,77 @@
+"""
+Repeated crawls of the same sources, as a crawl cycle every few minutes does: webcrawler.scrap called on every
+cycle, which opens and closes its client each time, against a single crawler.Crawler, whose connections are kept
+alive between cycles. The fixture servers speak HTTP/1.1 and count the connections they accept.
+
+After the first cycle every article is visited, so the next ones only request the homepages and categories.
+
+    python benchmarks/bench_crawler.py --cycles 5 --latency 0.02
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+sys.path.insert(0, HERE)
+
+from fixture_server import FixtureServer, make_corpus
+
+
+def run_cycles(corpus, args, crawl):
+    with FixtureServer(corpus, latency=args.latency, keep_alive=True) as server:
+        urls = list(server.urls.values())
+        cycles = []
+        for _ in range(args.cycles):
+            requests, connections = len(server.requests), len(server.connections)
+            start = time.perf_counter()
+            stats = crawl(urls)
+            cycles.append({"seconds": time.perf_counter() - start, "articles": stats.articles_processed,
+                           "requests": len(server.requests) - requests,
+                           "connections": len(server.connections) - connections})
+    return cycles
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sites", type=int, default=10)
+    parser.add_argument("--categories", type=int, default=8, help="Categories of each site")
+    parser.add_argument("--articles", type=int, default=10, help="Articles of each category")
+    parser.add_argument("--cycles", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.02, help="Seconds the servers wait before answering")
+    args = parser.parse_args()
+
+    from newscrawler.crawler import Crawler
+    from newscrawler.visited import MemoryVisitedStore
+    from newscrawler.webcrawler import scrap
+
+    def add_article(article):
+        pass
+
+    with tempfile.TemporaryDirectory() as corpus:
+        make_corpus(corpus, args.sites, args.categories, args.articles)
+        visited = MemoryVisitedStore()
+        results = {"scrap": run_cycles(corpus, args, lambda urls: scrap(urls, visited, add_article,
+                                                                         lean_extraction=True))}
+        visited = MemoryVisitedStore()
+        with Crawler(visited, add_article, lean_extraction=True) as crawler:
+            results["crawler"] = run_cycles(corpus, args, crawler.crawl)
+
+    for name, cycles in results.items():
+        print(name)
+        for index, cycle in enumerate(cycles):
+            print("  cycle %d: %.3fs, %d articles, %d requests, %d connections" % (
+                index, cycle["seconds"], cycle["articles"], cycle["requests"], cycle["connections"]))
+    later = {name: cycles[1:] for name, cycles in results.items()}
+    if all(later.values()):
+        for name, cycles in later.items():
+            print("%-8s after the first cycle: %.3fs and %.1f connections per cycle" % (
+                name, sum(c["seconds"] for c in cycles) / len(cycles),
+                sum(c["connections"] for c in cycles) / len(cycles)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,153 @@
+"""
+Benchmark of the near-duplicate detector (newscrawler.dedup).
+
+Index: random 64 bits fingerprints are added to the LSH index, then looked up as near-duplicates (up to
+max_distance flipped bits, they must all be found) and as unrelated fingerprints (false positives). Insertion and
+lookup throughput, and the memory used by the in memory index (traced on a separate build, as tracing slows it
+down), are reported. The SQLite index is measured on a smaller set by default.
+
+SimHash: synthetic articles and lightly edited copies of them (a few words changed, a byline added) are
+fingerprinted, to report its speed, the share of copies detected, the share of copies that would be detected with
+each max_distance, and the number of unrelated articles wrongly flagged.
+
+    python benchmarks/bench_dedup.py --fingerprints 1000000 --sqlite 100000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from newscrawler.dedup import Deduplicator, SimHashIndex, SQLiteSimHashIndex, hamming_distance
+
+WORDS = ("government minister economy market football election climate health science research city council "
+         "police court company workers school university hospital energy water river storm vote budget trade "
+         "prices rates bank strike talks summit league final coach player season record growth crisis").split()
+
+
+def flip_bits(rnd, fingerprint, bits):
+    for bit in rnd.sample(range(64), bits):
+        fingerprint ^= 1 << bit
+    return fingerprint
+
+
+def bench_index(index, fingerprints, max_distance, queries, rnd):
+    start = time.perf_counter()
+    for i, fingerprint in enumerate(fingerprints):
+        index.add(fingerprint, str(i))
+    add_time = time.perf_counter() - start
+
+    sample = rnd.sample(range(len(fingerprints)), min(queries, len(fingerprints)))
+    near = [(flip_bits(rnd, fingerprints[i], rnd.randint(0, max_distance)), str(i)) for i in sample]
+    start = time.perf_counter()
+    found = sum(1 for fingerprint, key in near if index.find(fingerprint) is not None)
+    near_time = time.perf_counter() - start
+
+    far = [rnd.getrandbits(64) for _ in range(len(sample))]
+    start = time.perf_counter()
+    false_positives = sum(1 for fingerprint in far if index.find(fingerprint) is not None)
+    far_time = time.perf_counter() - start
+    return {
+        "adds_per_s": len(fingerprints) / add_time,
+        "near_lookups_per_s": len(near) / near_time,
+        "far_lookups_per_s": len(far) / far_time,
+        "recall": found / len(near),
+        "false_positives": false_positives,
+        "queries": len(near),
+    }
+
+
+def make_text(rnd, words=600):
+    return " ".join(rnd.choice(WORDS) for _ in range(words))
+
+
+def edit_text(rnd, text, changes):
+    words = text.split()
+    for _ in range(changes):
+        words[rnd.randrange(len(words))] = rnd.choice(WORDS)
+    return "By Staff Reporter. " + " ".join(words) + " (Reuters)"
+
+
+def bench_simhash(articles, changes, max_distance, rnd):
+    originals = [{"url": "https://a.example.com/{}".format(i), "title": make_text(rnd, 10), "text": make_text(rnd)}
+                 for i in range(articles)]
+    copies = [{"url": "https://b.example.com/{}".format(i), "title": article["title"],
+               "text": edit_text(rnd, article["text"], changes)} for i, article in enumerate(originals)]
+    unrelated = [{"url": "https://c.example.com/{}".format(i), "title": make_text(rnd, 10), "text": make_text(rnd)}
+                 for i in range(articles)]
+
+    dedup = Deduplicator(max_distance=max_distance)
+    start = time.perf_counter()
+    for article in originals:
+        dedup.check(article)
+    fingerprint_time = time.perf_counter() - start
+    detected = sum(1 for article in copies if dedup.check(article) is not None)
+    false_positives = sum(1 for article in unrelated if dedup.check(article) is not None)
+    distances = [hamming_distance(dedup.fingerprint(a), dedup.fingerprint(b)) for a, b in zip(originals, copies)]
+    return {
+        "articles_per_s": articles / fingerprint_time,
+        "copies_detected": detected / articles,
+        "false_positives": false_positives,
+        "detected_by_distance": [sum(1 for d in distances if d <= k) / articles for k in range(9)],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--fingerprints", type=int, default=1000000, help="Fingerprints in the in memory index")
+    parser.add_argument("--sqlite", type=int, default=50000, help="Fingerprints in the SQLite index (0 to skip)")
+    parser.add_argument("--queries", type=int, default=20000)
+    parser.add_argument("--max-distance", type=int, default=3)
+    parser.add_argument("--articles", type=int, default=1000, help="Synthetic articles for the SimHash benchmark")
+    parser.add_argument("--changes", type=int, default=3, help="Words changed in every copy")
+    args = parser.parse_args()
+
+    rnd = random.Random(0)
+    failed = False
+
+    fingerprints = [rnd.getrandbits(64) for _ in range(args.fingerprints)]
+    index = SimHashIndex(args.max_distance, capacity=args.fingerprints)
+    result = bench_index(index, fingerprints, args.max_distance, args.queries, rnd)
+    del index
+    traced = min(len(fingerprints), 100000)
+    tracemalloc.start()
+    index = SimHashIndex(args.max_distance, capacity=traced)
+    for i, fingerprint in enumerate(fingerprints[:traced]):
+        index.add(fingerprint, str(i))
+    per_fingerprint = tracemalloc.get_traced_memory()[0] / max(1, traced)
+    tracemalloc.stop()
+    del index
+    print("memory index, {} fingerprints: {:.0f} adds/s, {:.0f} near / {:.0f} far lookups/s, recall {:.4f}, "
+          "{} false positives out of {}, ~{:.0f} MB ({:.0f} bytes per fingerprint and key)".format(
+              len(fingerprints), result["adds_per_s"], result["near_lookups_per_s"], result["far_lookups_per_s"],
+              result["recall"], result["false_positives"], result["queries"],
+              per_fingerprint * len(fingerprints) / 2 ** 20, per_fingerprint))
+    failed |= result["recall"] < 1
+
+    if args.sqlite:
+        with tempfile.TemporaryDirectory() as directory:
+            index = SQLiteSimHashIndex(os.path.join(directory, "dedup.sqlite"), args.max_distance)
+            result = bench_index(index, fingerprints[:args.sqlite], args.max_distance, args.queries, rnd)
+            size = os.path.getsize(os.path.join(directory, "dedup.sqlite"))
+            print("sqlite index, {} fingerprints: {:.0f} adds/s, {:.0f} near / {:.0f} far lookups/s, recall {:.4f}, "
+                  "{} false positives out of {}, {:.1f} MB on disk".format(
+                      len(index), result["adds_per_s"], result["near_lookups_per_s"], result["far_lookups_per_s"],
+                      result["recall"], result["false_positives"], result["queries"], size / 2 ** 20))
+            index.close()
+            failed |= result["recall"] < 1
+
+    result = bench_simhash(args.articles, args.changes, args.max_distance, rnd)
+    print("simhash, {} articles: {:.0f} articles/s, {:.1%} of the copies ({} words changed) detected, "
+          "{} false positives".format(args.articles, result["articles_per_s"], result["copies_detected"],
+                                      args.changes, result["false_positives"]))
+    print("copies detected by max_distance: " + ", ".join(
+        "{}: {:.1%}".format(k, share) for k, share in enumerate(result["detected_by_distance"])))
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
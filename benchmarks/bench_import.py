@@ -0,0 +1,64 @@
+"""
+Time of 'import newscrawler' in a fresh interpreter. It fails (exit status 1) if the median is over --max-ms, if
+the import loads any of the heavy dependencies, or if it adds handlers other than NullHandler to the logger.
+
+    python benchmarks/bench_import.py --runs 10 --max-ms 50
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY = ('newspaper', 'nltk', 'lxml', 'tldextract', 'aiohttp', 'requests', 'http_requests')
+
+PROBE = """
+import json, logging, sys, time
+start = time.perf_counter()
+import newscrawler
+elapsed = time.perf_counter() - start
+logger = logging.getLogger('newscrawler.config.logger')
+print(json.dumps({
+    "seconds": elapsed,
+    "heavy": sorted(m for m in %r if m in sys.modules),
+    "handlers": [type(h).__name__ for h in logger.handlers if not isinstance(h, logging.NullHandler)],
+}))
+""" % (HEAVY,)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--max-ms", type=float, default=50.0, help="Maximum median import time")
+    args = parser.parse_args()
+
+    env = dict(os.environ, PYTHONPATH=ROOT + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    results = []
+    for _ in range(args.runs):
+        out = subprocess.run([sys.executable, "-c", PROBE], env=env, cwd=ROOT, check=True,
+                             stdout=subprocess.PIPE, universal_newlines=True).stdout
+        results.append(json.loads(out.strip().splitlines()[-1]))
+
+    times = sorted(r["seconds"] * 1000 for r in results)
+    median = statistics.median(times)
+    heavy = sorted(set(m for r in results for m in r["heavy"]))
+    handlers = sorted(set(h for r in results for h in r["handlers"]))
+    print("import newscrawler: median {:.1f} ms, min {:.1f} ms, max {:.1f} ms ({} runs)".format(
+        median, times[0], times[-1], len(times)))
+
+    failures = []
+    if median > args.max_ms:
+        failures.append("median import time {:.1f} ms is over {:.1f} ms".format(median, args.max_ms))
+    if heavy:
+        failures.append("heavy modules imported: " + ", ".join(heavy))
+    if handlers:
+        failures.append("logging handlers added on import: " + ", ".join(handlers))
+    for failure in failures:
+        print("FAIL: " + failure)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
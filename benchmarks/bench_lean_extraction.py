@@ -0,0 +1,96 @@
+"""
+Compare the lean article extractor (parse_article(..., lean=True)) against the full newspaper.Article.parse path.
+Every field must be the same for every article; the script fails (exit status 1) otherwise.
+
+Articles are synthetic by default, in English and Spanish, with and without metadata, interleaved so a language
+left behind by the previous article would show up. Recorded pages can be added with --html-dir (*.html files).
+
+    python benchmarks/bench_lean_extraction.py --articles 300
+    python benchmarks/bench_lean_extraction.py --html-dir recorded/ --repeat 3
+"""
+import argparse
+import glob
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from newscrawler.parsing import parse_article
+
+WORDS = {
+    "en": ("government minister economy market football election climate health science research city council "
+           "police court company workers school university hospital energy water river the of and with").split(),
+    "es": ("gobierno ministro economia mercado futbol elecciones clima salud ciencia ciudad consejo policia "
+           "tribunal empresa trabajadores escuela universidad hospital energia agua rio el de la y con que").split(),
+}
+
+
+def make_article(rnd, index):
+    lang = rnd.choice(("en", "es"))
+    words = WORDS[lang]
+
+    def sentence(n=16):
+        return " ".join(rnd.choice(words) for _ in range(n)).capitalize() + "."
+
+    title = sentence(8)[:-1]
+    head = ["<title>{}</title>".format(title)]
+    if rnd.random() < 0.7:
+        head.append("<meta name=\"description\" content=\"{}\">".format(sentence(12).replace("'", "")))
+    if rnd.random() < 0.5:
+        head.append("<meta http-equiv=\"content-language\" content=\"{}\">".format(lang))
+    date = "20%02d-%02d-%02d" % (rnd.randint(15, 24), rnd.randint(1, 12), rnd.randint(1, 28))
+    if rnd.random() < 0.6:
+        head.append("<meta property=\"article:published_time\" content=\"{}T10:00:00\">".format(date))
+    body = "".join("<p>{}</p>".format(" ".join(sentence() for _ in range(rnd.randint(2, 5))))
+                   for _ in range(rnd.randint(3, 12)))
+    if rnd.random() < 0.3:
+        body = "<div class=\"sidebar\"><ul><li><a href=\"/x\">{}</a></li></ul></div>".format(sentence(5)) + body
+    url = "https://www.example-news.com/{}/{}/story-{}.html".format(
+        rnd.choice(("world", "sport", "politica")), date.replace("-", "/") if rnd.random() < 0.5 else "news", index)
+    html = "<html><head>{}</head><body><h1>{}</h1><article>{}</article></body></html>".format(
+        "".join(head), title, body)
+    return url, html
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--articles", type=int, default=300, help="Number of synthetic articles")
+    parser.add_argument("--html-dir", help="Directory of recorded article pages")
+    parser.add_argument("--repeat", type=int, default=1)
+    args = parser.parse_args()
+
+    rnd = random.Random(0)
+    corpus = [make_article(rnd, i) for i in range(args.articles)]
+    if args.html_dir:
+        for path in sorted(glob.glob(os.path.join(args.html_dir, "*.html"))):
+            with open(path, encoding="utf-8", errors="replace") as f:
+                corpus.append(("https://recorded.example.com/" + os.path.basename(path), f.read()))
+    source = "https://www.example-news.com/"
+
+    timings = {}
+    results = {}
+    for lean in (False, True):
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            results[lean] = [parse_article(url, html, source, lean=lean) for url, html in corpus]
+        timings[lean] = time.perf_counter() - start
+
+    mismatches = 0
+    for (url, _), full, lean in zip(corpus, results[False], results[True]):
+        for field in full:
+            if full[field] != lean[field]:
+                mismatches += 1
+                print("MISMATCH {} {}: {!r} != {!r}".format(url, field, full[field][:80], lean[field][:80]))
+
+    total = len(corpus) * args.repeat
+    print("articles: {}, field mismatches: {}".format(len(corpus), mismatches))
+    print("full newspaper parse: {:.3f}s ({:.0f} articles/s)".format(timings[False], total / timings[False]))
+    print("lean extraction:      {:.3f}s ({:.0f} articles/s), {:.2f}x faster".format(
+        timings[True], total / timings[True], timings[False] / timings[True]))
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Compare the links of category pages found as categories_to_articles used to do, building their DOM with
+newspaper's parser and calling extractor.get_urls, against url_utilities.page_links, which streams the pages
+through lxml's parser. Both must find the same links, and classify them the same way.
+
+The pages are synthetic category pages of --size bytes, with the links of bench_url_classifier's corpus among
+markup that is easy to get wrong: uppercase tags, entities, unclosed anchors, anchors without href, hrefs of
+other tags and links inside comments and scripts.
+
+    python benchmarks/bench_link_extraction.py --pages 50 --size 300000
+"""
+import argparse
+import html
+import os
+import random
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+sys.path.insert(0, HERE)
+
+from bench_url_classifier import SOURCE, WORDS, make_corpus
+from newscrawler.url_utilities import URLClassifier, page_links
+
+NOISE = [
+    '<div class="teaser"><p>{text}</p></div>',
+    '<A HREF="{link}" class="headline">{text}</A>',
+    '<a href="{link}"><img src="/img/{word}.jpg" alt="{text}"></a>',
+    '<li><a href=\'{link}\'>{text}</li>',
+    '<a name="{word}">{text}</a>',
+    '<a href="">{text}</a>',
+    '<link rel="alternate" href="/{word}/feed.xml">',
+    '<area href="/{word}/map.html">',
+    '<!-- <a href="/{word}/commented-out.html">old</a> -->',
+    '<script>var tpl = \'<a href="/{word}/in-script.html">\' + "{text}";</script>',
+    '<span>{text} &amp; {word} &eacute;&#233;</span>',
+    '<a href="{link}?page=2&amp;s={word}">{text}</a>',
+]
+
+
+def make_page(rnd, links, size):
+    parts = ['<!DOCTYPE html>\n<html><head><meta charset="utf-8"><title>%s</title>' % rnd.choice(WORDS),
+             '<style>body { font-family: sans-serif; }</style></head><body><nav>']
+    length = sum(len(part) for part in parts)
+    while length < size:
+        template = rnd.choice(NOISE)
+        part = template.format(link=html.escape(rnd.choice(links)), word=rnd.choice(WORDS),
+                               text=" ".join(rnd.choice(WORDS) for _ in range(rnd.randint(2, 12))))
+        parts.append(part)
+        length += len(part)
+    parts.append('</nav></body></html>')
+    return "\n".join(parts)
+
+
+def dom_links(extractor, parser, page):
+    return extractor.get_urls(parser.fromstring(page))
+
+
+def resident_memory():
+    """
+    Resident memory of the process, in bytes (Linux only, None elsewhere). tracemalloc does not see the memory of
+    lxml trees, as libxml2 allocates it
+    """
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return None
+
+
+def main():
+    argparser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    argparser.add_argument("--pages", type=int, default=50)
+    argparser.add_argument("--size", type=int, default=300000, help="Bytes of each page")
+    args = argparser.parse_args()
+
+    from newspaper.extractors import ContentExtractor
+    from newspaper.parsers import Parser
+    from newscrawler.config import construct_config
+
+    extractor = ContentExtractor(construct_config())
+    rnd = random.Random(0)
+    links = make_corpus(20000)
+    pages = [make_page(rnd, links, args.size) for _ in range(args.pages)]
+    classifier = URLClassifier(parent_url=SOURCE, same_domain=True)
+
+    mismatches = 0
+    for page in pages:
+        expected = dom_links(extractor, Parser, page)
+        got = page_links(page)
+        if got != expected:
+            mismatches += 1
+            print("MISMATCH: %d links from the DOM, %d streamed" % (len(expected), len(got)))
+        elif [u for u in classifier.classify(expected) if u] != page_links(page, classifier):
+            mismatches += 1
+            print("MISMATCH in the classified links")
+
+    timings = {}
+    for name, extract in (("dom", lambda page: dom_links(extractor, Parser, page)), ("streaming", page_links)):
+        start = time.perf_counter()
+        found = sum(len(extract(page)) for page in pages)
+        timings[name] = time.perf_counter() - start
+        print("%-10s %.3fs (%.1f ms/page), %d links" % (name, timings[name], 1000 * timings[name] / len(pages), found))
+    start = time.perf_counter()
+    found = sum(len(page_links(page, classifier)) for page in pages)
+    print("streaming and classifying: %.3fs, %d article links" % (time.perf_counter() - start, found))
+
+    # categories_to_articles used to need the DOMs of all the categories of a source at once
+    before = resident_memory()
+    docs = [Parser.fromstring(page) for page in pages]
+    if before is not None:
+        print("DOMs of the %d pages: %.1f MB resident, none while streaming" % (
+            len(docs), (resident_memory() - before) / 1024 / 1024))
+    print("pages: %d, mismatches: %d, speedup: %.1fx" % (len(pages), mismatches, timings["dom"] / timings["streaming"]))
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
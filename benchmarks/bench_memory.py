@@ -0,0 +1,128 @@
+"""
+Memory profile of a crawl, traced with tracemalloc, with and without a memory budget (scrap(memory_budget=...)).
+
+A synthetic corpus of --articles articles, padded to --padding bytes per page as real pages are, is crawled once
+in each mode, each one in its own process (the fixture server runs in another one, so only the crawler is
+traced). The traced memory is sampled every --sample-every delivered articles. The budgeted crawl must keep a
+flat profile: the script fails (exit status 1) if its memory at the end of the crawl is more than --max-growth
+above the one after the first tenth of the articles, or if its peak is not below the one of the unbounded crawl.
+tests/test_memory.py checks a small crawl against a bound on the peak memory per article.
+
+    python benchmarks/bench_memory.py --articles 10000 --padding 200000 --budget-mb 16
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+sys.path.insert(0, HERE)
+
+from fixture_server import FixtureServer, make_corpus
+
+MB = 1024 * 1024
+
+
+def _serve(corpus, urls, stop):
+    with FixtureServer(corpus) as server:
+        urls.put(list(server.urls.values()))
+        stop.wait()
+
+
+def _crawl(urls, budget_mb, concurrency, lean, sample_every, results):
+    from newscrawler.memory import MemoryBudget
+    from newscrawler.visited import MemoryVisitedStore
+    from newscrawler.webcrawler import scrap
+
+    budget = MemoryBudget(budget_mb * MB) if budget_mb else None
+    samples = []
+    delivered = [0]
+
+    def add_article(article):
+        delivered[0] += 1
+        if delivered[0] % sample_every == 0:
+            samples.append((delivered[0], tracemalloc.get_traced_memory()[0]))
+
+    # Modules are imported before tracing starts, so only the crawl is measured
+    tracemalloc.start()
+    start = time.perf_counter()
+    stats = scrap(urls, MemoryVisitedStore(), add_article, concurrency=concurrency, lean_extraction=lean,
+                  memory_budget=budget)
+    seconds = time.perf_counter() - start
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    results.put({
+        "articles": delivered[0],
+        "seconds": seconds,
+        "samples": samples,
+        "current": current,
+        "peak": peak,
+        "budget_max_used": budget.max_used if budget is not None else None,
+        "errors": dict(stats.errors),
+    })
+
+
+def run_crawl(context, urls, budget_mb, args):
+    results = context.Queue()
+    process = context.Process(target=_crawl, args=(urls, budget_mb, args.concurrency, not args.full,
+                                                   args.sample_every, results))
+    process.start()
+    result = results.get()
+    process.join()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--articles", type=int, default=10000)
+    parser.add_argument("--sites", type=int, default=10)
+    parser.add_argument("--categories", type=int, default=10, help="Categories of each site")
+    parser.add_argument("--padding", type=int, default=200000, help="Bytes of script in every article page")
+    parser.add_argument("--budget-mb", type=int, default=16)
+    parser.add_argument("--concurrency", type=int, default=None)
+    parser.add_argument("--sample-every", type=int, default=250)
+    parser.add_argument("--max-growth", type=float, default=0.2, help="Maximum growth of the budgeted crawl")
+    parser.add_argument("--full", action="store_true", help="Full newspaper parse instead of lean extraction")
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context("spawn")
+    with tempfile.TemporaryDirectory() as corpus:
+        per_category = max(1, args.articles // (args.sites * args.categories))
+        make_corpus(corpus, args.sites, args.categories, per_category, page_padding=args.padding)
+        urls_queue, stop = context.Queue(), context.Event()
+        server = context.Process(target=_serve, args=(corpus, urls_queue, stop), daemon=True)
+        server.start()
+        urls = urls_queue.get()
+        try:
+            results = {"unbounded": run_crawl(context, urls, 0, args),
+                       "budget": run_crawl(context, urls, args.budget_mb, args)}
+        finally:
+            stop.set()
+            server.join()
+
+    failed = False
+    for name, result in results.items():
+        samples = result["samples"]
+        print("{:<10} {} articles in {:.1f}s, traced memory peak {:.1f} MB, at the end {:.1f} MB{}".format(
+            name, result["articles"], result["seconds"], result["peak"] / MB, result["current"] / MB,
+            ", budget max used {:.1f} MB".format(result["budget_max_used"] / MB)
+            if result["budget_max_used"] is not None else ""))
+        print("           " + " ".join("{}:{:.1f}".format(n, m / MB) for n, m in samples))
+        if result["errors"]:
+            print("           errors: {}".format(result["errors"]))
+    samples = results["budget"]["samples"]
+    if len(samples) >= 2:
+        first = samples[max(0, len(samples) // 10 - 1)][1]
+        growth = (samples[-1][1] - first) / first
+        print("budgeted crawl memory growth: {:+.1%}".format(growth))
+        failed |= growth > args.max_growth
+    failed |= results["budget"]["peak"] >= results["unbounded"]["peak"]
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
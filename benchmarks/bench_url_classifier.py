@@ -0,0 +1,90 @@
+"""
+Compare valid_url, called link by link as categories_to_articles used to do, against URLClassifier.classify over
+a synthetic corpus of category page links. Both must give the same results.
+
+    python benchmarks/bench_url_classifier.py --links 100000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from newscrawler.url_utilities import URLClassifier, extract_domain, valid_url
+
+SOURCE = "https://www.example-news.com/"
+HOSTS = ["www.example-news.com", "sports.example-news.com", "www.example-news.com", "cdn.other-site.org",
+         "www.facebook.com", "careers.example-news.com", "www.example-news.co.uk"]
+WORDS = ["world", "politics", "economy", "sport", "culture", "news", "story", "index", "about", "video",
+         "climate", "health", "science", "tech", "elections", "market", "football", "opinion", "media", "local"]
+EXTENSIONS = ["", "", "", ".html", ".htm", ".jpg", ".pdf", ".aspx", ".mp4", ".longextension"]
+
+
+class _Category(object):
+    def __init__(self, url):
+        self.url = url
+
+
+def make_corpus(size, seed=0):
+    rnd = random.Random(seed)
+    links = []
+    for _ in range(size):
+        kind = rnd.random()
+        chunks = [rnd.choice(WORDS) for _ in range(rnd.randint(0, 4))]
+        if rnd.random() < 0.3:
+            chunks.insert(rnd.randint(0, len(chunks)), "%d/%02d/%02d" % (rnd.randint(1995, 2024), rnd.randint(1, 12),
+                                                                        rnd.randint(1, 28)))
+        if rnd.random() < 0.3:
+            chunks.append("-".join(rnd.choice(WORDS) for _ in range(rnd.randint(3, 9))))
+        path = "/" + "/".join(chunks) + rnd.choice(EXTENSIONS)
+        if rnd.random() < 0.2:
+            path += "/"
+        if rnd.random() < 0.1:
+            path += "#comments"
+        if kind < 0.35:
+            links.append(path)
+        elif kind < 0.4:
+            links.append(path.lstrip("/"))
+        elif kind < 0.45:
+            links.append(rnd.choice(["mailto:desk@example-news.com", "javascript:void(0)", "", "#top", "//x.co/a"]))
+        else:
+            links.append(rnd.choice(["http://", "https://"]) + rnd.choice(HOSTS) + path)
+    return links
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--links", type=int, default=100000)
+    parser.add_argument("--categories", type=int, default=60)
+    args = parser.parse_args()
+
+    links = make_corpus(args.links)
+    categories = [_Category(SOURCE + word + "/") for word in WORDS] + \
+                 [_Category(SOURCE + "section-%d/" % i) for i in range(args.categories - len(WORDS))]
+
+    start = time.perf_counter()
+    expected = [valid_url(link, parent_url=SOURCE, same_domain=True, mag_categories=categories) for link in links]
+    legacy = time.perf_counter() - start
+
+    extract_domain.cache_clear()
+    start = time.perf_counter()
+    classifier = URLClassifier(parent_url=SOURCE, same_domain=True, mag_categories=categories)
+    got = classifier.classify(links)
+    batch = time.perf_counter() - start
+
+    mismatches = [(link, e, g) for link, e, g in zip(links, expected, got) if e != g]
+    for link, e, g in mismatches[:10]:
+        print("MISMATCH %r: valid_url=%r classify=%r" % (link, e, g))
+
+    accepted = sum(1 for r in got if r)
+    print("links: %d, accepted: %d, mismatches: %d" % (len(links), accepted, len(mismatches)))
+    print("valid_url:  %.3fs (%.0f links/s)" % (legacy, len(links) / legacy))
+    print("classify:   %.3fs (%.0f links/s)" % (batch, len(links) / batch))
+    print("speedup:    %.1fx" % (legacy / batch))
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
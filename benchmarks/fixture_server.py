@@ -0,0 +1,172 @@
+"""
+Local news server for the benchmarks. It serves a recorded corpus of news sites from a directory, one site per
+port, with a configurable latency per request.
+
+The corpus layout is <corpus>/<site>/<path>, where a path ending in '/' is served from its 'index.html'.
+make_corpus writes a synthetic corpus with that layout; recorded sites can be added next to its ones.
+"""
+import functools
+import os
+import random
+import threading
+import time
+
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+WORDS = ("government minister economy market football election climate health science research city council "
+         "police court company workers school university hospital energy water river festival music film "
+         "report plan budget tax trade talks summit storm season league coach players fans").split()
+
+
+def _sentence(rnd, words=18):
+    return " ".join(rnd.choice(WORDS) for _ in range(words)).capitalize() + "."
+
+
+def _article_page(rnd, title, date, padding=0):
+    paragraphs = "".join("<p>%s</p>" % " ".join(_sentence(rnd) for _ in range(4)) for _ in range(rnd.randint(5, 12)))
+    # Real pages carry much more markup and scripts than text
+    script = "<script>var state = \"{}\";</script>".format("x" * padding) if padding else ""
+    return (
+        "<html><head><title>{title}</title>{script}"
+        "<meta name=\"description\" content=\"{description}\">"
+        "<meta property=\"article:published_time\" content=\"{date}T08:00:00\"></head>"
+        "<body><div class=\"menu\"><a href=\"/\">Home</a></div>"
+        "<article><h1>{title}</h1>{paragraphs}</article>"
+        "<footer><a href=\"/about/\">About</a> <a href=\"/contact/\">Contact</a></footer></body></html>"
+    ).format(title=title, script=script, description=_sentence(rnd, 12), date=date, paragraphs=paragraphs)
+
+
+def _listing_page(title, links, head=""):
+    anchors = "".join("<li><a href=\"{0}\">{1}</a></li>".format(href, text) for href, text in links)
+    return "<html><head><title>{0}</title>{2}</head><body><h1>{0}</h1><ul>{1}</ul></body></html>".format(
+        title, anchors, head)
+
+
+def _rss(title, links):
+    items = "".join("<item><title>{1}</title><link>{0}</link></item>".format(href, text) for href, text in links)
+    return ("<?xml version=\"1.0\" encoding=\"UTF-8\"?><rss version=\"2.0\"><channel><title>{0}</title>{1}"
+            "</channel></rss>").format(title, items)
+
+
+def _news_sitemap(links):
+    urls = "".join("<url><loc>{0}</loc></url>".format(href) for href, _ in links)
+    return ("<?xml version=\"1.0\" encoding=\"UTF-8\"?>"
+            "<urlset xmlns=\"http://www.sitemaps.org/schemas/sitemap/0.9\">{0}</urlset>").format(urls)
+
+
+def _write(path, content):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(content)
+
+
+def make_corpus(directory, sites=5, categories=4, articles=30, seed=0, feeds=False, page_padding=0):
+    """
+    Write a synthetic corpus of news sites
+    Args:
+        directory: Corpus directory
+        sites: Number of sites
+        categories: Number of category pages of each site
+        articles: Number of articles linked from each category page
+        feeds: Give each site an RSS feed, declared in its homepage, and a news sitemap, declared in its
+               robots.txt, with the first articles of each category
+        page_padding: Bytes of script added to every article page
+
+    Returns: List of site names
+
+    """
+    rnd = random.Random(seed)
+    names = []
+    for s in range(sites):
+        name = "site%02d" % s
+        names.append(name)
+        root = os.path.join(directory, name)
+        home_links = []
+        feed_links = []
+        for c in range(categories):
+            category = "%s-%d" % (rnd.choice(WORDS), c)
+            home_links.append(("/%s/" % category, category.capitalize()))
+            links = []
+            for a in range(articles):
+                date = "20%02d-%02d-%02d" % (rnd.randint(15, 24), rnd.randint(1, 12), rnd.randint(1, 28))
+                slug = "-".join(rnd.choice(WORDS) for _ in range(6)) + "-%d-%d" % (c, a)
+                path = "/%s/%s/%s.html" % (category, date.replace("-", "/"), slug)
+                title = slug.replace("-", " ").capitalize()
+                links.append((path, title))
+                _write(root + path, _article_page(rnd, title, date, page_padding))
+            _write(os.path.join(root, category, "index.html"), _listing_page(category, links))
+            home_links.extend(links[:3])
+            feed_links.extend(links[:articles // 2])
+        head = ""
+        if feeds:
+            head = "<link rel=\"alternate\" type=\"application/rss+xml\" href=\"/feed.xml\">"
+            half = len(feed_links) // 2
+            _write(os.path.join(root, "feed.xml"), _rss(name, feed_links[:half]))
+            _write(os.path.join(root, "sitemap-news.xml"), _news_sitemap(feed_links[half:]))
+            _write(os.path.join(root, "robots.txt"), "User-agent: *\nSitemap: /sitemap-news.xml\n")
+        _write(os.path.join(root, "index.html"), _listing_page(name, home_links, head))
+    return names
+
+
+class _Handler(SimpleHTTPRequestHandler):
+    def setup(self):
+        SimpleHTTPRequestHandler.setup(self)
+        self.server.connections.append((time.time(), self.server.site))
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_head(self):
+        self.server.requests.append((time.time(), self.server.site, self.path))
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        return SimpleHTTPRequestHandler.send_head(self)
+
+
+class _KeepAliveHandler(_Handler):
+    protocol_version = "HTTP/1.1"
+
+
+class FixtureServer(object):
+    """
+    One threaded HTTP server for each site of a corpus, listening on 127.0.0.1.
+    Requests are recorded in 'requests', and the connections accepted in 'connections'. With keep_alive, the
+    servers speak HTTP/1.1 and keep connections open between requests
+    """
+
+    def __init__(self, corpus, latency=0.0, keep_alive=False):
+        self.corpus = corpus
+        self.latency = latency
+        self.keep_alive = keep_alive
+        self.requests = []
+        self.connections = []
+        self._servers = []
+        self.urls = {}
+
+    def start(self):
+        for site in sorted(os.listdir(self.corpus)):
+            if not os.path.isdir(os.path.join(self.corpus, site)):
+                continue
+            handler = _KeepAliveHandler if self.keep_alive else _Handler
+            server = ThreadingHTTPServer(("127.0.0.1", 0),
+                                         functools.partial(handler, directory=os.path.join(self.corpus, site)))
+            server.daemon_threads = True
+            server.site = site
+            server.latency = self.latency
+            server.requests = self.requests
+            server.connections = self.connections
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            self._servers.append(server)
+            self.urls[site] = "http://127.0.0.1:%d/" % server.server_address[1]
+        return self
+
+    def stop(self):
+        for server in self._servers:
+            server.shutdown()
+            server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -0,0 +1,340 @@
+"""
+Offline benchmark suite. Crawls a corpus served by a local fixture server (see fixture_server.py), so results do
+not depend on the network, and writes the results to a JSON file that can be compared with a previous run.
+
+Every scenario runs in its own process, so peak RSS and CPU time (which include the fixture server threads and
+the parse workers) are its own:
+
+    scrap                  webcrawler.scrap over all the sites: articles/s and latency from request to sink
+    scrap_parallel         parallel.scrap_parallel over all the sites, with --workers processes
+    source_current_state   webcrawler.source_current_state for each site
+    survey_sources         webcrawler.survey_sources over all the sites at once
+    classify               categories_to_articles over the category pages of each site, and valid_url link by link
+    filter_articles        url_utilities.filter_articles with a visited links function and a VisitedStore
+
+    python benchmarks/run_benchmarks.py --latency 0.05 --output results.json
+    python benchmarks/run_benchmarks.py --compare results.json
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+import traceback
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+sys.path.insert(0, HERE)
+
+from fixture_server import FixtureServer, make_corpus
+
+SCENARIOS = ('scrap', 'scrap_parallel', 'source_current_state', 'survey_sources', 'classify', 'filter_articles')
+# Metrics shown by --compare, and whether a bigger value is better
+COMPARED = (('articles_per_second', True), ('links_per_second', True), ('urls_per_second', True),
+            ('latency_p50', False), ('latency_p99', False), ('cpu_seconds', False), ('peak_rss_mb', False))
+
+
+def percentiles(values, points=(50, 90, 99)):
+    """
+    Nearest rank percentiles of 'values', plus their maximum
+    """
+    if not values:
+        return {}
+    values = sorted(values)
+    result = {"latency_p%d" % p: values[min(len(values) - 1, max(0, int(round(p / 100.0 * len(values))) - 1))]
+              for p in points}
+    result["latency_max"] = values[-1]
+    return result
+
+
+def _magazines(server):
+    """
+    newspaper Sources of the fixture sites, with their categories downloaded and parsed, as _define_magazine does
+    """
+    import newspaper
+    from newspaper.source import Category
+    from newscrawler.config import construct_config
+
+    magazines = []
+    for url in server.urls.values():
+        magazine = newspaper.build(url, dry=True, config=construct_config())
+        magazine.download()
+        magazine.parse()
+        magazine.set_categories()
+        if url not in [c.url for c in magazine.categories]:
+            magazine.categories.append(Category(url=url))
+        magazine.download_categories()
+        magazine.parse_categories()
+        magazines.append(magazine)
+    return magazines
+
+
+def bench_scrap(server, options):
+    from newscrawler import scrap
+    from newscrawler.feeds import FeedStore
+
+    feeds = None
+    if options["feeds"]:
+        # Feeds are found, and categories walked, on the first crawl. The measured one only reads the feeds
+        feeds = FeedStore()
+        scrap(list(server.urls.values()), {}.get, lambda article: None, feeds=feeds)
+        del server.requests[:]
+    return _crawl_results(server, lambda urls, add_article: scrap(
+        urls, {}.get, add_article, concurrency=options["concurrency"],
+        concurrency_per_host=options["concurrency_per_host"], parse_executor=options["parse_executor"],
+        feeds=feeds))
+
+
+def bench_scrap_parallel(server, options):
+    from newscrawler import scrap_parallel
+
+    result = _crawl_results(server, lambda urls, add_article: scrap_parallel(
+        urls, {}.get, add_article, workers=options["workers"], concurrency=options["concurrency"],
+        concurrency_per_host=options["concurrency_per_host"]))
+    result["workers"] = options["workers"] or os.cpu_count()
+    return result
+
+
+def _crawl_results(server, crawl):
+    delivered = {}
+
+    def add_article(article):
+        delivered[article["url"]] = time.time()
+
+    stats = crawl(list(server.urls.values()), add_article)
+    requested = {}
+    for when, site, path in server.requests:
+        requested.setdefault(server.urls[site] + path.lstrip("/"), when)
+    latencies = [when - requested[url] for url, when in delivered.items() if url in requested]
+
+    result = {
+        "articles": len(delivered),
+        "seconds": stats.elapsed,
+        "articles_per_second": len(delivered) / stats.elapsed if stats.elapsed else 0,
+        "requests": stats.requests,
+        "failed_requests": stats.failed_requests,
+        "bytes_downloaded": stats.bytes_downloaded,
+        "stage_seconds": {stage: s.seconds for stage, s in stats.stages.items()},
+    }
+    result.update(percentiles(latencies))
+    return result
+
+
+def bench_source_current_state(server, options):
+    from newscrawler.webcrawler import source_current_state
+
+    durations = []
+    links = 0
+    start = time.perf_counter()
+    for url in server.urls.values():
+        t = time.perf_counter()
+        state = source_current_state(url, None)
+        durations.append(time.perf_counter() - t)
+        links += len(state[1]) if state else 0
+    seconds = time.perf_counter() - start
+    result = {"sources": len(durations), "links": links, "seconds": seconds}
+    result.update(percentiles(durations))
+    return result
+
+
+def bench_survey_sources(server, options):
+    import asyncio
+
+    from newscrawler.webcrawler import survey_sources
+
+    async def survey():
+        return [result async for result in survey_sources(
+            list(server.urls.values()), concurrency=options["concurrency"],
+            concurrency_per_host=options["concurrency_per_host"])]
+
+    start = time.perf_counter()
+    results = asyncio.new_event_loop().run_until_complete(survey())
+    seconds = time.perf_counter() - start
+    result = {
+        "sources": len(results),
+        "links": sum(len(r["article_urls"]) for r in results),
+        "failed": sum(1 for r in results if r["error"] is not None),
+        "seconds": seconds,
+    }
+    result.update(percentiles([r["seconds"] for r in results]))
+    return result
+
+
+def bench_classify(server, options):
+    from newscrawler.config import categories_to_articles
+    from newscrawler.url_utilities import valid_url
+
+    magazines = _magazines(server)
+    durations = []
+    links = 0
+    start = time.perf_counter()
+    for _ in range(options["repeat"]):
+        for magazine in magazines:
+            t = time.perf_counter()
+            links += len(categories_to_articles(magazine))
+            durations.append(time.perf_counter() - t)
+    seconds = time.perf_counter() - start
+
+    candidates = 0
+    valid_url_start = time.perf_counter()
+    for _ in range(options["repeat"]):
+        for magazine in magazines:
+            for category in magazine.categories:
+                for link in magazine.extractor.get_urls(category.doc):
+                    candidates += 1
+                    valid_url(link, parent_url=magazine.url, same_domain=True,
+                              mag_categories=magazine.categories)
+    valid_url_seconds = time.perf_counter() - valid_url_start
+
+    result = {
+        "articles": links,
+        "seconds": seconds,
+        "links_per_second": candidates / seconds if seconds else 0,
+        "valid_url_seconds": valid_url_seconds,
+        "valid_url_links_per_second": candidates / valid_url_seconds if valid_url_seconds else 0,
+    }
+    result.update(percentiles(durations))
+    return result
+
+
+def bench_filter_articles(server, options):
+    from newscrawler.config import category_articles
+    from newscrawler.url_utilities import filter_articles
+    from newscrawler.visited import MemoryVisitedStore
+
+    sources = {}
+    for magazine in _magazines(server):
+        links = set()
+        for category_links in category_articles(magazine).values():
+            links.update(category_links)
+        sources[magazine.url] = sorted(links)
+
+    visited = {url: links[::2] for url, links in sources.items()}
+    store = MemoryVisitedStore()
+    for url, links in visited.items():
+        store.add(url, links)
+
+    result = {}
+    for name, get_visited in (("function", lambda url: visited[url]), ("store", store)):
+        durations = []
+        urls = 0
+        start = time.perf_counter()
+        for _ in range(options["repeat"]):
+            for url, links in sources.items():
+                t = time.perf_counter()
+                filter_articles(url, links, get_visited)
+                durations.append(time.perf_counter() - t)
+                urls += len(links)
+        seconds = time.perf_counter() - start
+        result[name] = dict(urls=urls, seconds=seconds, urls_per_second=urls / seconds if seconds else 0,
+                            **percentiles(durations))
+    result.update(result["store"])
+    return result
+
+
+def run_scenario(name, corpus, options):
+    """
+    Run a benchmark scenario against a fixture server, adding its CPU time and peak RSS to its results
+    """
+    with FixtureServer(corpus, latency=options["latency"]) as server:
+        before = resource.getrusage(resource.RUSAGE_SELF)
+        result = globals()["bench_" + name](server, options)
+        after = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    result["cpu_seconds"] = (after.ru_utime - before.ru_utime + after.ru_stime - before.ru_stime
+                             + children.ru_utime + children.ru_stime)
+    # ru_maxrss is in kilobytes on Linux, bytes on macOS
+    scale = 1024.0 * 1024.0 if sys.platform == "darwin" else 1024.0
+    result["peak_rss_mb"] = max(after.ru_maxrss, children.ru_maxrss) / scale
+    return result
+
+
+def _scenario_process(name, corpus, options, results):
+    try:
+        results.put((True, run_scenario(name, corpus, options)))
+    except BaseException:
+        results.put((False, traceback.format_exc()))
+
+
+def compare(previous, current):
+    for name, result in current["scenarios"].items():
+        old = previous.get("scenarios", {}).get(name)
+        if not old:
+            continue
+        print(name)
+        for metric, bigger_is_better in COMPARED:
+            if metric in result and old.get(metric):
+                change = (result[metric] - old[metric]) / old[metric] * 100
+                better = (change > 0) == bigger_is_better
+                print("  {:<22}{:>14.4f}{:>14.4f}{:>+9.1f}%{}".format(
+                    metric, old[metric], result[metric], change, "" if abs(change) < 5 or better else "  <--"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", help="Corpus directory. A synthetic one is generated if it is not given")
+    parser.add_argument("--sites", type=int, default=5)
+    parser.add_argument("--categories", type=int, default=4)
+    parser.add_argument("--articles", type=int, default=30, help="Articles linked from each category page")
+    parser.add_argument("--latency", type=float, default=0.02, help="Seconds the server waits on every request")
+    parser.add_argument("--concurrency", type=int, default=None)
+    parser.add_argument("--concurrency-per-host", type=int, default=None)
+    parser.add_argument("--parse-executor", choices=("process", "thread"), default=None)
+    parser.add_argument("--workers", type=int, default=None, help="Processes of scrap_parallel, one per CPU core "
+                                                                   "by default")
+    parser.add_argument("--feeds", action="store_true", help="Give the synthetic sites RSS feeds and news "
+                                                              "sitemaps, and crawl them with feeds=True")
+    parser.add_argument("--repeat", type=int, default=20, help="Repetitions of the classify and filter scenarios")
+    parser.add_argument("--scenario", action="append", choices=SCENARIOS,
+                        help="Scenario to run, can be repeated. All of them by default")
+    parser.add_argument("--output", default="benchmark-results.json")
+    parser.add_argument("--compare", help="JSON file of a previous run to compare the results with")
+    args = parser.parse_args()
+
+    options = {"latency": args.latency, "concurrency": args.concurrency,
+               "concurrency_per_host": args.concurrency_per_host, "parse_executor": args.parse_executor,
+               "workers": args.workers, "feeds": args.feeds, "repeat": args.repeat}
+    results = {
+        "created": time.time(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "options": dict(options, sites=args.sites, categories=args.categories, articles=args.articles,
+                        corpus=args.corpus),
+        "scenarios": {},
+    }
+    context = multiprocessing.get_context("spawn")
+    with tempfile.TemporaryDirectory() as tmp:
+        corpus = args.corpus
+        if corpus is None:
+            corpus = tmp
+            make_corpus(corpus, args.sites, args.categories, args.articles, feeds=args.feeds)
+        for name in args.scenario or SCENARIOS:
+            # Not a Pool: its workers are daemonic, and scrap_parallel starts processes of its own
+            queue = context.Queue()
+            process = context.Process(target=_scenario_process, args=(name, corpus, options, queue))
+            process.start()
+            ok, result = queue.get()
+            process.join()
+            if not ok:
+                print("{:<22}failed\n{}".format(name, result))
+                continue
+            results["scenarios"][name] = result
+            print("{:<22}{}".format(name, ", ".join("{}={:.4g}".format(k, v) for k, v in sorted(result.items())
+                                                   if isinstance(v, (int, float)))))
+
+    previous = None
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+    if previous is not None:
+        compare(previous, results)
+
+
+if __name__ == "__main__":
+    main()
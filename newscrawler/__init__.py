@@ -1,10 +1,51 @@
+import importlib
 import os
 import sys
 
-from .webcrawler import scrap, find_redirection_url
-
 # from .config import setup_crawlers
 
+# Public names and their modules. They are imported on first use, so importing the package does not load
+# newspaper3k, aiohttp or tldextract
+_EXPORTS = {
+    'scrap': 'webcrawler',
+    'scrap_stream': 'webcrawler',
+    'find_redirection_url': 'webcrawler',
+    'find_redirection_urls': 'webcrawler',
+    'survey_sources': 'webcrawler',
+    'scrap_parallel': 'parallel',
+    'Crawler': 'crawler',
+    'RecrawlScheduler': 'scheduler',
+    'ArticleSink': 'sinks',
+    'CrawlStats': 'stats',
+    'CategoryYields': 'categories',
+    'CrawlJournal': 'journal',
+    'Deduplicator': 'dedup',
+    'FeedStore': 'feeds',
+    'MemoryBudget': 'memory',
+    'RedirectCache': 'redirects',
+    'VisitedStore': 'visited',
+    'MemoryVisitedStore': 'visited',
+    'SQLiteVisitedStore': 'visited',
+    'BloomVisitedStore': 'visited',
+    'configure_logging': 'config',
+    'configure_tldextract': 'url_utilities',
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+    value = getattr(importlib.import_module('.' + module, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
+
 
 if __name__ == "__main__":
     ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -0,0 +1,143 @@
+import sqlite3
+import time
+
+from .config import logger
+
+# Fields of a category entry
+_PROBES, _YIELD, _MISSES, _LAST_PROBE, _NEW_LINKS = range(5)
+
+
+class CategoryYields(object):
+    """
+    Yield of the categories of every source: how many new, valid article links each one contributes on every
+    walk. Categories keep being downloaded while their yield is good. Low-yield ones (tags, archives, sections
+    that are never updated...) are down-sampled: they are probed again after 'min_interval' seconds, and that
+    interval doubles with every probe that brings nothing new, up to 'reprobe_interval'. Unknown categories are
+    always downloaded, so new sections are found.
+    Entries are kept in memory and, if a path is given, in a SQLite database, so they last between runs
+    """
+
+    def __init__(self, path=None, min_probes=3, min_yield=0.5, min_interval=3600, reprobe_interval=86400,
+                 smoothing=0.5):
+        """
+        Args:
+            path: SQLite database where yields are stored, or None to keep them in memory only
+            min_probes: Walks of a category before it can be skipped
+            min_yield: Average number of new links per walk below which a category is down-sampled
+            min_interval: Seconds between probes of a low-yield category after a walk that found new links
+            reprobe_interval: Maximum number of seconds between probes of a low-yield category
+            smoothing: Weight of the last walk in the average yield (exponential moving average). The first walk
+                       of a source finds every link new, higher values forget it sooner
+        """
+        self.path = path
+        self.min_probes = min_probes
+        self.min_yield = min_yield
+        self.min_interval = min_interval
+        self.reprobe_interval = reprobe_interval
+        self.smoothing = smoothing
+        self._entries = {}
+        self._loaded_sources = set()
+        self._conn = None
+        if path is not None:
+            self._conn = sqlite3.connect(path, timeout=30)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS category_yields (source TEXT NOT NULL, category TEXT NOT NULL, "
+                "probes INTEGER NOT NULL, yield REAL NOT NULL, misses INTEGER NOT NULL, last_probe REAL NOT NULL, "
+                "new_links INTEGER NOT NULL, PRIMARY KEY (source, category)) WITHOUT ROWID")
+            self._conn.commit()
+
+    def _load(self, source_url):
+        entries = self._entries.setdefault(source_url, {})
+        if self._conn is None or source_url in self._loaded_sources:
+            return entries
+        rows = self._conn.execute(
+            "SELECT category, probes, yield, misses, last_probe, new_links FROM category_yields WHERE source = ?",
+            (source_url,))
+        for row in rows:
+            entries[row[0]] = list(row[1:])
+        self._loaded_sources.add(source_url)
+        return entries
+
+    def due(self, source_url, category_url, now=None):
+        """
+        Returns: True if the category has to be downloaded on this walk
+        """
+        entry = self._load(source_url).get(category_url)
+        if entry is None or entry[_PROBES] < self.min_probes or entry[_YIELD] >= self.min_yield:
+            return True
+        interval = min(self.reprobe_interval, self.min_interval * 2 ** max(0, entry[_MISSES] - 1))
+        return (now or time.time()) >= entry[_LAST_PROBE] + interval
+
+    def select(self, source_url, category_urls):
+        """
+        Split the categories of a source into the ones to be downloaded and the ones skipped on this walk
+        Returns: Tuple (selected, skipped), lists of category URLs
+        """
+        now = time.time()
+        selected, skipped = [], []
+        for category_url in category_urls:
+            (selected if self.due(source_url, category_url, now) else skipped).append(category_url)
+        return selected, skipped
+
+    def record(self, source_url, category_links, new_links):
+        """
+        Update the yield of the categories walked
+        Args:
+            source_url: URL of the source
+            category_links: Dictionary with the valid article links found in each category, keyed by category URL
+            new_links: Collection of the links, among all of them, not visited before
+        """
+        new_links = set(new_links)
+        entries = self._load(source_url)
+        now = time.time()
+        rows = []
+        for category_url, links in category_links.items():
+            new = len(new_links.intersection(links))
+            entry = entries.get(category_url)
+            if entry is None:
+                entry = entries[category_url] = [0, float(new), 0, now, 0]
+            else:
+                entry[_YIELD] += self.smoothing * (new - entry[_YIELD])
+            entry[_PROBES] += 1
+            entry[_MISSES] = 0 if new else entry[_MISSES] + 1
+            entry[_LAST_PROBE] = now
+            entry[_NEW_LINKS] += new
+            rows.append((source_url, category_url) + tuple(entry))
+        if self._conn is not None and rows:
+            try:
+                with self._conn:
+                    self._conn.executemany(
+                        "INSERT OR REPLACE INTO category_yields (source, category, probes, yield, misses, "
+                        "last_probe, new_links) VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+            except sqlite3.Error as err:
+                logger.warning("CategoryYields:: Unable to store the yields of {}: ".format(source_url) + str(err))
+
+    def yields(self, source_url):
+        """
+        Returns: List of dictionaries with the stats of every category of a source, highest yield first
+        """
+        return sorted(
+            ({"category": category_url, "probes": entry[_PROBES], "yield": entry[_YIELD],
+              "misses": entry[_MISSES], "last_probe": entry[_LAST_PROBE], "new_links": entry[_NEW_LINKS]}
+             for category_url, entry in self._load(source_url).items()),
+            key=lambda item: -item["yield"])
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+
+
+def get_category_yields(category_yields):
+    """
+    Args:
+        category_yields: None or False to download every category, True for an in memory CategoryYields, the
+                         path of its SQLite database, or a CategoryYields instance
+
+    Returns: CategoryYields instance or None
+
+    """
+    if category_yields is None or category_yields is False or isinstance(category_yields, CategoryYields):
+        return category_yields
+    if category_yields is True:
+        return CategoryYields()
+    return CategoryYields(category_yields)
@@ -1,2 +1,17 @@
-from .newspaper import Article, categories_to_articles, construct_config, format_proxy
-from .logger import logger
+from .logger import configure_logging, logger
+
+# newspaper3k (and nltk, lxml...) is imported on first use of these names
+_NEWSPAPER_NAMES = ('Article', 'categories_to_articles', 'category_articles', 'construct_config', 'format_proxy')
+
+__all__ = ['configure_logging', 'logger'] + list(_NEWSPAPER_NAMES)
+
+
+def __getattr__(name):
+    if name in _NEWSPAPER_NAMES:
+        from . import newspaper
+        return getattr(newspaper, name)
+    raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -1,16 +1,38 @@
 import logging
 import os
 
-from logging.handlers import RotatingFileHandler
-
-# setup logger
+# setup logger. Importing the package has no side effects: records go to the handlers of the application,
+# unless configure_logging is called
 logger = logging.getLogger(__name__)
-logs_dir = '/var/log/newscrawler'
-if not os.path.exists(logs_dir):
-    os.makedirs(logs_dir, exist_ok=True)
-log_file = os.path.join(logs_dir, "webcrawler.log")
-formatter = logging.Formatter('%(asctime)s - %(filename)s - %(lineno)d - %(levelname)s - %(message)s')
-file_handler = RotatingFileHandler(log_file, maxBytes=2000000, backupCount=3)
-file_handler.setFormatter(formatter)
-logger.addHandler(file_handler)
+logger.addHandler(logging.NullHandler())
 logger.setLevel(logging.INFO)
+
+LOG_FORMAT = '%(asctime)s - %(filename)s - %(lineno)d - %(levelname)s - %(message)s'
+
+
+def configure_logging(logs_dir='/var/log/newscrawler', level=logging.INFO, max_bytes=2000000, backup_count=3):
+    """
+    Write the log of the crawler to a rotating file, 'webcrawler.log' in 'logs_dir'.
+    Calling it again replaces the file handler added before
+    Args:
+        logs_dir: Directory of the log file. It is created if it does not exist
+        level: Logging level of the crawler
+        max_bytes: Size of the log file before it is rotated
+        backup_count: Number of rotated files kept
+
+    Returns: The file handler
+
+    """
+    from logging.handlers import RotatingFileHandler
+
+    os.makedirs(logs_dir, exist_ok=True)
+    file_handler = RotatingFileHandler(os.path.join(logs_dir, "webcrawler.log"), maxBytes=max_bytes,
+                                       backupCount=backup_count)
+    file_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    for handler in list(logger.handlers):
+        if isinstance(handler, RotatingFileHandler):
+            logger.removeHandler(handler)
+            handler.close()
+    logger.addHandler(file_handler)
+    logger.setLevel(level)
+    return file_handler
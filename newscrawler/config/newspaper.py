@@ -1,9 +1,17 @@
 import re
 
+from datetime import date, datetime
+
 import newspaper
+from newspaper import urls
+from newspaper.cleaners import DocumentCleaner
 from newspaper.extractors import ContentExtractor as NewspaperExtractor
+from newspaper.outputformatters import OutputFormatter
+from newspaper.utils import get_available_languages
+
+from newscrawler.url_utilities import URLClassifier, page_links
 
-from newscrawler.url_utilities import valid_url
+from .logger import logger
 
 
 def format_proxy(proxy):
@@ -92,11 +100,106 @@ class Article(newspaper.Article):
 #         super(Source, self).__init__(url, config, **kwargs)
 
 
+def published_before(publish_date, min_date):
+    """
+    Returns: True if a publish date, as found by newspaper (datetime, date string or None), is older than min_date
+    """
+    if isinstance(publish_date, str):
+        try:
+            publish_date = datetime.strptime(publish_date.split()[0], "%Y-%m-%d")
+        except (ValueError, IndexError):
+            return False
+    if isinstance(publish_date, datetime):
+        publish_date = publish_date.date()
+    return isinstance(publish_date, date) and publish_date < min_date
+
+
 class ContentExtractor(NewspaperExtractor):
     def __init__(self, config=None):
         if not isinstance(config, newspaper.Config):
             config = construct_config()
         super(ContentExtractor, self).__init__(config)
+        self._cleaner = None
+        self._formatter = None
+
+    def _reset_language(self, meta_lang):
+        # The extractor is reused between articles: the language of the last one must not stay
+        self.language = self.config.language
+        self.stopwords_class = self.config.stopwords_class
+        self._formatter.language = self.config.language
+        self._formatter.stopwords_class = self.config.stopwords_class
+        if self.config.use_meta_language:
+            self.update_language(meta_lang)
+            self._formatter.update_language(meta_lang)
+
+    def extract_article(self, url, html, source_url='', min_date=None):
+        """
+        Lean version of newspaper.Article.parse, which only computes the title, text, meta description and publish
+        date of an article, over a single parse of its html. Images, videos, authors, keywords and the rest of the
+        metadata are skipped. The same extractor can be used for many articles, but not from several threads
+        Args:
+            url: URL of the article
+            html: Raw html of the article
+            source_url: URL of the magazine the article belongs to
+            min_date: datetime.date instance. Articles published before it are abandoned as soon as their publish
+                      date is known, before extracting their text
+
+        Returns: Dictionary with 'url', 'title', 'text', 'meta_description' and 'publish_date' keys, or None if
+                 the article was published before min_date
+
+        """
+        if self._cleaner is None:
+            self._cleaner = DocumentCleaner(self.config)
+            self._formatter = OutputFormatter(self.config)
+        article = {"url": urls.prepare_url(url, source_url), "title": "", "text": "", "meta_description": "",
+                   "publish_date": None}
+        doc = self.parser.fromstring(html)
+        if doc is None:
+            return article
+
+        # Metadata does not change the document, so it is read before cleaning it, without copying it
+        title = self.get_title(doc)
+        if title:
+            article["title"] = title[:self.config.MAX_TITLE]
+        meta_lang = self.get_meta_lang(doc)
+        if not (meta_lang and len(meta_lang) >= 2 and meta_lang in get_available_languages()):
+            meta_lang = None
+        self._reset_language(meta_lang[:2] if meta_lang else None)
+        article["meta_description"] = self.get_meta_description(doc)
+        article["publish_date"] = self.get_publishing_date(article["url"], doc)
+        if min_date is not None and published_before(article["publish_date"], min_date):
+            return None
+
+        doc = self._cleaner.clean(doc)
+        top_node = self.calculate_best_node(doc)
+        if top_node is not None:
+            top_node = self.post_cleanup(top_node)
+            text, _ = self._formatter.get_formatted(top_node)
+            article["text"] = text[:self.config.MAX_TEXT]
+        return article
+
+
+def category_articles(magazine, mag_categories=None):
+    """Takes the downloaded categories and returns, for each one of them, the valid
+    article urls found in its page, keyed by category url.
+    Categories whose page has not been parsed into a DOM (category.doc) are streamed
+    through page_links, which classifies their links without building one.
+    mag_categories are every category known for the magazine, defaults to magazine.categories
+    """
+    if mag_categories is None:
+        mag_categories = magazine.categories
+    articles = {}
+    classifier = URLClassifier(parent_url=magazine.url, same_domain=True, mag_categories=mag_categories)
+    for category in magazine.categories:
+        if category.doc is None:
+            cur_articles = page_links(category.html, classifier) if category.html else []
+        else:
+            cur_articles = [art for art in classifier.classify(magazine.extractor.get_urls(category.doc)) if art]
+
+        articles[category.url] = cur_articles
+
+        logger.debug('%d article urls for %s' % (len(cur_articles), category.url))
+    return articles
 
 
 def categories_to_articles(magazine):
@@ -104,17 +207,6 @@ def categories_to_articles(magazine):
     the articles out of each url with the url_to_article method
     """
     articles = []
-    for category in magazine.categories:
-        urls_ = magazine.extractor.get_urls(category.doc)
-        before_purge = len(urls_)
-
-        cur_articles = [
-            valid_url(art_url, parent_url=magazine.url, same_domain=True, mag_categories=magazine.categories) for
-            art_url in urls_]
-        cur_articles = [art for art in cur_articles if art]
-        after_purge = len(cur_articles)
-
+    for cur_articles in category_articles(magazine).values():
         articles.extend(cur_articles)
-
-        print('%d->%d for %s' % (before_purge, after_purge, category.url))
     return articles
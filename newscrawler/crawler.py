@@ -0,0 +1,170 @@
+import asyncio
+
+import aiohttp
+import requests
+
+from .categories import get_category_yields
+from .config import construct_config, logger
+from .dedup import get_deduplicator
+from .feeds import get_feed_store
+from .httpcache import get_http_cache
+from .journal import open_journal
+from .memory import get_memory_budget
+from .network import DEFAULT_CONCURRENCY, DEFAULT_CONCURRENCY_PER_HOST
+from .parsing import get_parse_executor
+from .politeness import get_politeness
+from .redirects import get_redirect_cache
+from .sinks import as_article_sink
+from .stats import CrawlStats
+from .url_utilities import get_min_date
+from .visited import as_visited_store
+from .webcrawler import _check_scrap_functions, _prepare_request_kwargs, process_sources
+
+DEFAULT_DNS_CACHE_TTL = 3600
+DEFAULT_KEEPALIVE_TIMEOUT = 600
+# Hosts whose connections the requests session keeps open
+_SESSION_HOSTS = 1000
+
+
+class Crawler(object):
+    """
+    Long-lived version of webcrawler.scrap, for sources crawled again and again (every few minutes). The event loop,
+    the HTTP clients with their connection pools and DNS cache, the parse executor and the prepared options (proxy,
+    newspaper configuration) are kept between runs, so the connections to the sources stay open and their hosts
+    resolved, instead of being set up again on every run.
+    Close it once it is not needed any more, or use it as a context manager
+
+    >>> with Crawler(visited_store, add_article) as crawler:
+    ...     while True:
+    ...         stats = crawler.crawl(urls)
+    ...         time.sleep(300)
+    """
+
+    def __init__(self, get_visited_links_function, add_article_function, request_kwargs=None, concurrency=None,
+                 concurrency_per_host=None, parse_executor=None, http_cache=None, politeness=None,
+                 lean_extraction=False, feeds=None, dedup=None, category_yields=None, redirects=None,
+                 memory_budget=None, max_age=None, since=None, dns_cache_ttl=DEFAULT_DNS_CACHE_TTL,
+                 keepalive_timeout=DEFAULT_KEEPALIVE_TIMEOUT):
+        """
+        Args:
+            get_visited_links_function: Same as in webcrawler.scrap
+            add_article_function: Same as in webcrawler.scrap
+            request_kwargs: Same as in webcrawler.scrap
+            concurrency: Same as in webcrawler.scrap. It is also the size of the connection pool
+            concurrency_per_host: Same as in webcrawler.scrap
+            parse_executor: Same as in webcrawler.scrap. A pool created here is kept until the crawler is closed
+            http_cache: Same as in webcrawler.scrap
+            politeness: Same as in webcrawler.scrap
+            lean_extraction: Same as in webcrawler.scrap
+            feeds: Same as in webcrawler.scrap
+            dedup: Same as in webcrawler.scrap
+            category_yields: Same as in webcrawler.scrap
+            redirects: Same as in webcrawler.scrap
+            memory_budget: Same as in webcrawler.scrap
+            max_age: Same as in webcrawler.scrap. The cutoff moves forward on every run
+            since: Same as in webcrawler.scrap
+            dns_cache_ttl: Seconds the resolved addresses of a host are kept. None to keep them until the crawler
+                           is closed
+            keepalive_timeout: Seconds an idle connection is kept open, waiting for the next run. Servers may close
+                               it before
+        """
+        _check_scrap_functions(get_visited_links_function, add_article_function)
+        self.visited_store = as_visited_store(get_visited_links_function)
+        self.sink = as_article_sink(add_article_function)
+        self.request_kwargs = _prepare_request_kwargs(request_kwargs)
+        self.newspaper_config = construct_config(self.request_kwargs.get('proxy'))
+        self.concurrency = concurrency or DEFAULT_CONCURRENCY
+        self.concurrency_per_host = concurrency_per_host or DEFAULT_CONCURRENCY_PER_HOST
+        self.http_cache = get_http_cache(http_cache)
+        self.politeness = get_politeness(politeness)
+        self.lean_extraction = lean_extraction
+        self.feed_store = get_feed_store(feeds)
+        self.dedup = get_deduplicator(dedup)
+        self.category_yields = get_category_yields(category_yields)
+        self.redirect_cache = get_redirect_cache(redirects)
+        self.memory_budget = get_memory_budget(memory_budget)
+        # Checked here, but resolved on every run, as max_age is relative to it
+        get_min_date(max_age, since)
+        self.max_age = max_age
+        self.since = since
+        self.dns_cache_ttl = dns_cache_ttl
+        self.keepalive_timeout = keepalive_timeout
+
+        self.loop = asyncio.new_event_loop()
+        self.parse_executor, self._own_executor = get_parse_executor(parse_executor)
+        # Opened on the first run, inside the loop
+        self.client = None
+        self.session = None
+
+    def _open_clients(self):
+        if self.client is not None:
+            return
+        connector = aiohttp.TCPConnector(limit=self.concurrency, limit_per_host=self.concurrency_per_host,
+                                         ttl_dns_cache=self.dns_cache_ttl, keepalive_timeout=self.keepalive_timeout)
+        # Same settings as http_requests.create_client
+        self.client = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=None), connector=connector,
+                                            trust_env=True)
+        # http_requests makes https requests with requests, one connection each. They go through this session
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=_SESSION_HOSTS,
+                                                pool_maxsize=self.concurrency_per_host)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    async def _crawl(self, urls, stats, journal):
+        self._open_clients()
+        return await process_sources(
+            urls, self.loop, self.visited_store, self.sink, concurrency=self.concurrency,
+            concurrency_per_host=self.concurrency_per_host, parse_executor=self.parse_executor,
+            http_cache=self.http_cache, politeness=self.politeness, stats=stats,
+            lean_extraction=self.lean_extraction, feed_store=self.feed_store, dedup=self.dedup,
+            category_yields=self.category_yields, journal=journal, redirect_cache=self.redirect_cache,
+            memory_budget=self.memory_budget, min_date=get_min_date(self.max_age, self.since), client=self.client,
+            session=self.session, newspaper_config=self.newspaper_config, **self.request_kwargs)
+
+    def crawl(self, urls, journal=None, resume=False):
+        """
+        Scrap a collection of magazines URLs, as webcrawler.scrap does, reusing the connections of the previous runs
+        Args:
+            urls: List of URLs to be scraped
+            journal: Same as in webcrawler.scrap, for this run
+            resume: Same as in webcrawler.scrap
+
+        Returns: stats.CrawlStats instance with the timings, counters and errors of this run
+
+        """
+        if self.loop.is_closed():
+            msg = "The crawler is closed"
+            logger.error(msg)
+            raise RuntimeError(msg)
+        journal = open_journal(journal, resume)
+        # The sink is reused between runs: it must not keep the journal of a previous one
+        self.sink.journal = journal
+        stats = CrawlStats()
+        # The loop is not set as the current one: the event loop of the caller is left as it was
+        self.loop.run_until_complete(self._crawl(urls, stats, journal))
+        return stats.finish()
+
+    def close(self):
+        """
+        Close the connections, the parse executor and the event loop. The crawler can not be used any more
+        """
+        if self.loop.is_closed():
+            return
+        try:
+            if self.client is not None:
+                self.loop.run_until_complete(self.client.close())
+        finally:
+            if self.session is not None:
+                self.session.close()
+            if self._own_executor:
+                self.parse_executor.shutdown()
+            self.loop.run_until_complete(self.loop.shutdown_asyncgens())
+            self.loop.close()
+            self.client = self.session = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
@@ -0,0 +1,249 @@
+import hashlib
+import re
+import sqlite3
+
+from collections import OrderedDict
+
+from .config import logger
+
+FINGERPRINT_BITS = 64
+_WORD = re.compile(r'\w+', re.UNICODE)
+
+
+def _feature_hash(feature):
+    return int.from_bytes(hashlib.blake2b(feature.encode('utf-8'), digest_size=8).digest(), 'big')
+
+
+def simhash(text, shingle_size=3):
+    """
+    64 bits SimHash fingerprint of a text, over its word shingles. Near-duplicate texts get fingerprints that
+    differ in a few bits
+    Args:
+        text: Text to fingerprint
+        shingle_size: Words in every shingle
+
+    Returns: Fingerprint (int), or None if the text has no words
+
+    """
+    words = _WORD.findall(text.lower())
+    if not words:
+        return None
+    shingles = {" ".join(words[i:i + shingle_size]) for i in range(max(1, len(words) - shingle_size + 1))}
+    # Bits are counted column by column over the binary strings of the hashes, which is done in C
+    bits = [format(_feature_hash(shingle), '064b') for shingle in shingles]
+    half = len(bits) / 2
+    fingerprint = 0
+    for column in zip(*bits):
+        fingerprint = (fingerprint << 1) | (column.count('1') > half)
+    return fingerprint
+
+
+def hamming_distance(a, b):
+    return bin(a ^ b).count('1')
+
+
+def _band_layout(bands):
+    """
+    Returns: List of (shift, mask) tuples splitting a fingerprint in 'bands' bands of (almost) the same width
+    """
+    layout, shift = [], 0
+    for band in range(bands):
+        width = FINGERPRINT_BITS // bands + (1 if band < FINGERPRINT_BITS % bands else 0)
+        layout.append((shift, (1 << width) - 1))
+        shift += width
+    return layout
+
+
+class SimHashIndex(object):
+    """
+    Bounded in memory LSH index of SimHash fingerprints. Fingerprints are split in max_distance + 1 bands: two of
+    them within 'max_distance' bits share at least one band, so candidates are found through their bands without
+    missing any near-duplicate. The oldest fingerprints are evicted beyond 'capacity'
+    """
+
+    def __init__(self, max_distance=3, capacity=1000000):
+        self.max_distance = max_distance
+        self.capacity = capacity
+        self._layout = _band_layout(max_distance + 1)
+        # One dictionary per band, from band value to the list of fingerprints having it. Lists are much smaller
+        # than sets, and buckets hold a few fingerprints
+        self._buckets = [{} for _ in self._layout]
+        self._keys = OrderedDict()
+
+    def _bands(self, fingerprint):
+        return [(band, (fingerprint >> shift) & mask) for band, (shift, mask) in enumerate(self._layout)]
+
+    def find(self, fingerprint):
+        """
+        Returns: Key of a stored fingerprint within 'max_distance' bits of 'fingerprint', or None
+        """
+        for band, value in self._bands(fingerprint):
+            for candidate in self._buckets[band].get(value, ()):
+                if hamming_distance(fingerprint, candidate) <= self.max_distance:
+                    return self._keys[candidate]
+        return None
+
+    def add(self, fingerprint, key):
+        if fingerprint in self._keys:
+            return
+        self._keys[fingerprint] = key
+        for band, value in self._bands(fingerprint):
+            bucket = self._buckets[band].get(value)
+            if bucket is None:
+                self._buckets[band][value] = [fingerprint]
+            else:
+                bucket.append(fingerprint)
+        while self.capacity is not None and len(self._keys) > self.capacity:
+            self._evict()
+
+    def _evict(self):
+        fingerprint, _ = self._keys.popitem(last=False)
+        for band, value in self._bands(fingerprint):
+            bucket = self._buckets[band][value]
+            bucket.remove(fingerprint)
+            if not bucket:
+                del self._buckets[band][value]
+
+    def __len__(self):
+        return len(self._keys)
+
+    def close(self):
+        pass
+
+
+class SQLiteSimHashIndex(SimHashIndex):
+    """
+    SimHash index stored in a SQLite database, without a size limit. It can be shared by several processes
+    """
+
+    def __init__(self, path, max_distance=3):
+        super(SQLiteSimHashIndex, self).__init__(max_distance, capacity=None)
+        self.path = path
+        self._conn = sqlite3.connect(path, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS simhash_meta (bands INTEGER NOT NULL)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS simhash_bands (band INTEGER NOT NULL, value INTEGER NOT NULL, "
+            "fingerprint INTEGER NOT NULL, PRIMARY KEY (band, value, fingerprint)) WITHOUT ROWID")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS simhash_keys (fingerprint INTEGER PRIMARY KEY, key TEXT NOT NULL)")
+        row = self._conn.execute("SELECT bands FROM simhash_meta").fetchone()
+        if row is None:
+            self._conn.execute("INSERT INTO simhash_meta (bands) VALUES (?)", (len(self._layout),))
+        elif row[0] != len(self._layout):
+            self._conn.close()
+            msg = "SQLiteSimHashIndex:: {} was created with max_distance={}".format(path, row[0] - 1)
+            logger.error(msg)
+            raise AttributeError(msg)
+        self._conn.commit()
+
+    @staticmethod
+    def _signed(fingerprint):
+        # SQLite integers are signed 64 bits
+        return fingerprint - (1 << 64) if fingerprint >= 1 << 63 else fingerprint
+
+    @staticmethod
+    def _unsigned(value):
+        return value + (1 << 64) if value < 0 else value
+
+    def find(self, fingerprint):
+        for band, value in self._bands(fingerprint):
+            rows = self._conn.execute("SELECT fingerprint FROM simhash_bands WHERE band = ? AND value = ?",
+                                      (band, value))
+            for (candidate,) in rows:
+                if hamming_distance(fingerprint, self._unsigned(candidate)) <= self.max_distance:
+                    row = self._conn.execute("SELECT key FROM simhash_keys WHERE fingerprint = ?",
+                                             (candidate,)).fetchone()
+                    return row[0] if row else None
+        return None
+
+    def add(self, fingerprint, key):
+        signed = self._signed(fingerprint)
+        with self._conn:
+            cursor = self._conn.execute("INSERT OR IGNORE INTO simhash_keys (fingerprint, key) VALUES (?, ?)",
+                                        (signed, key))
+            if cursor.rowcount:
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO simhash_bands (band, value, fingerprint) VALUES (?, ?, ?)",
+                    [(band, value, signed) for band, value in self._bands(fingerprint)])
+
+    def __len__(self):
+        return self._conn.execute("SELECT COUNT(*) FROM simhash_keys").fetchone()[0]
+
+    def close(self):
+        self._conn.close()
+
+
+class Deduplicator(object):
+    """
+    Near-duplicate detection of articles (wire stories, syndicated copies...) by the SimHash fingerprint of their
+    title and text. Recent fingerprints are kept in a bounded in memory index and, if a path is given, every one
+    of them in a SQLite index, so duplicates of articles seen in previous runs are found too
+    """
+
+    def __init__(self, path=None, max_distance=3, capacity=1000000, mode='drop', shingle_size=3):
+        """
+        Args:
+            path: SQLite database of the on disk index, or None to keep fingerprints in memory only
+            max_distance: Maximum number of different bits between the fingerprints of near-duplicates
+                          (out of 64). Higher values catch copies with more edits, and more false positives
+            capacity: Maximum number of fingerprints in memory
+            mode: 'drop' to discard near-duplicates, or 'tag' to deliver them with a 'duplicate_of' key holding
+                  the URL of the first copy
+            shingle_size: Words in every shingle of the fingerprint
+        """
+        if mode not in ('drop', 'tag'):
+            raise AttributeError("Deduplicator mode must be 'drop' or 'tag'")
+        self.mode = mode
+        self.shingle_size = shingle_size
+        self.memory = SimHashIndex(max_distance, capacity)
+        self.disk = SQLiteSimHashIndex(path, max_distance) if path is not None else None
+
+    def fingerprint(self, article):
+        return simhash(article.get('title', '') + "\n" + article.get('text', ''), self.shingle_size)
+
+    def check(self, article):
+        """
+        Look for a near-duplicate of an article. Articles without one are added to the index
+        Args:
+            article: Article dictionary, with 'url', 'title' and 'text' keys
+
+        Returns: URL of the article it duplicates, or None
+
+        """
+        fingerprint = self.fingerprint(article)
+        if fingerprint is None:
+            return None
+        url = article.get('url')
+        original = self.memory.find(fingerprint)
+        if original is None and self.disk is not None:
+            original = self.disk.find(fingerprint)
+            if original is not None:
+                self.memory.add(fingerprint, original)
+        # The same article crawled again is not a copy of itself
+        if original is not None and original != url:
+            return original
+        self.memory.add(fingerprint, url)
+        if self.disk is not None:
+            self.disk.add(fingerprint, url)
+        return None
+
+    def close(self):
+        if self.disk is not None:
+            self.disk.close()
+
+
+def get_deduplicator(dedup):
+    """
+    Args:
+        dedup: None or False to disable it, True for an in memory Deduplicator, the path of its SQLite database,
+               or a Deduplicator instance
+
+    Returns: Deduplicator instance or None
+
+    """
+    if dedup is None or dedup is False or isinstance(dedup, Deduplicator):
+        return dedup
+    if dedup is True:
+        return Deduplicator()
+    return Deduplicator(dedup)
@@ -0,0 +1,322 @@
+import asyncio
+import hashlib
+import json
+import os
+import time
+
+from html.parser import HTMLParser
+from urllib.parse import urljoin, urlsplit
+from xml.etree.ElementTree import ParseError, XMLPullParser
+
+from .config import logger
+
+FEED_TYPES = ('application/rss+xml', 'application/atom+xml', 'application/rdf+xml')
+
+
+class _FeedLinkParser(HTMLParser):
+    """
+    Collects the <link rel="alternate"> feeds declared in the head of a page
+    """
+
+    def __init__(self, base_url):
+        super(_FeedLinkParser, self).__init__(convert_charrefs=True)
+        self.base_url = base_url
+        self.feeds = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag != 'link':
+            return
+        attrs = dict(attrs)
+        rel = (attrs.get('rel') or '').lower().split()
+        if 'alternate' in rel and (attrs.get('type') or '').lower() in FEED_TYPES and attrs.get('href'):
+            self.feeds.append(urljoin(self.base_url, attrs['href'].strip()))
+
+
+def find_feed_links(url, html):
+    """
+    RSS and Atom feeds declared in the head of a page
+    Args:
+        url: URL of the page, to resolve relative links
+        html: Raw html of the page
+
+    Returns: List of feed URLs
+
+    """
+    end = html.lower().find('</head>')
+    parser = _FeedLinkParser(url)
+    try:
+        parser.feed(html if end < 0 else html[:end])
+        parser.close()
+    except Exception as err:
+        logger.warning("find_feed_links:: Error parsing {}: ".format(url) + str(err))
+    return parser.feeds
+
+
+def find_robots_sitemaps(text):
+    """
+    News sitemaps declared in a robots.txt. General sitemaps are left out: they list the whole site
+    """
+    sitemaps = []
+    for line in text.splitlines():
+        key, _, value = line.partition(':')
+        value = value.strip()
+        if key.strip().lower() == 'sitemap' and 'news' in value.lower():
+            sitemaps.append(value)
+    return sitemaps
+
+
+def _local(tag):
+    return tag.rsplit('}', 1)[-1] if isinstance(tag, str) else ''
+
+
+def _child_text(elem, name):
+    for child in elem:
+        if _local(child.tag) == name and child.text:
+            return child.text.strip()
+    return None
+
+
+def _entry_link(elem):
+    tag = _local(elem.tag)
+    if tag == 'item':
+        link = _child_text(elem, 'link')
+        if not link:
+            for child in elem:
+                if _local(child.tag) == 'guid' and child.get('isPermaLink', 'true') != 'false' and child.text:
+                    link = child.text.strip()
+        return link
+    if tag == 'entry':
+        for child in elem:
+            if _local(child.tag) == 'link' and child.get('rel', 'alternate') == 'alternate' and child.get('href'):
+                return child.get('href').strip()
+        return None
+    # Sitemap <url>
+    return _child_text(elem, 'loc')
+
+
+def parse_feed(text, chunk_size=65536):
+    """
+    Streaming parser of RSS, Atom and sitemap documents. Entries are discarded as soon as their link is read,
+    so big documents are never held as a whole tree
+    Args:
+        text: Document
+        chunk_size: Characters fed to the parser at once
+
+    Returns: Tuple (links, sitemaps): the article links in the document, and the sitemaps listed in it if it is
+             a sitemap index
+
+    """
+    parser = XMLPullParser(events=('end',))
+    links, sitemaps = [], []
+    text = text.lstrip('\ufeff \t\r\n')
+
+    def collect():
+        for _, elem in parser.read_events():
+            tag = _local(elem.tag)
+            if tag in ('item', 'entry', 'url'):
+                link = _entry_link(elem)
+                if link:
+                    links.append(link)
+                elem.clear()
+            elif tag == 'sitemap':
+                loc = _child_text(elem, 'loc')
+                if loc:
+                    sitemaps.append(loc)
+                elem.clear()
+
+    try:
+        for start in range(0, len(text), chunk_size):
+            parser.feed(text[start:start + chunk_size])
+            collect()
+        parser.close()
+        collect()
+    except ParseError as err:
+        # Whatever was read before the error is still good
+        logger.warning("parse_feed:: Malformed document: " + str(err))
+    return links, sitemaps
+
+
+class FeedStore(object):
+    """
+    Feeds and news sitemaps of each source, and when its categories were last walked.
+    Feeds are looked for once every 'ttl' seconds. Entries are kept in memory and, if a directory is given, on
+    disk (one file per source, so several processes can share it)
+    """
+
+    def __init__(self, directory=None, ttl=86400, walk_interval=21600):
+        """
+        Args:
+            directory: Directory where entries are stored between runs, or None to keep them in memory only
+            ttl: Seconds before looking for the feeds of a source again
+            walk_interval: Seconds between category walks of a source with feeds. The walk still finds the
+                           articles that are not in the feeds, but it is run less often
+        """
+        self.directory = directory
+        self.ttl = ttl
+        self.walk_interval = walk_interval
+        self._entries = {}
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    def _path(self, source_url):
+        key = hashlib.sha1(source_url.encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, key[:2], key + ".json")
+
+    def _load(self, source_url):
+        entry = self._entries.get(source_url)
+        if entry is None and self.directory is not None:
+            try:
+                with open(self._path(source_url), encoding='utf-8') as f:
+                    entry = self._entries[source_url] = json.load(f)
+            except (OSError, ValueError):
+                pass
+        return entry
+
+    def _save(self, source_url, entry):
+        self._entries[source_url] = entry
+        if self.directory is None:
+            return
+        path = self._path(source_url)
+        tmp_path = path + ".tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(entry, f)
+            os.replace(tmp_path, path)
+        except OSError as err:
+            logger.warning("FeedStore:: Unable to store {}: ".format(source_url) + str(err))
+
+    def get(self, source_url):
+        """
+        Returns: Feed URLs of the source (maybe an empty list), or None if they have to be looked for
+        """
+        entry = self._load(source_url)
+        if entry is None or entry.get('discovered', 0) + self.ttl < time.time():
+            return None
+        return entry['feeds']
+
+    def set(self, source_url, feeds):
+        entry = dict(self._load(source_url) or {}, url=source_url, feeds=list(feeds), discovered=time.time())
+        self._save(source_url, entry)
+
+    def walk_due(self, source_url):
+        """
+        Returns: True if the categories of the source have to be walked
+        """
+        entry = self._load(source_url)
+        return entry is None or entry.get('last_walk', 0) + self.walk_interval < time.time()
+
+    def walked(self, source_url):
+        entry = dict(self._load(source_url) or {}, url=source_url, last_walk=time.time())
+        entry.setdefault('feeds', [])
+        self._save(source_url, entry)
+
+
+def get_feed_store(feeds):
+    """
+    Args:
+        feeds: None or False to disable feeds, True for an in memory FeedStore, the path of its directory, or
+               a FeedStore instance
+
+    Returns: FeedStore instance or None
+
+    """
+    if feeds is None or feeds is False or isinstance(feeds, FeedStore):
+        return feeds
+    if feeds is True:
+        return FeedStore()
+    return FeedStore(feeds)
+
+
+async def discover_feeds(source_url, downloader, homepage=None, **request_kwargs):
+    """
+    Look for the feeds of a source: the ones declared in its homepage, and the news sitemaps in its robots.txt
+    Args:
+        homepage: http_requests response of the homepage, if it has just been downloaded. It is downloaded here if
+                  it is not given, or if it has no content (a 304 Not Modified answer)
+    Returns: List of feed URLs
+    """
+    parts = urlsplit(source_url)
+    robots_url = "{}://{}/robots.txt".format(parts.scheme, parts.netloc)
+    fetches = [downloader.fetch(robots_url, source=source_url, **request_kwargs)]
+    if homepage is None or homepage.http_response.status_code == 304:
+        fetches.append(downloader.fetch(source_url, source=source_url, **request_kwargs))
+    results = await asyncio.gather(*fetches, return_exceptions=True)
+    robots = results[0]
+    if len(results) > 1:
+        homepage = results[1]
+    feeds = []
+    if homepage is not None and not isinstance(homepage, Exception):
+        feeds.extend(find_feed_links(homepage.http_response.url or source_url, homepage.text))
+    if robots is not None and not isinstance(robots, Exception) and robots.http_response.status_code == 200:
+        feeds.extend(urljoin(robots_url, sitemap) for sitemap in find_robots_sitemaps(robots.text))
+    # Same order, without duplicates
+    return list(dict.fromkeys(feeds))
+
+
+async def _fetch_feed(url, source_url, downloader, http_cache=None, **request_kwargs):
+    """
+    Returns: Tuple (links, sitemaps) of a feed, or None if it could not be downloaded
+    """
+    if http_cache is None:
+        response, data = await downloader.fetch(url, source=source_url, **request_kwargs), None
+    else:
+        response, data = await http_cache.fetch(downloader, url, 'feed', source=source_url, **request_kwargs)
+    if response is None or response.http_response.status_code >= 400:
+        return None
+    if data is not None:
+        return data['links'], data['sitemaps']
+    links, sitemaps = parse_feed(response.text)
+    links = [urljoin(url, link) for link in links]
+    sitemaps = [urljoin(url, sitemap) for sitemap in sitemaps]
+    if http_cache is not None:
+        http_cache.save(url, response, 'feed', links=links, sitemaps=sitemaps)
+    return links, sitemaps
+
+
+async def feed_articles(source_url, downloader, feed_store, http_cache=None, max_sitemaps=5, homepage=None,
+                        **request_kwargs):
+    """
+    Article links found in the feeds of a source. Its feeds are looked for first if the store does not know them.
+    Feeds are requested conditionally if there is an HTTP cache, and not parsed again if they have not changed
+    Args:
+        source_url: URL of the source
+        downloader: network.Downloader instance
+        feed_store: FeedStore instance
+        http_cache: httpcache.HTTPCache instance or None
+        max_sitemaps: Maximum number of the sitemaps listed in a sitemap index to be downloaded
+        homepage: Same as in discover_feeds
+        **request_kwargs: Common options available for a http_requests.async_request function
+
+    Returns: Set of article links, or None if the source has no feed that could be read
+
+    """
+    feeds = feed_store.get(source_url)
+    if feeds is None:
+        feeds = await discover_feeds(source_url, downloader, homepage, **request_kwargs)
+        feed_store.set(source_url, feeds)
+        logger.info("{} feeds found for {}".format(len(feeds), source_url))
+    if not feeds:
+        return None
+
+    results = await asyncio.gather(
+        *[_fetch_feed(feed, source_url, downloader, http_cache, **request_kwargs) for feed in feeds],
+        return_exceptions=True)
+    results = [result for result in results if result is not None and not isinstance(result, Exception)]
+    if not results:
+        return None
+
+    links = set()
+    children = []
+    for feed_links, sitemaps in results:
+        links.update(feed_links)
+        children.extend(sitemaps)
+    if children:
+        # News sitemaps go first
+        children = sorted(dict.fromkeys(children), key=lambda s: 'news' not in s.lower())[:max_sitemaps]
+        for result in await asyncio.gather(
+                *[_fetch_feed(child, source_url, downloader, http_cache, **request_kwargs) for child in children],
+                return_exceptions=True):
+            if result is not None and not isinstance(result, Exception):
+                links.update(result[0])
+    return links
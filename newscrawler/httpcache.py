@@ -0,0 +1,111 @@
+import hashlib
+import json
+import os
+import time
+
+from .config import logger
+
+
+class HTTPCache(object):
+    """
+    On disk cache of the pages visited on every run (homepages and categories), keyed by URL.
+    It keeps the validators of each page (ETag, Last-Modified and a hash of its content) to send conditional
+    requests, and the data extracted from it, so an unchanged page does not need to be parsed again
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, url, kind):
+        key = hashlib.sha1((kind + " " + url).encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, key[:2], key + ".json")
+
+    @staticmethod
+    def content_hash(text):
+        return hashlib.sha1(text.encode('utf-8', errors='replace')).hexdigest()
+
+    def get(self, url, kind='page'):
+        """
+        Returns: Cache entry (dictionary) of the URL, or None if there is not one
+        """
+        try:
+            with open(self._path(url, kind), encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def save(self, url, response, kind='page', **data):
+        """
+        Store the validators of an http_requests response, along with the data extracted from the page
+        """
+        headers = {k.lower(): v for k, v in (response.http_response.headers or {}).items()}
+        entry = {
+            "url": url,
+            "etag": headers.get('etag'),
+            "last_modified": headers.get('last-modified'),
+            "hash": self.content_hash(response.text),
+            "stored": time.time(),
+            "data": data
+        }
+        path = self._path(url, kind)
+        tmp_path = path + ".tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(entry, f)
+            os.replace(tmp_path, path)
+        except OSError as err:
+            logger.warning("HTTPCache:: Unable to store {}: ".format(url) + str(err))
+
+    @staticmethod
+    def conditional_headers(entry):
+        headers = {}
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def is_unchanged(self, entry, response):
+        """
+        A page is unchanged if the server answers 304 Not Modified, or if its content is the same
+        """
+        if response.http_response.status_code == 304:
+            return True
+        return entry.get('hash') == self.content_hash(response.text)
+
+    async def fetch(self, downloader, url, kind='page', cache_key=None, **request_kwargs):
+        """
+        Download an URL with a conditional request, if it was visited before
+        Args:
+            downloader: network.Downloader instance
+            url: URL to be requested
+            kind: Namespace of the entry, for URLs cached with different data
+            cache_key: URL the entry is stored under, if not the requested one (a source requested where it
+                       redirects to). It must be the one given to save
+            **request_kwargs: Common options available for a http_requests.async_request function
+
+        Returns: Tuple (response, data). 'data' is the data stored for the page if it has not changed, or None
+
+        """
+        entry = self.get(cache_key or url, kind)
+        if entry:
+            request_kwargs['headers'] = {**(request_kwargs.get('headers') or {}), **self.conditional_headers(entry)}
+        response = await downloader.fetch(url, **request_kwargs)
+        if entry and response is not None and self.is_unchanged(entry, response):
+            return response, entry['data']
+        return response, None
+
+
+def get_http_cache(http_cache):
+    """
+    Args:
+        http_cache: None, an HTTPCache instance or the path of the cache directory
+
+    Returns: HTTPCache instance or None
+
+    """
+    if http_cache is None or isinstance(http_cache, HTTPCache):
+        return http_cache
+    return HTTPCache(http_cache)
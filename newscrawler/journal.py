@@ -0,0 +1,150 @@
+import sqlite3
+import time
+
+from .config import logger
+
+_DISCOVERED, _DONE, _FAILED = 'discovered', 'done', 'failed'
+
+
+class CrawlJournal(object):
+    """
+    Durable checkpoint of a crawl run, stored in a SQLite database: the new article links found for every source,
+    whether they have been delivered, and the sources already processed. A run started with resume=True goes on
+    from there: finished sources are skipped, and the pending articles of the others are processed without
+    downloading their homepages and categories again.
+    Articles are only recorded as delivered once the sink has handed them over, so the ones still buffered when
+    the run was interrupted, or that failed, are pending too. Sources whose articles could not be looked for are
+    recorded as failed, and looked for again on resume
+    """
+
+    def __init__(self, path):
+        """
+        Args:
+            path: SQLite database of the journal. Several processes can share it
+        """
+        self.path = path
+        self._conn = sqlite3.connect(path, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # Commits survive a crash of the process, only an OS crash could lose the last ones
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS journal_sources (source TEXT PRIMARY KEY, state TEXT NOT NULL, "
+            "updated REAL NOT NULL)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS journal_articles (source TEXT NOT NULL, url TEXT NOT NULL, "
+            "done INTEGER NOT NULL DEFAULT 0, PRIMARY KEY (source, url)) WITHOUT ROWID")
+        self._conn.commit()
+
+    def reset(self):
+        """
+        Forget the previous run
+        """
+        with self._conn:
+            self._conn.execute("DELETE FROM journal_articles")
+            self._conn.execute("DELETE FROM journal_sources")
+
+    def finished_sources(self):
+        """
+        Returns: Set of the sources processed by the run, without pending articles
+        """
+        return {row[0] for row in self._conn.execute(
+            "SELECT source FROM journal_sources s WHERE state = ? AND NOT EXISTS "
+            "(SELECT 1 FROM journal_articles a WHERE a.source = s.source AND done = 0)", (_DONE,))}
+
+    def failed_sources(self):
+        """
+        Returns: Set of the sources whose articles could not be looked for in the run
+        """
+        return {row[0] for row in self._conn.execute("SELECT source FROM journal_sources WHERE state = ?",
+                                                     (_FAILED,))}
+
+    def pending(self, source_url):
+        """
+        Returns: List of the article links of a source not delivered yet, or None if its articles have not been
+                 looked for in this run (or that failed)
+        """
+        row = self._conn.execute("SELECT state FROM journal_sources WHERE source = ?", (source_url,)).fetchone()
+        if row is None or row[0] == _FAILED:
+            return None
+        return [row[0] for row in self._conn.execute(
+            "SELECT url FROM journal_articles WHERE source = ? AND done = 0", (source_url,))]
+
+    def delivered(self, source_url):
+        """
+        Returns: List of the article links of a source already delivered in this run
+        """
+        return [row[0] for row in self._conn.execute(
+            "SELECT url FROM journal_articles WHERE source = ? AND done = 1", (source_url,))]
+
+    def discovered(self, source_url, urls):
+        """
+        Record the new article links found for a source
+        """
+        with self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO journal_sources (source, state, updated) VALUES (?, ?, ?)",
+                               (source_url, _DISCOVERED, time.time()))
+            self._conn.executemany("INSERT OR IGNORE INTO journal_articles (source, url) VALUES (?, ?)",
+                                   ((source_url, url) for url in urls))
+
+    def articles_done(self, keys):
+        """
+        Record articles as delivered
+        Args:
+            keys: Collection of (source URL, article URL) tuples
+        """
+        with self._conn:
+            self._conn.executemany("UPDATE journal_articles SET done = 1 WHERE source = ? AND url = ?", keys)
+
+    def source_done(self, source_url):
+        """
+        Record every article of a source as processed. Its articles are kept until they are delivered
+        """
+        with self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO journal_sources (source, state, updated) VALUES (?, ?, ?)",
+                               (source_url, _DONE, time.time()))
+
+    def source_failed(self, source_url):
+        """
+        Record that the articles of a source could not be looked for
+        """
+        with self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO journal_sources (source, state, updated) VALUES (?, ?, ?)",
+                               (source_url, _FAILED, time.time()))
+
+    def close(self):
+        self._conn.close()
+
+
+def get_journal(journal):
+    """
+    Args:
+        journal: None or False to disable it, the path of its SQLite database, or a CrawlJournal instance
+
+    Returns: CrawlJournal instance or None
+
+    """
+    if journal is None or journal is False or isinstance(journal, CrawlJournal):
+        return journal
+    return CrawlJournal(journal)
+
+
+def open_journal(journal, resume=False):
+    """
+    Journal of a crawl run
+    Args:
+        journal: Same as in get_journal
+        resume: Go on from the run recorded in the journal. Otherwise, it is reset
+
+    Returns: CrawlJournal instance or None
+
+    """
+    journal = get_journal(journal)
+    if journal is None:
+        if resume:
+            msg = "A journal is needed to resume a crawl"
+            logger.error(msg)
+            raise AttributeError(msg)
+        return None
+    if not resume:
+        journal.reset()
+    return journal
@@ -0,0 +1,116 @@
+import asyncio
+
+from collections.abc import Mapping
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+DEFAULT_MAX_RESPONSE_SIZE = 10 * 1024 * 1024
+
+
+class ArticleRecord(Mapping):
+    """
+    Compact, read-only article, with the same keys as the article dictionaries. It behaves as a mapping, so
+    add_article_function can use it as one (article['url'], article.get('date'), dict(article)...)
+    """
+    __slots__ = ('source', 'url', 'title', 'text', 'date', 'description')
+
+    def __init__(self, source, url, title, text, date, description):
+        self.source = source
+        self.url = url
+        self.title = title
+        self.text = text
+        self.date = date
+        self.description = description
+
+    def __getitem__(self, key):
+        if key not in self.__slots__:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __iter__(self):
+        return iter(self.__slots__)
+
+    def __len__(self):
+        return len(self.__slots__)
+
+    def __reduce__(self):
+        return ArticleRecord, tuple(getattr(self, key) for key in self.__slots__)
+
+    def __repr__(self):
+        return "ArticleRecord(url={!r})".format(self.url)
+
+
+class MemoryBudget(object):
+    """
+    Bound on the article pages held in memory during a crawl, from the moment they are requested until they are
+    parsed. New article downloads wait while the budget is spent. Each download reserves the average size of the
+    pages seen so far, and its real size once it is known, so the pages in flight are accounted for too.
+    Responses bigger than 'max_response_size' are dropped before being parsed
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, max_response_size=DEFAULT_MAX_RESPONSE_SIZE,
+                 initial_estimate=100000):
+        """
+        Args:
+            max_bytes: Maximum number of bytes of the pages in memory
+            max_response_size: Maximum size of a response, in bytes. None for no limit
+            initial_estimate: Bytes reserved for each download until the size of some pages is known
+        """
+        self.max_bytes = max_bytes
+        self.max_response_size = max_response_size
+        self.used = 0
+        self.max_used = 0
+        self._estimate = initial_estimate
+        self._pages = 0
+        self._available = None
+
+    async def acquire(self):
+        """
+        Wait until there is room for a new page and reserve it
+        Returns: Number of bytes reserved
+        """
+        if self._available is None:
+            self._available = asyncio.Event()
+        while self.used >= self.max_bytes:
+            self._available.clear()
+            await self._available.wait()
+        reserved = int(self._estimate)
+        self._add(reserved)
+        return reserved
+
+    def resize(self, reserved, nbytes):
+        """
+        Replace a reservation by the real size of the page
+        Returns: Number of bytes reserved now
+        """
+        self._pages += 1
+        self._estimate += (nbytes - self._estimate) / min(self._pages, 100)
+        self._add(nbytes - reserved)
+        return nbytes
+
+    def release(self, nbytes):
+        self._add(-nbytes)
+
+    def _add(self, nbytes):
+        self.used += nbytes
+        self.max_used = max(self.max_used, self.used)
+        if nbytes < 0 and self.used < self.max_bytes and self._available is not None:
+            self._available.set()
+
+    def too_large(self, nbytes):
+        return self.max_response_size is not None and nbytes > self.max_response_size
+
+
+def get_memory_budget(memory_budget):
+    """
+    Args:
+        memory_budget: None or False to disable it, True for a MemoryBudget with the default size, a maximum
+                       number of bytes, or a MemoryBudget instance
+
+    Returns: MemoryBudget instance or None
+
+    """
+    if memory_budget is None or memory_budget is False or isinstance(memory_budget, MemoryBudget):
+        return memory_budget
+    if memory_budget is True:
+        return MemoryBudget()
+    return MemoryBudget(memory_budget)
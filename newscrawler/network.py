@@ -0,0 +1,178 @@
+import asyncio
+import functools
+
+import aiohttp
+import requests
+
+from http_requests import AsyncResponse, HTTPInfo, async_request, default_encoding, default_headers
+from urllib.parse import urlsplit
+
+from .config import logger
+from .stats import CrawlStats, response_size
+
+DEFAULT_CONCURRENCY = 100
+DEFAULT_CONCURRENCY_PER_HOST = 10
+# Seconds a request may take, so a stalled server does not keep its slots forever. It is the total time of
+# aiohttp requests, and the connect and read timeouts of the ones made with requests
+DEFAULT_TIMEOUT = 60
+
+
+def url_host(url):
+    return urlsplit(url).netloc.lower()
+
+
+def through_requests(url, proxy_cfg=None):
+    """
+    Whether http_requests.async_request sends a request through the requests library instead of aiohttp: https
+    URLs, and requests made through an https proxy
+    """
+    single_proxy = proxy_cfg.get('http') if isinstance(proxy_cfg, dict) else proxy_cfg
+    if (proxy_cfg is not None and not single_proxy) or urlsplit(url).scheme == 'https':
+        return True
+    return bool(single_proxy) and urlsplit(single_proxy).scheme == 'https'
+
+
+def session_request(session, url, method='get', data=None, params=None, json=None, proxy_cfg=None, headers=None,
+                    timeout=None, raise_for_status=True, **kwargs):
+    """
+    Same request as http_requests.sync_request, made through a requests.Session, so its connections are kept alive
+    and reused by the next requests to the same host. Without a session, it is made on its own connection.
+    With raise_for_status=False, responses with an error status (4xx, 5xx) are returned instead of None
+    Returns: http_requests.AsyncResponse named tuple, or None if the request failed
+    """
+    request_logger = kwargs.pop('logger', logger)
+    if isinstance(proxy_cfg, str):
+        proxy_cfg = {"http": proxy_cfg, "https": proxy_cfg}
+    elif not isinstance(proxy_cfg, dict):
+        proxy_cfg = None
+    if isinstance(timeout, str):
+        timeout = int(timeout) if timeout.isdigit() else None
+    try:
+        request = session.request if session is not None else requests.request
+        resp = request(method, url, data=data, params=params, json=json, proxies=proxy_cfg,
+                       headers={**default_headers, **(headers or {})}, timeout=timeout, **kwargs)
+        if raise_for_status:
+            resp.raise_for_status()
+        try:
+            text = resp.text
+        except UnicodeError:
+            resp.encoding = default_encoding
+            text = resp.text
+    except requests.exceptions.RequestException as err:
+        request_logger.warning("requests => {} => {}: {}".format(type(err).__name__, url, err))
+        return None
+    response_info = HTTPInfo(url=resp.url, status_code=resp.status_code, headers=resp.headers,
+                             request_headers=resp.request.headers)
+    return AsyncResponse(type='requests', http_response=response_info, text=text)
+
+
+async def aiohttp_request(client, url, proxy_cfg=None, headers=None, timeout=None, **kwargs):
+    """
+    GET request made through aiohttp, as http_requests.async_request does, but responses with an error status
+    (4xx, 5xx) are returned instead of None
+    Returns: http_requests.AsyncResponse named tuple, or None if the request failed
+    """
+    request_logger = kwargs.pop('logger', logger)
+    if isinstance(proxy_cfg, dict):
+        proxy_cfg = proxy_cfg.get('http')
+    if timeout is not None and not isinstance(timeout, aiohttp.ClientTimeout):
+        timeout = aiohttp.ClientTimeout(total=float(timeout))
+    options = {'timeout': timeout} if timeout is not None else {}
+    try:
+        async with client.get(url, headers={**default_headers, **(headers or {})}, proxy=proxy_cfg,
+                              **options) as resp:
+            try:
+                text = await resp.text()
+            except UnicodeError:
+                text = await resp.text(encoding=default_encoding, errors='replace')
+            response_info = HTTPInfo(url=str(resp.url), status_code=resp.status, headers=dict(resp.headers),
+                                     request_headers=dict(resp.request_info.headers))
+    except (aiohttp.ClientError, asyncio.TimeoutError) as err:
+        request_logger.warning("aiohttp => {} => {}: {}".format(type(err).__name__, url, err))
+        return None
+    return AsyncResponse(type='aiohttp', http_response=response_info, text=text)
+
+
+class Downloader(object):
+    """
+    Single entry point for the HTTP requests made while crawling. It wraps the shared http_requests client and
+    bounds the number of requests in flight, both globally and for each host
+    """
+
+    def __init__(self, client, concurrency=None, concurrency_per_host=None, politeness=None, stats=None,
+                 memory_budget=None, session=None):
+        self.client = client
+        # requests.Session for the requests http_requests would make with requests (https ones), which otherwise
+        # open a new connection every time
+        self.session = session
+        self.politeness = politeness
+        # memory.MemoryBudget instance, whose response size limit applies to every request
+        self.memory_budget = memory_budget
+        self.stats = stats if stats is not None else CrawlStats()
+        self.concurrency = concurrency or DEFAULT_CONCURRENCY
+        self.concurrency_per_host = concurrency_per_host or DEFAULT_CONCURRENCY_PER_HOST
+        self._slots = asyncio.Semaphore(self.concurrency)
+        self._host_slots = {}
+
+    def _host_semaphore(self, host):
+        if host not in self._host_slots:
+            self._host_slots[host] = asyncio.Semaphore(self.concurrency_per_host)
+        return self._host_slots[host]
+
+    async def allowed(self, url, **request_kwargs):
+        """
+        Returns: False if the politeness policy (robots.txt) does not allow to download 'url'
+        """
+        if self.politeness is None:
+            return True
+        return await self.politeness.allowed(url, self, **request_kwargs)
+
+    async def fetch(self, url, throttle=True, source=None, error_status=False, **request_kwargs):
+        """
+        Download an URL through the shared client, waiting for a free slot for its host and a global one
+        Args:
+            url: URL to be requested
+            throttle: Wait for the rate limit of the host, if there is a politeness policy
+            source: URL of the source the request is made for, to account its bytes in the stats
+            error_status: Return the responses with an error status (4xx, 5xx) too, instead of None
+            **request_kwargs: Common options available for a http_requests.async_request function.
+                              A 'proxy' option is passed as 'proxy_cfg'. 'timeout' defaults to DEFAULT_TIMEOUT,
+                              None for no timeout
+
+        Returns: http_requests.AsyncResponse named tuple, or None if the request failed or the response is
+                 bigger than the limit of the memory budget
+
+        """
+        if throttle and self.politeness is not None:
+            await self.politeness.wait(url, self, **request_kwargs)
+        request_kwargs.setdefault('timeout', DEFAULT_TIMEOUT)
+        proxy = request_kwargs.pop('proxy', None)
+        if proxy and 'proxy_cfg' not in request_kwargs:
+            request_kwargs['proxy_cfg'] = proxy
+        # Host slot goes first, so a busy host does not keep global slots that other hosts could use
+        async with self._host_semaphore(url_host(url)):
+            async with self._slots:
+                self.stats.add_queue('requests_in_flight', 1)
+                response = None
+                try:
+                    requests_path = through_requests(url, request_kwargs.get('proxy_cfg'))
+                    if requests_path and (self.session is not None or error_status):
+                        response = await asyncio.get_event_loop().run_in_executor(
+                            None, functools.partial(session_request, self.session, url,
+                                                    raise_for_status=not error_status, **request_kwargs))
+                    elif error_status:
+                        # http_requests answers None for any error status
+                        response = await aiohttp_request(self.client, url, **request_kwargs)
+                    else:
+                        response = await async_request(url, client=self.client, close_client_at_end=False,
+                                                       **request_kwargs)
+                finally:
+                    self.stats.add_queue('requests_in_flight', -1)
+                    self.stats.add_request(response_size(response) if response is not None else None, source)
+        if response is not None and self.memory_budget is not None:
+            size = response_size(response)
+            if self.memory_budget.too_large(size):
+                logger.warning("Response of {} dropped, its {} bytes exceed the maximum size".format(url, size))
+                self.stats.add_error('too_large', source)
+                return None
+        return response
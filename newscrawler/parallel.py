@@ -0,0 +1,199 @@
+import asyncio
+import multiprocessing
+import os
+import queue
+import warnings
+import zlib
+
+from urllib.parse import urlsplit
+
+from .config import logger
+from .journal import open_journal
+from .stats import CrawlStats
+from .url_utilities import extract_domain, get_min_date
+
+_ARTICLE, _DONE, _FAILED = 'article', 'done', 'failed'
+# Event loop a forked worker inherits from the parent. It shares the epoll instance of the parent loop: if it were
+# closed (or garbage collected, which closes it), the parent loop would stop being woken up. So it is kept, unused
+_inherited_loop = None
+
+
+def shard_key(url):
+    """
+    Registered domain of an URL (as 'example.co.uk'). All the sources of a site go to the same worker, so its
+    limits per host and its politeness policy hold
+    """
+    netloc = urlsplit(url).netloc.lower()
+    domain = extract_domain(netloc)
+    if domain.domain and domain.suffix:
+        return domain.domain + '.' + domain.suffix
+    return netloc
+
+
+def shard_sources(urls, shards):
+    """
+    Split a list of sources in 'shards' lists by registered domain. A source always goes to the same shard
+    """
+    result = [[] for _ in range(shards)]
+    for url in urls:
+        result[zlib.crc32(shard_key(url).encode('utf-8')) % shards].append(url)
+    return result
+
+
+def _worker(index, urls, get_visited_links_function, visited_factory, sink_factory, results, scrap_kwargs):
+    from .webcrawler import scrap
+
+    global _inherited_loop
+
+    try:
+        # Every worker has its own event loop and client, never the ones inherited from the parent
+        try:
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore', DeprecationWarning)
+                _inherited_loop = asyncio.get_event_loop_policy().get_event_loop()
+        except RuntimeError:
+            pass
+        asyncio.set_event_loop(asyncio.new_event_loop())
+        if visited_factory is not None:
+            get_visited_links_function = visited_factory()
+        if sink_factory is not None:
+            add_article_function = sink_factory()
+        else:
+            def add_article_function(article):
+                results.put((_ARTICLE, index, article))
+        stats = scrap(urls, get_visited_links_function, add_article_function, **scrap_kwargs)
+        results.put((_DONE, index, stats))
+    except BaseException as err:
+        logger.error("scrap_parallel:: Worker {} failed: ".format(index) + repr(err))
+        results.put((_FAILED, index, repr(err)))
+
+
+def scrap_parallel(urls, get_visited_links_function=None, add_article_function=None, workers=None,
+                   request_kwargs=None, concurrency=None, concurrency_per_host=None, http_cache=None,
+                   politeness=None, lean_extraction=False, feeds=None, dedup=None, category_yields=None,
+                   journal=None, resume=False, redirects=None, memory_budget=None, max_age=None, since=None,
+                   visited_factory=None, sink_factory=None, max_pending=1000, start_method=None):
+    """
+    Scrap a collection of magazines URLs with several worker processes, so parsing uses all the CPU cores.
+    Sources are sharded across workers by registered domain, and every worker runs webcrawler.scrap over its
+    shard, with its own event loop and client.
+    With the 'spawn' and 'forkserver' start methods, functions and factories must be picklable
+    Args:
+        urls: List of URLs to be scraped
+        get_visited_links_function: Same as in webcrawler.scrap. Workers get a copy of it, so a VisitedStore must
+                                    keep its data out of the process (as SQLiteVisitedStore), or be created by
+                                    'visited_factory', for processed articles to be remembered
+        add_article_function: Callable called in this process with every article found by the workers
+        workers: Number of worker processes. By default, the number of CPU cores
+        request_kwargs: Same as in webcrawler.scrap
+        concurrency: Same as in webcrawler.scrap, for each worker
+        concurrency_per_host: Same as in webcrawler.scrap
+        http_cache: Same as in webcrawler.scrap. Workers can share the same directory
+        politeness: Same as in webcrawler.scrap
+        lean_extraction: Same as in webcrawler.scrap
+        feeds: Same as in webcrawler.scrap. Use a directory, for the workers to share what they find
+        dedup: Same as in webcrawler.scrap. Use the path of a SQLite database, for the workers to find the
+               duplicates of the articles found by the others
+        category_yields: Same as in webcrawler.scrap. Use the path of a SQLite database, for yields to be kept
+        journal: Same as in webcrawler.scrap, shared by every worker. Articles delivered through this process are
+                 recorded as soon as the workers send them
+        resume: Same as in webcrawler.scrap
+        redirects: Same as in webcrawler.scrap. Use the path of a SQLite database, for the workers to share it
+        memory_budget: Same as in webcrawler.scrap, for each worker
+        max_age: Same as in webcrawler.scrap. The cutoff is computed here, so every worker uses the same one
+        since: Same as in webcrawler.scrap
+        visited_factory: Callable without arguments, called in each worker to create its get_visited_links_function
+                         (as a SQLiteVisitedStore, whose connection can not be shared between processes)
+        sink_factory: Callable without arguments, called in each worker to create its add_article_function.
+                      Articles are then delivered by the workers instead of being sent to this process
+        max_pending: Maximum number of articles sent by the workers and not yet delivered by this process
+        start_method: multiprocessing start method. The platform default if it is None
+
+    Returns: stats.CrawlStats instance with the merged stats of all the workers
+
+    """
+    if get_visited_links_function is None and visited_factory is None:
+        msg = "scrap_parallel needs a get_visited_links_function or a visited_factory"
+        logger.error(msg)
+        raise AttributeError(msg)
+    if add_article_function is None and sink_factory is None:
+        msg = "scrap_parallel needs an add_article_function or a sink_factory"
+        logger.error(msg)
+        raise AttributeError(msg)
+    if add_article_function is not None and not callable(add_article_function):
+        msg = "add_article_function must be callable"
+        logger.error(msg)
+        raise AttributeError(msg)
+
+    shards = [shard for shard in shard_sources(urls, workers or os.cpu_count() or 1) if shard]
+    stats = CrawlStats()
+    if not shards:
+        return stats.finish()
+
+    since = get_min_date(max_age, since)
+    journal = open_journal(journal, resume)
+    if journal is not None:
+        # The run is reset here, once. Workers open the database on their own and always go on from it
+        journal.close()
+        journal, resume = journal.path, True
+
+    context = multiprocessing.get_context(start_method)
+    results = context.Queue(max_pending)
+    scrap_kwargs = dict(request_kwargs=request_kwargs, concurrency=concurrency,
+                        concurrency_per_host=concurrency_per_host, http_cache=http_cache, politeness=politeness,
+                        lean_extraction=lean_extraction, feeds=feeds, dedup=dedup,
+                        category_yields=category_yields, journal=journal, resume=resume, redirects=redirects,
+                        memory_budget=memory_budget, since=since)
+    processes = {}
+    for index, shard in enumerate(shards):
+        process = context.Process(target=_worker, name="newscrawler-worker-{}".format(index), daemon=True,
+                                  args=(index, shard, get_visited_links_function, visited_factory, sink_factory,
+                                        results, scrap_kwargs))
+        process.start()
+        processes[index] = process
+
+    running = set(processes)
+
+    def handle(kind, index, payload):
+        if kind == _ARTICLE:
+            try:
+                add_article_function(payload)
+            except Exception as err:
+                logger.error("scrap_parallel:: Error adding article {}: ".format(payload.get('url')) + str(err))
+                stats.add_error('sink')
+        elif kind == _DONE:
+            stats.merge(payload)
+            running.discard(index)
+        else:
+            stats.add_error('worker')
+            running.discard(index)
+
+    try:
+        while running:
+            try:
+                item = results.get(timeout=1)
+            except queue.Empty:
+                exited = [index for index in running if not processes[index].is_alive()]
+                if not exited:
+                    continue
+                # The last items of a worker may reach the queue after the timeout: they are handled before the
+                # worker is given up
+                while True:
+                    try:
+                        handle(*results.get_nowait())
+                    except queue.Empty:
+                        break
+                for index in exited:
+                    if index in running:
+                        logger.error("scrap_parallel:: Worker {} exited with code {}".format(
+                            index, processes[index].exitcode))
+                        stats.add_error('worker')
+                        running.discard(index)
+                continue
+            handle(*item)
+    finally:
+        for process in processes.values():
+            if running:
+                process.terminate()
+            process.join()
+    return stats.finish()
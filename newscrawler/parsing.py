@@ -0,0 +1,122 @@
+import os
+import pytz
+import threading
+
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime
+
+from .config import logger
+
+_lean = threading.local()
+
+
+def parse_article(url, html, source_url='', proxy=None, lean=False, min_date=None):
+    """
+    Extract the information kept for an article from its raw html.
+    It is a module level function, so it can be sent to a process pool
+    Args:
+        url: URL of the article
+        html: Raw html of the article
+        source_url: URL of the magazine the article belongs to
+        proxy: Proxy configuration, as accepted by config.format_proxy
+        lean: Use the lean extractor (config.newspaper.ContentExtractor.extract_article), which only computes
+              the kept fields, instead of the full newspaper.Article.parse
+        min_date: datetime.date instance. Articles published before it are abandoned. The lean extractor does it
+                  before extracting their text
+
+    Returns: Dictionary with 'url', 'title', 'text', 'date' and 'description' keys, or None if the article was
+             published before min_date
+
+    """
+    if lean:
+        article = lean_extractor().extract_article(url, html, source_url, min_date)
+        if article is None:
+            return None
+        return _article_fields(article["url"], article["title"], article["text"], article["meta_description"],
+                               article["publish_date"])
+
+    from .config import Article
+
+    article = Article(url=url, source_url=source_url, proxy=proxy)
+    article.set_html(html)
+    article.parse()
+    if min_date is not None:
+        from .config.newspaper import published_before
+
+        if published_before(article.publish_date, min_date):
+            return None
+    return _article_fields(article.url, article.title, article.text, article.meta_description,
+                           article.publish_date)
+
+
+def lean_extractor():
+    """
+    Lean article extractor of the current thread. It is created once and reused for every article
+    """
+    extractor = getattr(_lean, 'extractor', None)
+    if extractor is None:
+        from .config.newspaper import ContentExtractor
+
+        extractor = _lean.extractor = ContentExtractor()
+    return extractor
+
+
+def _article_fields(url, title, text, meta_description, publish_date):
+    title = title or ""
+    url = url or ""
+    description = meta_description or title
+    text = text or ""
+    if type(publish_date) == datetime:
+        date = publish_date.strftime(format="%Y-%m-%d")
+    elif publish_date not in ['', 'None', None]:
+        date = publish_date.split()[0]
+    else:
+        now = datetime.now().replace(tzinfo=pytz.UTC)
+        str_now = now.strftime(format="%Y-%m-%d")
+        date = str_now
+
+    return {
+        "url": url,
+        "title": title.replace("\'", "\""),
+        "text": text.strip().rstrip().replace("\'", "\""),
+        "date": date,
+        "description": description.replace("\'", "\""),
+    }
+
+
+def create_parse_executor(max_workers=None, processes=True):
+    """
+    Create an executor to parse articles out of the event loop thread
+    Args:
+        max_workers: Number of workers. Defaults to the number of CPU cores
+        processes: If True, try to use a process pool, falling back to a thread pool if the platform does not
+                   support it
+
+    Returns: concurrent.futures.Executor instance
+
+    """
+    max_workers = max_workers or os.cpu_count() or 1
+    if processes:
+        try:
+            return ProcessPoolExecutor(max_workers=max_workers)
+        except (ImportError, NotImplementedError, OSError) as err:
+            logger.warning("Process pool not available ({}), parsing articles in a thread pool".format(err))
+    return ThreadPoolExecutor(max_workers=max_workers)
+
+
+def get_parse_executor(parse_executor):
+    """
+    Resolve the 'parse_executor' option of the scraping functions
+    Args:
+        parse_executor: None to parse in the event loop thread, 'process' or 'thread' to create a pool sized to
+                        the CPU cores, or a concurrent.futures.Executor instance
+
+    Returns: Tuple (executor, owned), where 'owned' tells if the executor was created here and must be shut down
+             by the caller
+
+    """
+    if parse_executor is None or isinstance(parse_executor, Executor):
+        return parse_executor, False
+    if parse_executor in ('process', 'thread'):
+        return create_parse_executor(processes=parse_executor == 'process'), True
+    raise AttributeError("parse_executor must be None, 'process', 'thread' or a concurrent.futures.Executor")
@@ -0,0 +1,165 @@
+import asyncio
+import time
+
+from urllib.parse import urlsplit
+from urllib.robotparser import RobotFileParser
+
+from .config import logger
+
+
+class TokenBucket(object):
+    """
+    Token bucket rate limiter: 'rate' requests per second, with bursts of up to 'burst' requests
+    """
+
+    def __init__(self, rate, burst=1):
+        self.rate = float(rate)
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def set_rate(self, rate, burst=None):
+        self._refill()
+        self.rate = float(rate)
+        if burst is not None:
+            self.burst = burst
+            self.tokens = min(self.tokens, burst)
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self):
+        self._refill()
+        # The token is taken right away, even if it is not there yet: waiters get their turn in order
+        self.tokens -= 1
+        if self.tokens < 0:
+            await asyncio.sleep(-self.tokens / self.rate)
+
+
+class RobotsCache(object):
+    """
+    robots.txt files of the visited hosts, downloaded once and kept for 'ttl' seconds.
+    Answers are read as urllib.robotparser does: a 401 or 403 disallows everything, any other 4xx (no robots.txt)
+    allows everything. A 5xx disallows everything and a failed download allows it, but both are only kept for
+    'failure_ttl' seconds, as they are temporary
+    """
+
+    def __init__(self, ttl=86400, failure_ttl=600):
+        self.ttl = ttl
+        self.failure_ttl = failure_ttl
+        self._entries = {}
+        self._loading = {}
+
+    async def get(self, url, downloader, **request_kwargs):
+        """
+        Returns: urllib.robotparser.RobotFileParser of the host of 'url'
+        """
+        parts = urlsplit(url)
+        host = parts.netloc.lower()
+        entry = self._entries.get(host)
+        if entry is not None and entry[0] > time.monotonic():
+            return entry[1]
+
+        task = self._loading.get(host)
+        if task is None:
+            task = asyncio.ensure_future(self._load(parts.scheme, host, downloader, request_kwargs))
+            self._loading[host] = task
+            task.add_done_callback(lambda _: self._loading.pop(host, None))
+        # A cancelled waiter must not cancel the download other requests are waiting for
+        return await asyncio.shield(task)
+
+    async def _load(self, scheme, host, downloader, request_kwargs):
+        robots_url = "{}://{}/robots.txt".format(scheme, host)
+        parser = RobotFileParser(robots_url)
+        # Headers of the original request (as the conditional ones) do not apply to robots.txt
+        request_kwargs = {k: v for k, v in request_kwargs.items() if k != 'headers'}
+        try:
+            response = await downloader.fetch(robots_url, throttle=False, error_status=True, **request_kwargs)
+        except Exception as err:
+            logger.warning("RobotsCache:: Error downloading {}: ".format(robots_url) + str(err))
+            response = None
+        ttl = self.ttl
+        status = response.http_response.status_code if response is not None else None
+        if status is None:
+            parser.allow_all = True
+            ttl = self.failure_ttl
+        elif status in (401, 403):
+            parser.disallow_all = True
+        elif 400 <= status < 500:
+            parser.allow_all = True
+        elif status >= 500:
+            parser.disallow_all = True
+            ttl = self.failure_ttl
+        else:
+            parser.parse(response.text.splitlines())
+        self._entries[host] = (time.monotonic() + ttl, parser)
+        return parser
+
+
+class Politeness(object):
+    """
+    Per domain politeness policy: a token bucket rate limit for every host, and the rules of its robots.txt.
+    A Crawl-delay found in robots.txt lowers the rate of its host
+    """
+
+    def __init__(self, rate=2.0, burst=5, robots=True, robots_ttl=86400, user_agent='*'):
+        """
+        Args:
+            rate: Maximum requests per second to the same host
+            burst: Maximum requests to the same host sent at once, if it has not been visited for a while
+            robots: Honour robots.txt files (disallowed articles and Crawl-delay)
+            robots_ttl: Seconds a robots.txt is kept before downloading it again
+            user_agent: User agent whose robots.txt rules apply
+        """
+        self.rate = rate
+        self.burst = burst
+        self.robots = RobotsCache(robots_ttl) if robots else None
+        self.user_agent = user_agent
+        self._buckets = {}
+
+    def _bucket(self, host):
+        if host not in self._buckets:
+            self._buckets[host] = TokenBucket(self.rate, self.burst)
+        return self._buckets[host]
+
+    async def _robots(self, url, downloader, **request_kwargs):
+        parser = await self.robots.get(url, downloader, **request_kwargs)
+        delay = parser.crawl_delay(self.user_agent)
+        if delay:
+            bucket = self._bucket(urlsplit(url).netloc.lower())
+            rate = min(self.rate, 1.0 / float(delay))
+            if rate != bucket.rate:
+                bucket.set_rate(rate, burst=1)
+        return parser
+
+    async def wait(self, url, downloader, **request_kwargs):
+        """
+        Wait until a request to the host of 'url' is allowed by its rate limit
+        """
+        if self.robots is not None:
+            await self._robots(url, downloader, **request_kwargs)
+        await self._bucket(urlsplit(url).netloc.lower()).acquire()
+
+    async def allowed(self, url, downloader, **request_kwargs):
+        """
+        Returns: False if the robots.txt of the host disallows 'url'
+        """
+        if self.robots is None:
+            return True
+        parser = await self._robots(url, downloader, **request_kwargs)
+        return parser.can_fetch(self.user_agent, url)
+
+
+def get_politeness(politeness):
+    """
+    Args:
+        politeness: None or False to disable it, True for the default policy, or a Politeness instance
+
+    Returns: Politeness instance or None
+
+    """
+    if politeness is True:
+        return Politeness()
+    return politeness or None
@@ -0,0 +1,136 @@
+import asyncio
+import sqlite3
+import time
+
+from urllib.parse import urlsplit
+
+from .config import logger
+
+
+def normalize_source_url(url):
+    """
+    Canonical form of the URL of a source, as used for its categories: without trailing slashes but one
+    """
+    return url.strip("/") + "/"
+
+
+class RedirectCache(object):
+    """
+    Final URL each source URL redirects to, kept for 'ttl' seconds. URLs that could not be resolved are kept
+    for 'failure_ttl' seconds, so they are not requested again right away.
+    Entries are kept in memory and, if a path is given, in a SQLite database, so they last between runs
+    """
+
+    def __init__(self, path=None, ttl=86400, failure_ttl=3600):
+        """
+        Args:
+            path: SQLite database where entries are stored, or None to keep them in memory only
+            ttl: Seconds an URL is considered to keep on redirecting to the same place
+            failure_ttl: Seconds before trying again an URL that could not be resolved
+        """
+        self.path = path
+        self.ttl = ttl
+        self.failure_ttl = failure_ttl
+        self._entries = {}
+        self._conn = None
+        if path is not None:
+            self._conn = sqlite3.connect(path, timeout=30)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS redirects (url TEXT PRIMARY KEY, final_url TEXT, resolved REAL NOT NULL)")
+            self._conn.commit()
+
+    def _load(self, url):
+        entry = self._entries.get(url)
+        if entry is None and self._conn is not None:
+            row = self._conn.execute("SELECT final_url, resolved FROM redirects WHERE url = ?", (url,)).fetchone()
+            if row is not None:
+                entry = self._entries[url] = row
+        return entry
+
+    def get(self, url):
+        """
+        Returns: Tuple (found, final_url). 'found' is False if the URL has to be resolved. 'final_url' is None
+                 for URLs that could not be resolved
+        """
+        entry = self._load(url)
+        if entry is None:
+            return False, None
+        final_url, resolved = entry
+        ttl = self.ttl if final_url is not None else self.failure_ttl
+        if resolved + ttl < time.time():
+            return False, None
+        return True, final_url
+
+    def set(self, url, final_url):
+        entry = self._entries[url] = (final_url, time.time())
+        if self._conn is not None:
+            try:
+                with self._conn:
+                    self._conn.execute("INSERT OR REPLACE INTO redirects (url, final_url, resolved) VALUES (?, ?, ?)",
+                                       (url,) + entry)
+            except sqlite3.Error as err:
+                logger.warning("RedirectCache:: Unable to store {}: ".format(url) + str(err))
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+
+
+def get_redirect_cache(redirects):
+    """
+    Args:
+        redirects: None or False to disable it, True for an in memory RedirectCache, the path of its SQLite
+                   database, or a RedirectCache instance
+
+    Returns: RedirectCache instance or None
+
+    """
+    if redirects is None or redirects is False or isinstance(redirects, RedirectCache):
+        return redirects
+    if redirects is True:
+        return RedirectCache()
+    return RedirectCache(redirects)
+
+
+async def resolve_url(url, downloader, cache=None, **request_kwargs):
+    """
+    Final URL of a source after following its redirections. It is requested with HEAD, and with GET if the
+    server does not answer HEAD requests properly
+    Args:
+        url: URL to be resolved. 'http://' is added if it has no scheme
+        downloader: network.Downloader instance
+        cache: RedirectCache instance or None
+        **request_kwargs: Common options available for a http_requests.async_request function
+
+    Returns: Normalized final URL (see normalize_source_url), or None if it could not be requested
+
+    """
+    if cache is not None:
+        found, final_url = cache.get(url)
+        if found:
+            return final_url
+    request_url = url if urlsplit(url).scheme else "http://" + url
+    response = None
+    for method in ('head', 'get'):
+        try:
+            response = await downloader.fetch(request_url, method=method, allow_redirects=True, **request_kwargs)
+        except Exception as err:
+            logger.warning("resolve_url:: Error requesting {} with {}: ".format(request_url, method.upper()) +
+                           str(err))
+            response = None
+        if response is not None:
+            break
+    final_url = normalize_source_url(response.http_response.url) if response is not None else None
+    if cache is not None:
+        cache.set(url, final_url)
+    return final_url
+
+
+async def resolve_urls(urls, downloader, cache=None, **request_kwargs):
+    """
+    Resolve many URLs concurrently, within the limits of the downloader
+    Returns: Dictionary with the final URL of every URL (None for the ones that could not be resolved)
+    """
+    urls = list(dict.fromkeys(urls))
+    results = await asyncio.gather(*[resolve_url(url, downloader, cache, **request_kwargs) for url in urls])
+    return dict(zip(urls, results))
@@ -0,0 +1,258 @@
+import asyncio
+import heapq
+import itertools
+
+from http_requests import create_client, get_valid_loop
+
+from .config import logger
+from .categories import get_category_yields
+from .dedup import get_deduplicator
+from .feeds import get_feed_store
+from .memory import get_memory_budget
+from .redirects import get_redirect_cache
+from .httpcache import get_http_cache
+from .network import DEFAULT_CONCURRENCY, DEFAULT_CONCURRENCY_PER_HOST, Downloader
+from .parsing import get_parse_executor
+from .politeness import get_politeness
+from .sinks import as_article_sink
+from .stats import CrawlStats
+from .url_utilities import get_min_date
+from .visited import as_visited_store
+from .webcrawler import _check_scrap_functions, _prepare_request_kwargs, add_callback
+
+
+class SourceState(object):
+    """
+    Crawling history of a source, as seen by the scheduler
+    """
+
+    def __init__(self, url, interval):
+        self.url = url
+        self.interval = interval
+        self.next_crawl = 0
+        self.last_crawl = None
+        self.last_yield = 0
+        # Smoothed number of new articles per second
+        self.rate = 0.0
+        self.crawls = 0
+
+    def __repr__(self):
+        return "SourceState({!r}, interval={:.0f}s, rate={:.5f}/s)".format(self.url, self.interval, self.rate)
+
+
+class RecrawlScheduler(object):
+    """
+    Long running crawler for large lists of sources. Every source has its own recrawl interval, adapted to the
+    number of new articles found on each crawl, so busy sources are polled often and dormant ones rarely.
+    Sources due for crawling are taken from a priority queue, with at most 'max_sources' crawled at the same time
+    """
+
+    def __init__(self, get_visited_links_function, add_article_function, request_kwargs=None,
+                 concurrency=None, concurrency_per_host=None, parse_executor=None, http_cache=None,
+                 politeness=None, lean_extraction=False, feeds=None, dedup=None, category_yields=None,
+                 redirects=None, memory_budget=None, max_age=None, since=None, max_sources=20, initial_interval=900,
+                 min_interval=120, max_interval=86400, target_yield=5, backoff=1.5, smoothing=0.3):
+        """
+        Args:
+            get_visited_links_function: Same as in webcrawler.scrap. Use a VisitedStore that persists between runs
+            add_article_function: Same as in webcrawler.scrap
+            request_kwargs: Same as in webcrawler.scrap
+            concurrency: Same as in webcrawler.scrap
+            concurrency_per_host: Same as in webcrawler.scrap
+            parse_executor: Same as in webcrawler.scrap
+            http_cache: Same as in webcrawler.scrap
+            politeness: Same as in webcrawler.scrap
+            lean_extraction: Same as in webcrawler.scrap
+            feeds: Same as in webcrawler.scrap
+            dedup: Same as in webcrawler.scrap
+            category_yields: Same as in webcrawler.scrap
+            redirects: Same as in webcrawler.scrap
+            memory_budget: Same as in webcrawler.scrap
+            max_age: Same as in webcrawler.scrap. The cutoff moves forward on every crawl
+            since: Same as in webcrawler.scrap
+            max_sources: Maximum number of sources crawled at the same time
+            initial_interval: Seconds between the first crawls of a source
+            min_interval: Minimum seconds between crawls of a source
+            max_interval: Maximum seconds between crawls of a source
+            target_yield: Number of new articles expected on each crawl. The interval of a source is the time it
+                          takes to publish them, according to its observed rate
+            backoff: Factor applied to the interval of a source which has never yielded new articles
+            smoothing: Weight of the last crawl in the rate of new articles of a source (exponential average)
+        """
+        _check_scrap_functions(get_visited_links_function, add_article_function)
+        self.visited_store = as_visited_store(get_visited_links_function)
+        self.sink = as_article_sink(add_article_function)
+        self.request_kwargs = _prepare_request_kwargs(request_kwargs)
+        self.concurrency = concurrency or DEFAULT_CONCURRENCY
+        self.concurrency_per_host = concurrency_per_host or DEFAULT_CONCURRENCY_PER_HOST
+        self.parse_executor = parse_executor
+        self.http_cache = get_http_cache(http_cache)
+        self.politeness = get_politeness(politeness)
+        self.lean_extraction = lean_extraction
+        self.feed_store = get_feed_store(feeds)
+        self.category_yields = get_category_yields(category_yields)
+        self.redirect_cache = get_redirect_cache(redirects)
+        self.memory_budget = get_memory_budget(memory_budget)
+        # Checked here, but resolved on every crawl, as max_age is relative to it
+        get_min_date(max_age, since)
+        self.max_age = max_age
+        self.since = since
+        self.max_sources = max_sources
+        self.initial_interval = initial_interval
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.target_yield = target_yield
+        self.backoff = backoff
+        self.smoothing = smoothing
+
+        self.stats = CrawlStats()
+        self.sink.stats = self.stats
+        self.sink.visited_store = self.visited_store
+        if dedup is not None:
+            self.sink.dedup = get_deduplicator(dedup)
+        self.sources = {}
+        self._queue = []
+        self._counter = itertools.count()
+        self._wakeup = None
+        self._stopped = False
+        # Crawls in progress, while running
+        self._running = set()
+
+    def add_source(self, url, interval=None):
+        """
+        Add a source, to be crawled as soon as possible
+        """
+        if url in self.sources:
+            return
+        state = SourceState(url, interval or self.initial_interval)
+        self.sources[url] = state
+        self._push(state)
+
+    def remove_source(self, url):
+        # Its entries in the queue are discarded when they come out
+        self.sources.pop(url, None)
+
+    def stop(self):
+        """
+        Stop the scheduler. Crawls in progress are cancelled
+        """
+        self._stopped = True
+        if self._wakeup is not None:
+            self._wakeup.set()
+        # Their slots are released as they finish, so run does not keep on waiting for one
+        for task in list(self._running):
+            task.cancel()
+
+    def _push(self, state):
+        heapq.heappush(self._queue, (state.next_crawl, next(self._counter), state.url))
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _next_due(self, loop):
+        """
+        Wait for the next source due for crawling
+        Returns: SourceState of the source, or None if the scheduler has been stopped
+        """
+        while not self._stopped:
+            self._wakeup.clear()
+            timeout = None
+            if self._queue:
+                next_crawl, _, url = self._queue[0]
+                state = self.sources.get(url)
+                if state is None or state.next_crawl != next_crawl:
+                    # Removed or rescheduled source
+                    heapq.heappop(self._queue)
+                    continue
+                timeout = next_crawl - loop.time()
+                if timeout <= 0:
+                    heapq.heappop(self._queue)
+                    return state
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def _reschedule(self, state, new_articles, now):
+        elapsed = now - state.last_crawl if state.last_crawl is not None else state.interval
+        rate = new_articles / max(elapsed, 1)
+        if state.crawls == 0:
+            state.rate = rate
+        else:
+            state.rate = self.smoothing * rate + (1 - self.smoothing) * state.rate
+
+        if state.rate > 0:
+            interval = self.target_yield / state.rate
+        else:
+            interval = state.interval * self.backoff
+        state.interval = min(self.max_interval, max(self.min_interval, interval))
+        state.last_crawl = now
+        state.last_yield = new_articles
+        state.crawls += 1
+        state.next_crawl = now + state.interval
+
+    async def _crawl(self, state, downloader, loop, parse_executor):
+        try:
+            _, new_articles = await add_callback(state.url, downloader, self.visited_store, self.sink, loop,
+                                                 parse_executor, self.http_cache, self.lean_extraction,
+                                                 self.feed_store, self.category_yields,
+                                                 redirect_cache=self.redirect_cache,
+                                                 min_date=get_min_date(self.max_age, self.since), **self.request_kwargs)
+        except Exception as err:
+            logger.error("RecrawlScheduler:: Error crawling {}: ".format(state.url) + str(err))
+            new_articles = 0
+        if self.sources.get(state.url) is not state:
+            return
+        self._reschedule(state, new_articles, loop.time())
+        logger.info("{} new articles for {}, next crawl in {:.0f} seconds".format(
+            new_articles, state.url, state.interval))
+        self._push(state)
+
+    async def run(self, duration=None):
+        """
+        Crawl the sources until the scheduler is stopped, or for 'duration' seconds
+        """
+        loop = asyncio.get_event_loop()
+        self._stopped = False
+        self._wakeup = asyncio.Event()
+        stop_timer = loop.call_later(duration, self.stop) if duration is not None else None
+
+        slots = asyncio.Semaphore(self.max_sources)
+        running = self._running = set()
+
+        def crawl_done(task):
+            running.discard(task)
+            slots.release()
+
+        parse_executor, own_executor = get_parse_executor(self.parse_executor)
+        async with create_client(loop=loop, connections_limit=self.concurrency,
+                                 connections_limit_per_host=self.concurrency_per_host) as client:
+            downloader = Downloader(client, self.concurrency, self.concurrency_per_host, self.politeness,
+                                    self.stats, self.memory_budget)
+            self.sink.start()
+            try:
+                while not self._stopped:
+                    await slots.acquire()
+                    state = await self._next_due(loop)
+                    if state is None:
+                        slots.release()
+                        break
+                    task = asyncio.ensure_future(self._crawl(state, downloader, loop, parse_executor))
+                    running.add(task)
+                    task.add_done_callback(crawl_done)
+            finally:
+                # A timer left behind would stop the next run on this loop
+                if stop_timer is not None:
+                    stop_timer.cancel()
+                for task in list(running):
+                    task.cancel()
+                await asyncio.gather(*running, return_exceptions=True)
+                await self.sink.close()
+                if own_executor:
+                    parse_executor.shutdown()
+
+    def run_forever(self, duration=None):
+        """
+        Synchronous version of run
+        """
+        loop = get_valid_loop()
+        loop.run_until_complete(self.run(duration))
@@ -0,0 +1,236 @@
+import asyncio
+import inspect
+import time
+
+from .config import logger
+
+_CLOSE = object()
+
+
+def _is_coroutine_function(func):
+    return inspect.iscoroutinefunction(func) or inspect.iscoroutinefunction(getattr(func, '__call__', None))
+
+
+class ArticleSink(object):
+    """
+    Buffer between the download pipeline and the function that stores the articles.
+    Articles are delivered in batches, by size or by time, out of the event loop thread for synchronous functions.
+    When 'max_pending' articles are waiting to be delivered, the pipeline stops until the function catches up
+    """
+
+    def __init__(self, add_article_function, batch_size=None, flush_interval=1.0, max_pending=1000, executor=None):
+        """
+        Args:
+            add_article_function: Sync or async callable. It receives an article dictionary, or a list of them if
+                                  'batch_size' is set
+            batch_size: Number of articles delivered together. If None, the function is called once per article
+            flush_interval: Maximum seconds an article waits for its batch to be completed. If None, only full
+                            batches (and the last one) are delivered
+            max_pending: Maximum number of articles waiting to be delivered
+            executor: concurrent.futures.Executor where synchronous functions run. Defaults to the loop's one.
+                      Calls are never concurrent, a batch is delivered after the previous one has finished
+        """
+        if not callable(add_article_function):
+            raise AttributeError("add_article_function must be callable")
+        self.add_article_function = add_article_function
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.executor = executor
+        self._is_coroutine = _is_coroutine_function(add_article_function)
+        # stats.CrawlStats instance where delivery times are recorded, set by the crawler using the sink
+        self.stats = None
+        # dedup.Deduplicator instance that drops (or tags) near-duplicates before they are buffered
+        self.dedup = None
+        # journal.CrawlJournal instance where articles are recorded once delivered (or dropped)
+        self.journal = None
+        # visited.VisitedStore instance where articles are recorded as visited once delivered (or dropped)
+        self.visited_store = None
+        self._queue = None
+        self._worker = None
+
+    def start(self):
+        if self._worker is None:
+            self._queue = asyncio.Queue(maxsize=self.max_pending)
+            self._worker = asyncio.ensure_future(self._run())
+
+    async def put(self, article, key=None):
+        """
+        Add an article to the buffer, waiting while it is full
+        Args:
+            article: Article dictionary
+            key: (source URL, article URL) tuple recorded in the journal and the visited store once the article is
+                 delivered
+
+        Returns: False if the article has been dropped as a near-duplicate, True otherwise
+
+        """
+        if self.dedup is not None:
+            article = self._deduplicate(article)
+            if article is None:
+                self._done([key])
+                return False
+        self.start()
+        await self._queue.put((article, key))
+        return True
+
+    def discard(self, key):
+        """
+        Record an article that is not going to be delivered as done: it is not pending in the journal any more,
+        and it is visited
+        Args:
+            key: (source URL, article URL) tuple
+        """
+        self._done([key])
+
+    def _done(self, keys):
+        """
+        Record articles delivered (or dropped) in the journal and the visited store. Failed ones are not, so they
+        are tried again
+        """
+        keys = [key for key in keys if key is not None]
+        if not keys:
+            return
+        if self.journal is not None:
+            try:
+                self.journal.articles_done(keys)
+            except Exception as err:
+                logger.error("ArticleSink:: Error recording delivered articles in the journal: " + str(err))
+        if self.visited_store is not None:
+            by_source = {}
+            for source_url, article_url in keys:
+                by_source.setdefault(source_url, []).append(article_url)
+            for source_url, article_urls in by_source.items():
+                try:
+                    self.visited_store.add(source_url, article_urls)
+                except Exception as err:
+                    logger.error("ArticleSink:: Error recording visited links for {}: ".format(source_url) + str(err))
+
+    def _deduplicate(self, article):
+        """
+        Returns: The article, tagged with 'duplicate_of' if it is a near-duplicate, or None if it has to be dropped
+        """
+        source = article.get('source')
+        start = time.perf_counter()
+        try:
+            original = self.dedup.check(article)
+        except Exception as err:
+            logger.error("ArticleSink:: Error looking for duplicates of {}: ".format(article.get('url')) + str(err))
+            original = None
+        if self.stats is not None:
+            self.stats.add_time('dedup', time.perf_counter() - start, source)
+        if original is None:
+            return article
+        if self.stats is not None and source is not None:
+            self.stats.source(source).duplicates += 1
+        logger.info("Article '{}' is a near-duplicate of '{}'".format(article.get('url'), original))
+        if self.dedup.mode == 'drop':
+            return None
+        return dict(article, duplicate_of=original)
+
+    async def close(self):
+        """
+        Deliver every pending article and stop the sink. It can be started again later
+        """
+        if self._worker is None:
+            return
+        await self._queue.put(_CLOSE)
+        try:
+            await self._worker
+        finally:
+            self._queue = self._worker = None
+
+    def cancel(self):
+        """
+        Stop the sink right away, dropping the pending articles
+        """
+        if self._worker is not None:
+            self._worker.cancel()
+            self._queue = self._worker = None
+
+    @property
+    def pending(self):
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def _run(self):
+        loop = asyncio.get_event_loop()
+        batch_size = self.batch_size or 1
+        batch, deadline, getter = [], None, None
+        closing = False
+        try:
+            while not closing:
+                if getter is None:
+                    getter = asyncio.ensure_future(self._queue.get())
+                timeout = None if deadline is None else max(0, deadline - loop.time())
+                # Unlike wait_for, asyncio.wait does not cancel the getter on timeout, so no article is lost
+                done, _ = await asyncio.wait([getter], timeout=timeout)
+                if getter in done:
+                    item, getter = getter.result(), None
+                    if item is _CLOSE:
+                        closing = True
+                    else:
+                        batch.append(item)
+                        if deadline is None and self.flush_interval is not None:
+                            deadline = loop.time() + self.flush_interval
+                expired = deadline is not None and loop.time() >= deadline
+                if batch and (closing or expired or len(batch) >= batch_size):
+                    await self._flush(batch)
+                    batch, deadline = [], None
+        finally:
+            if getter is not None:
+                getter.cancel()
+
+    async def _flush(self, batch):
+        start = time.perf_counter()
+        if self.batch_size:
+            delivered = batch if (await self._deliver_payloads([[article for article, _ in batch]]))[0] else []
+        else:
+            results = await self._deliver_payloads([article for article, _ in batch])
+            delivered = [item for item, ok in zip(batch, results) if ok]
+        # Articles that could not be delivered stay pending in the journal, and are not visited
+        self._done([key for _, key in delivered])
+        if self.stats is not None:
+            for _, key in delivered:
+                if key is not None:
+                    self.stats.source(key[0]).articles_processed += 1
+            self.stats.add_time('sink_flush', time.perf_counter() - start)
+
+    async def _deliver_payloads(self, payloads):
+        """
+        Returns: List telling, for each payload, if it was delivered
+        """
+        if not self._is_coroutine:
+            return await asyncio.get_event_loop().run_in_executor(self.executor, self._deliver, payloads)
+        results = []
+        for payload in payloads:
+            try:
+                await self.add_article_function(payload)
+                results.append(True)
+            except Exception as err:
+                logger.error("ArticleSink:: Error delivering articles: " + str(err))
+                results.append(False)
+        return results
+
+    def _deliver(self, payloads):
+        results = []
+        for payload in payloads:
+            try:
+                self.add_article_function(payload)
+                results.append(True)
+            except Exception as err:
+                logger.error("ArticleSink:: Error delivering articles: " + str(err))
+                results.append(False)
+        return results
+
+
+def as_article_sink(add_article_function):
+    """
+    Args:
+        add_article_function: ArticleSink instance, or callable that accepts an article dictionary
+
+    Returns: ArticleSink instance
+
+    """
+    if isinstance(add_article_function, ArticleSink):
+        return add_article_function
+    return ArticleSink(add_article_function)
@@ -0,0 +1,293 @@
+import time
+
+from contextlib import contextmanager
+
+STAGES = ('feeds', 'homepage', 'categories', 'classification', 'filtering', 'article_fetch', 'parse', 'dedup', 'sink')
+
+
+class StageStats(object):
+    """
+    Wall time spent in a crawl stage
+    """
+    __slots__ = ('calls', 'seconds', 'max_seconds')
+
+    def __init__(self):
+        self.calls = 0
+        self.seconds = 0.0
+        self.max_seconds = 0.0
+
+    def add(self, seconds):
+        self.calls += 1
+        self.seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+
+    def merge(self, other):
+        self.calls += other.calls
+        self.seconds += other.seconds
+        self.max_seconds = max(self.max_seconds, other.max_seconds)
+
+    def to_dict(self):
+        return {"calls": self.calls, "seconds": self.seconds, "max_seconds": self.max_seconds}
+
+
+class SourceStats(object):
+    """
+    Counters of a single source
+    """
+
+    def __init__(self, url):
+        self.url = url
+        self.stages = {}
+        self.bytes_downloaded = 0
+        self.articles_found = 0
+        self.articles_processed = 0
+        self.duplicates = 0
+        self.categories_skipped = 0
+        # Links dropped for their URL date, and articles abandoned for their publish date, older than the cutoff
+        self.stale_links = 0
+        self.stale_articles = 0
+        self.errors = {}
+        # Reason of the last failure finding the articles of the source
+        self.last_error = None
+
+    def merge(self, other):
+        _merge_stages(self.stages, other.stages)
+        _merge_counts(self.errors, other.errors)
+        self.bytes_downloaded += other.bytes_downloaded
+        self.articles_found += other.articles_found
+        self.articles_processed += other.articles_processed
+        self.duplicates += other.duplicates
+        self.categories_skipped += other.categories_skipped
+        self.stale_links += other.stale_links
+        self.stale_articles += other.stale_articles
+        self.last_error = other.last_error or self.last_error
+
+    def to_dict(self):
+        return {
+            "url": self.url,
+            "stages": {stage: s.to_dict() for stage, s in self.stages.items()},
+            "bytes_downloaded": self.bytes_downloaded,
+            "articles_found": self.articles_found,
+            "articles_processed": self.articles_processed,
+            "duplicates": self.duplicates,
+            "categories_skipped": self.categories_skipped,
+            "stale_links": self.stale_links,
+            "stale_articles": self.stale_articles,
+            "errors": dict(self.errors),
+            "last_error": self.last_error,
+        }
+
+
+class CrawlStats(object):
+    """
+    Instrumentation of a crawl: time per stage (total and per source), bytes downloaded, requests, errors and
+    queue depths. Returned by webcrawler.scrap
+    """
+
+    def __init__(self):
+        self.started = time.time()
+        self.finished = None
+        self.stages = {}
+        self.sources = {}
+        self.requests = 0
+        self.failed_requests = 0
+        self.bytes_downloaded = 0
+        self.errors = {}
+        self.queues = {}
+        self.max_queues = {}
+
+    def source(self, url):
+        if url not in self.sources:
+            self.sources[url] = SourceStats(url)
+        return self.sources[url]
+
+    def add_time(self, stage, seconds, source=None):
+        self.stages.setdefault(stage, StageStats()).add(seconds)
+        if source is not None:
+            self.source(source).stages.setdefault(stage, StageStats()).add(seconds)
+
+    @contextmanager
+    def timer(self, stage, source=None):
+        """
+        Context manager that adds the time spent inside it to 'stage'
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(stage, time.perf_counter() - start, source)
+
+    def add_request(self, nbytes=None, source=None):
+        """
+        Count a request. 'nbytes' is None for failed requests
+        """
+        self.requests += 1
+        if nbytes is None:
+            self.failed_requests += 1
+            return
+        self.bytes_downloaded += nbytes
+        if source is not None:
+            self.source(source).bytes_downloaded += nbytes
+
+    def add_error(self, stage, source=None):
+        self.errors[stage] = self.errors.get(stage, 0) + 1
+        if source is not None:
+            errors = self.source(source).errors
+            errors[stage] = errors.get(stage, 0) + 1
+
+    def set_queue(self, name, depth):
+        self.queues[name] = depth
+        self.max_queues[name] = max(self.max_queues.get(name, 0), depth)
+
+    def add_queue(self, name, delta):
+        self.set_queue(name, self.queues.get(name, 0) + delta)
+
+    def finish(self):
+        self.finished = time.time()
+        return self
+
+    def merge(self, other):
+        """
+        Add the stats of another crawl, as those of the workers of parallel.scrap_parallel.
+        Queue depths are added up, and their maximums are the largest of both
+        Returns: self
+        """
+        self.started = min(self.started, other.started)
+        if other.finished is not None:
+            self.finished = max(self.finished or other.finished, other.finished)
+        _merge_stages(self.stages, other.stages)
+        for url, source in other.sources.items():
+            self.source(url).merge(source)
+        self.requests += other.requests
+        self.failed_requests += other.failed_requests
+        self.bytes_downloaded += other.bytes_downloaded
+        _merge_counts(self.errors, other.errors)
+        _merge_counts(self.queues, other.queues)
+        for name, depth in other.max_queues.items():
+            self.max_queues[name] = max(self.max_queues.get(name, 0), depth)
+        return self
+
+    @property
+    def elapsed(self):
+        return (self.finished or time.time()) - self.started
+
+    @property
+    def articles_found(self):
+        return sum(s.articles_found for s in self.sources.values())
+
+    @property
+    def articles_processed(self):
+        return sum(s.articles_processed for s in self.sources.values())
+
+    @property
+    def duplicates(self):
+        return sum(s.duplicates for s in self.sources.values())
+
+    @property
+    def categories_skipped(self):
+        return sum(s.categories_skipped for s in self.sources.values())
+
+    @property
+    def stale_links(self):
+        return sum(s.stale_links for s in self.sources.values())
+
+    @property
+    def stale_articles(self):
+        return sum(s.stale_articles for s in self.sources.values())
+
+    def to_dict(self):
+        return {
+            "started": self.started,
+            "finished": self.finished,
+            "elapsed": self.elapsed,
+            "stages": {stage: s.to_dict() for stage, s in self.stages.items()},
+            "requests": self.requests,
+            "failed_requests": self.failed_requests,
+            "bytes_downloaded": self.bytes_downloaded,
+            "articles_found": self.articles_found,
+            "articles_processed": self.articles_processed,
+            "duplicates": self.duplicates,
+            "categories_skipped": self.categories_skipped,
+            "stale_links": self.stale_links,
+            "stale_articles": self.stale_articles,
+            "errors": dict(self.errors),
+            "queues": dict(self.queues),
+            "max_queues": dict(self.max_queues),
+            "sources": {url: s.to_dict() for url, s in self.sources.items()},
+        }
+
+    def to_prometheus(self, prefix='newscrawler', per_source=False):
+        """
+        Export the stats in Prometheus text exposition format
+        Args:
+            prefix: Prefix of the metric names
+            per_source: Include the time per stage and source. Beware of the number of series with many sources
+
+        Returns: String
+
+        """
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            lines.append("# HELP {}_{} {}".format(prefix, name, help_text))
+            lines.append("# TYPE {}_{} {}".format(prefix, name, kind))
+            for labels, value in samples:
+                label_text = ",".join('{}="{}"'.format(k, _escape(v)) for k, v in labels)
+                lines.append("{}_{}{} {}".format(prefix, name, "{" + label_text + "}" if label_text else "", value))
+
+        metric("stage_seconds_total", "counter", "Wall time spent in each crawl stage",
+               [((("stage", stage),), s.seconds) for stage, s in sorted(self.stages.items())])
+        metric("stage_calls_total", "counter", "Times each crawl stage has run",
+               [((("stage", stage),), s.calls) for stage, s in sorted(self.stages.items())])
+        metric("requests_total", "counter", "HTTP requests", [((), self.requests)])
+        metric("failed_requests_total", "counter", "Failed HTTP requests", [((), self.failed_requests)])
+        metric("bytes_downloaded_total", "counter", "Bytes downloaded", [((), self.bytes_downloaded)])
+        metric("articles_found_total", "counter", "New article URLs found", [((), self.articles_found)])
+        metric("articles_processed_total", "counter", "Articles delivered to the sink",
+               [((), self.articles_processed)])
+        metric("duplicates_total", "counter", "Near-duplicate articles found", [((), self.duplicates)])
+        metric("categories_skipped_total", "counter", "Low-yield category pages not downloaded",
+               [((), self.categories_skipped)])
+        metric("stale_links_total", "counter", "Article URLs dated before the cutoff, not requested",
+               [((), self.stale_links)])
+        metric("stale_articles_total", "counter", "Articles published before the cutoff, abandoned after parsing",
+               [((), self.stale_articles)])
+        metric("errors_total", "counter", "Errors by crawl stage",
+               [((("stage", stage),), n) for stage, n in sorted(self.errors.items())])
+        metric("queue_depth", "gauge", "Current depth of the crawler queues",
+               [((("queue", name),), n) for name, n in sorted(self.queues.items())])
+        metric("queue_depth_max", "gauge", "Maximum depth reached by the crawler queues",
+               [((("queue", name),), n) for name, n in sorted(self.max_queues.items())])
+        if per_source:
+            metric("source_stage_seconds_total", "counter", "Wall time spent in each crawl stage by source",
+                   [((("source", url), ("stage", stage)), s.seconds)
+                    for url, source in sorted(self.sources.items()) for stage, s in sorted(source.stages.items())])
+        return "\n".join(lines) + "\n"
+
+
+def _merge_stages(stages, other):
+    for stage, s in other.items():
+        stages.setdefault(stage, StageStats()).merge(s)
+
+
+def _merge_counts(counts, other):
+    for key, n in other.items():
+        counts[key] = counts.get(key, 0) + n
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def response_size(response):
+    """
+    Bytes transferred for an http_requests response: its Content-Length, or the length of its text
+    """
+    headers = response.http_response.headers or {}
+    for key in ('Content-Length', 'content-length'):
+        if key in headers:
+            try:
+                return int(headers[key])
+            except (TypeError, ValueError):
+                break
+    return len(response.text)
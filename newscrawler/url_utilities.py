@@ -8,15 +8,17 @@ __author__ = 'Lucas Ou-Yang'
 __license__ = 'MIT'
 __copyright__ = 'Copyright 2014, Lucas Ou-Yang'
 
-# import os
+import calendar
+import os
 import re
+import sys
 
+from datetime import date, datetime, timedelta
+from functools import lru_cache
 from urllib.parse import urlparse, urldefrag
 
-# tldextract_cache_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), "public_suffix_list.dat")
-# os.environ["TLDEXTRACT_CACHE"] = tldextract_cache_file
-
-from tldextract import tldextract
+from newscrawler.config import logger
+from newscrawler.visited import as_visited_store
 
 _STRICT_DATE_REGEX_PREFIX = r'(?<=\W)'
 DATE_REGEX = r'([\./\-_]{0,1}(19|20)\d{2})[\./\-_]{0,1}(([0-3]{0,1}[0-9][\./\-_])|(\w{3,5}[\./\-_]))([0-3]{0,1}[0-9][\./\-]{0,1})?'
@@ -34,6 +36,62 @@ BAD_CHUNKS = ['careers', 'contact', 'contacto', 'about', 'faq', 'terms', 'privac
 
 BAD_DOMAINS = ['amazon', 'doubleclick', 'twitter', 'facebook', 'youtube']
 
+DATE_PATTERN = re.compile(DATE_REGEX)
+_STRICT_DATE_PATTERN = re.compile(STRICT_DATE_REGEX)
+# Months written in URLs, by their first three letters (English and Spanish)
+_MONTHS = {'jan': 1, 'ene': 1, 'feb': 2, 'mar': 3, 'apr': 4, 'abr': 4, 'may': 5, 'jun': 6, 'jul': 7, 'aug': 8,
+           'ago': 8, 'sep': 9, 'set': 9, 'oct': 10, 'nov': 11, 'dec': 12, 'dic': 12}
+_ALLOWED_TYPES_SET = frozenset(ALLOWED_TYPES)
+_GOOD_PATHS_SET = frozenset(p.lower() for p in GOOD_PATHS)
+_BAD_CHUNKS_SET = frozenset(BAD_CHUNKS)
+_BAD_DOMAINS_SET = frozenset(BAD_DOMAINS)
+
+
+# tldextract is imported on first use, and its default extractor can be replaced with configure_tldextract
+_tld_extractor = None
+
+
+def _tld_extract(url):
+    global _tld_extractor
+    if _tld_extractor is None:
+        from tldextract import tldextract
+        _tld_extractor = tldextract.extract
+    return _tld_extractor(url)
+
+
+def configure_tldextract(cache_dir=None, offline=False, **kwargs):
+    """
+    Configure the tldextract extractor used to classify URLs. Without calling it, the default tldextract one is used,
+    which keeps its cache in the user cache directory and may download the public suffix list
+    Args:
+        cache_dir: Directory of the tldextract cache. If tldextract has not been imported yet, it is also used by
+                   the extractor of newspaper3k
+        offline: Use the public suffix list shipped with tldextract, instead of downloading it
+        **kwargs: Other options of tldextract.TLDExtract
+
+    Returns: tldextract.TLDExtract instance
+
+    """
+    global _tld_extractor
+    if cache_dir is not None:
+        if 'tldextract' not in sys.modules:
+            os.environ["TLDEXTRACT_CACHE"] = cache_dir
+        kwargs['cache_dir'] = cache_dir
+    if offline:
+        kwargs['suffix_list_urls'] = ()
+    from tldextract import TLDExtract
+    _tld_extractor = TLDExtract(**kwargs)
+    extract_domain.cache_clear()
+    return _tld_extractor
+
+
+@lru_cache(maxsize=50000)
+def extract_domain(netloc):
+    """
+    Memoized tldextract.extract over the network location of an URL, so links of the same host are resolved once
+    """
+    return _tld_extract(netloc)
+
 
 def valid_url(url, is_article=True, parent_url=None, verbose=False, same_domain=False, mag_categories=None):
     """
@@ -131,8 +189,8 @@ def valid_url(url, is_article=True, parent_url=None, verbose=False, same_domain=
             path_chunks[-1] = last_chunk[-2]
 
     if same_domain:
-        src_tld = tldextract.extract(parent_url)
-        art_tld = tldextract.extract(url)
+        src_tld = _tld_extract(parent_url)
+        art_tld = _tld_extract(url)
         if not art_tld.domain == src_tld.domain or not art_tld.suffix == src_tld.suffix:
             if verbose: print('\t%s rejected due to different domain' % url)
             return False
@@ -144,7 +202,7 @@ def valid_url(url, is_article=True, parent_url=None, verbose=False, same_domain=
             path_chunks.remove('index')
 
         # extract the tld (top level domain)
-        tld_dat = tldextract.extract(url)
+        tld_dat = _tld_extract(url)
         subd = tld_dat.subdomain
         tld = tld_dat.domain.lower()
 
@@ -210,6 +268,231 @@ def valid_url(url, is_article=True, parent_url=None, verbose=False, same_domain=
     return url
 
 
+class URLClassifier(object):
+    """
+    Batch version of valid_url, meant for the many links found in pages of the same magazine.
+    Every URL is parsed once, rules are precompiled, the category index is built once and domains are extracted
+    through an LRU cache. Results are the same as valid_url's ones for the same arguments
+    """
+
+    def __init__(self, parent_url=None, is_article=True, same_domain=False, mag_categories=None):
+        self.parent_url = parent_url
+        self.is_article = is_article
+        self.same_domain = same_domain
+        self.categories = frozenset(cat.url for cat in mag_categories or [])
+
+        if parent_url:
+            parsed = urlparse(parent_url)
+            self._parent_root = parsed.scheme + "://" + parsed.netloc
+            self._parent_prefix = parent_url if parent_url[-1] == "/" else parent_url + "/"
+        if same_domain:
+            self._parent_tld = extract_domain(urlparse(parent_url).netloc)
+
+    def classify(self, urls):
+        """
+        Classify a collection of URLs
+        Args:
+            urls: Iterable of absolute or relative (to parent_url) URLs
+
+        Returns: List with, for each URL, the absolute URL without fragment if it is valid, or False otherwise
+
+        """
+        return [self.classify_one(url) for url in urls]
+
+    def classify_one(self, url):
+        if url == "" or 'mailto:' in url:
+            return False
+
+        if ('http://' not in url) and ('https://' not in url):
+            if self.parent_url and '//' not in url:
+                url = (self._parent_root if url[0] == "/" else self._parent_prefix) + url
+            else:
+                return False
+
+        # 11 chars is shortest valid url length, eg: http://x.co
+        if len(url) < 11 or "javascript:void" in url:
+            return False
+
+        if '#' in url:
+            url = urldefrag(url)[0]
+        parsed = urlparse(url)
+        path = parsed.path
+
+        if not path.startswith('/'):
+            return False
+        if path.endswith('/'):
+            path = path[:-1]
+        path_chunks = [x for x in path.split('/') if len(x) > 0]
+
+        if path_chunks:
+            last_chunk = path_chunks[-1].split('.')
+            if len(last_chunk) > 1:
+                # Same rule as url_to_filetype: extensions are at most 5 characters long
+                file_type = last_chunk[-1].lower()
+                if file_type and len(file_type) <= 5 and file_type not in _ALLOWED_TYPES_SET:
+                    return False
+                path_chunks[-1] = last_chunk[-2]
+
+        tld_dat = None
+        if self.same_domain:
+            tld_dat = extract_domain(parsed.netloc)
+            if tld_dat.domain != self._parent_tld.domain or tld_dat.suffix != self._parent_tld.suffix:
+                return False
+
+        if not self.is_article:
+            return url
+
+        if 'index' in path_chunks:
+            path_chunks.remove('index')
+
+        tld_dat = tld_dat or extract_domain(parsed.netloc)
+        subd = tld_dat.subdomain
+        tld = tld_dat.domain.lower()
+
+        if tld in _BAD_DOMAINS_SET:
+            return False
+
+        url_slug = path_chunks[-1] if path_chunks else ''
+        if url_slug:
+            dash_count = url_slug.count('-')
+            underscore_count = url_slug.count('_')
+            if dash_count > 4 or underscore_count > 4:
+                if dash_count >= underscore_count:
+                    if tld not in [x.lower() for x in url_slug.split('-')]:
+                        return url
+                if underscore_count > dash_count:
+                    if tld not in [x.lower() for x in url_slug.split('_')]:
+                        return url
+
+        if len(path_chunks) <= 1:
+            return False
+
+        if subd in _BAD_CHUNKS_SET or not _BAD_CHUNKS_SET.isdisjoint(path_chunks):
+            return False
+
+        if DATE_PATTERN.search(url) is not None:
+            return url
+
+        for chunk in path_chunks:
+            if chunk.lower() in _GOOD_PATHS_SET:
+                return url
+
+        if self.categories and url.strip("/") + "/" in self.categories:
+            return False
+
+        return url
+
+
+def url_date(url):
+    """
+    Date of an article as written in its URL ('/2021/05/12/', '/2021-05-12-', '/2021/may/12/', '/2021/05/'...).
+    Only dates preceded by a separator are taken, so numeric identifiers are not mistaken for them
+    Args:
+        url: Article URL
+
+    Returns: datetime.date instance, or None if the URL has no valid date. Without a (valid) day, the last day
+             of the month is given, so an article is never taken for older than it may be
+
+    """
+    for match in _STRICT_DATE_PATTERN.finditer(url):
+        year = int(match.group(1)[-4:])
+        if match.group(4):
+            month = int(match.group(4)[:-1])
+        else:
+            month = _MONTHS.get(match.group(5)[:3].lower())
+        if not month or month > 12:
+            continue
+        last_day = calendar.monthrange(year, month)[1]
+        day = match.group(6).rstrip("./-") if match.group(6) else ""
+        day = int(day) if day else 0
+        return date(year, month, day if 1 <= day <= last_day else last_day)
+    return None
+
+
+def get_min_date(max_age=None, since=None):
+    """
+    Publish date cutoff of the crawled articles
+    Args:
+        max_age: Maximum age of the articles, in seconds or as a datetime.timedelta. None for no limit
+        since: Oldest publish date of the articles, as a datetime.date, datetime.datetime or 'YYYY-MM-DD' string.
+               None for no limit
+
+    Returns: datetime.date instance, the latest of both limits, or None if there is none
+
+    """
+    limits = []
+    if max_age is not None:
+        if not isinstance(max_age, timedelta):
+            max_age = timedelta(seconds=max_age)
+        limits.append((datetime.now() - max_age).date())
+    if since is not None:
+        if isinstance(since, str):
+            try:
+                since = datetime.strptime(since, "%Y-%m-%d")
+            except ValueError:
+                msg = "'since' must be a date or a 'YYYY-MM-DD' string, not {!r}".format(since)
+                logger.error(msg)
+                raise AttributeError(msg)
+        limits.append(since.date() if isinstance(since, datetime) else since)
+    return max(limits) if limits else None
+
+
+def stale_url(url, min_date):
+    """
+    Returns: True if the date in the URL of an article is older than min_date
+    """
+    dated = url_date(url)
+    return dated is not None and dated < min_date
+
+
+class _LinkCollector(object):
+    """
+    lxml parser target that keeps the links of the anchors as they are parsed, without building the tree
+    """
+
+    def __init__(self, classifier=None):
+        self.classifier = classifier
+        self.links = []
+
+    def start(self, tag, attrib):
+        if tag != 'a':
+            return
+        href = attrib.get('href')
+        if href:
+            if self.classifier is not None:
+                href = self.classifier.classify_one(href)
+                if not href:
+                    return
+            self.links.append(href)
+
+    def close(self):
+        return self.links
+
+
+def page_links(html, classifier=None):
+    """
+    Links of the anchors of a page, the same ones newspaper's extractor.get_urls finds in its DOM, but streaming
+    the page through lxml's HTML parser, so no DOM is built
+    Args:
+        html: Raw html of the page
+        classifier: URLClassifier instance. If given, links are classified as they are found, and only the valid
+                    ones are kept
+
+    Returns: List of links ('href' values), or of valid absolute URLs if a classifier is given
+
+    """
+    from lxml import etree
+
+    collector = _LinkCollector(classifier)
+    parser = etree.HTMLParser(target=collector)
+    try:
+        parser.feed(html)
+        return parser.close()
+    except (etree.LxmlError, ValueError, TypeError):
+        # Pages lxml can not parse at all (empty ones, mostly) have no links, as newspaper discards them
+        return collector.links
+
+
 def url_to_filetype(abs_url):
     """
     Input a URL and output the filetype of the file
@@ -233,30 +516,40 @@ def url_to_filetype(abs_url):
 
 
 def filter_articles(source_url, art_urls, get_visited_links_function, include_not_articles=True, new_links_only=True, same_domain=True):
-    try:
-        lastate = get_visited_links_function(source_url)
-        if lastate is None:
-            lastate = set()
-    except Exception as err:
-        raise Exception("\nXSA..........Error getting visited links for {0}: ".format(source_url) + str(err) + "\n")
-    # curr_art = set(art_urls).difference(lastate)
+    """
+    Filter the article URLs found for a source
+    Args:
+        source_url: URL of the source
+        art_urls: Collection of article URLs
+        get_visited_links_function: VisitedStore instance, or callable that accepts a source URL and returns its
+                                    already visited links
+        include_not_articles: If False, visited links that are not valid article URLs are not taken into account
+        new_links_only: Keep only the URLs not visited yet
+        same_domain: Keep only the URLs in the same domain than the source
+
+    Returns: List of filtered URLs
 
-    if not include_not_articles:
-        lastate = [l for l in lastate if valid_url(l, is_article=True, parent_url=source_url)]
+    """
+    art_urls = set(art_urls)
 
-    if new_links_only:
-        art_urls = [art for art in art_urls if art not in lastate]
+    if new_links_only and art_urls:
+        # Only the candidates are checked against the store, instead of loading the whole history
+        lastate = as_visited_store(get_visited_links_function).visited(source_url, art_urls)
+        if not include_not_articles:
+            classifier = URLClassifier(parent_url=source_url)
+            lastate = {l for l in lastate if classifier.classify_one(l)}
+        art_urls -= lastate
 
     if same_domain:
-        filtered = []
-        src_tld = tldextract.extract(source_url)
+        src_tld = extract_domain(urlparse(source_url).netloc)
+        filtered = set()
         for art in art_urls:
-            art_tld = tldextract.extract(art)
+            art_tld = extract_domain(urlparse(art).netloc)
             if art_tld.domain == src_tld.domain and art_tld.suffix == src_tld.suffix:
-                filtered.append(art)
+                filtered.add(art)
         art_urls = filtered
 
-    return list(set(art_urls))
+    return list(art_urls)
 
 
 if __name__ == '__main__':
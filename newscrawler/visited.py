@@ -0,0 +1,207 @@
+import hashlib
+import math
+import sqlite3
+
+
+class VisitedStore(object):
+    """
+    Links already visited for every source. Membership is checked in batch, so a store never needs to hand over
+    the whole history of a source
+    """
+
+    def visited(self, source_url, urls):
+        """
+        Args:
+            source_url: URL of the source
+            urls: Collection of URLs to check
+
+        Returns: Set with the URLs of 'urls' already visited for 'source_url'
+
+        """
+        raise NotImplementedError
+
+    def add(self, source_url, urls):
+        """
+        Record URLs as visited for 'source_url'
+        """
+        raise NotImplementedError
+
+    def iter_visited(self, source_url):
+        """
+        Iterate over every URL visited for 'source_url'
+        """
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class MemoryVisitedStore(VisitedStore):
+    """
+    Hash set of visited links for every source, kept in memory
+    """
+
+    def __init__(self, initial=None):
+        self._links = {source: set(urls) for source, urls in (initial or {}).items()}
+
+    def visited(self, source_url, urls):
+        links = self._links.get(source_url)
+        if not links:
+            return set()
+        return {url for url in urls if url in links}
+
+    def add(self, source_url, urls):
+        self._links.setdefault(source_url, set()).update(urls)
+
+    def iter_visited(self, source_url):
+        return iter(self._links.get(source_url, ()))
+
+
+class SQLiteVisitedStore(VisitedStore):
+    """
+    Visited links stored in a SQLite database, indexed by source and URL
+    """
+    # Keep queries under SQLITE_MAX_VARIABLE_NUMBER of old SQLite versions (999)
+    chunk_size = 900
+
+    def __init__(self, path):
+        self.path = path
+        self._conn = sqlite3.connect(path)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS visited (source TEXT NOT NULL, url TEXT NOT NULL, "
+            "PRIMARY KEY (source, url)) WITHOUT ROWID")
+        self._conn.commit()
+
+    def visited(self, source_url, urls):
+        urls = list(urls)
+        found = set()
+        for i in range(0, len(urls), self.chunk_size):
+            chunk = urls[i:i + self.chunk_size]
+            query = "SELECT url FROM visited WHERE source = ? AND url IN ({})".format(",".join("?" * len(chunk)))
+            found.update(row[0] for row in self._conn.execute(query, [source_url] + chunk))
+        return found
+
+    def add(self, source_url, urls):
+        with self._conn:
+            self._conn.executemany("INSERT OR IGNORE INTO visited (source, url) VALUES (?, ?)",
+                                   ((source_url, url) for url in urls))
+
+    def iter_visited(self, source_url):
+        for row in self._conn.execute("SELECT url FROM visited WHERE source = ?", (source_url,)):
+            yield row[0]
+
+    def close(self):
+        self._conn.close()
+
+
+class BloomFilter(object):
+    """
+    Fixed size Bloom filter over strings
+    """
+
+    def __init__(self, capacity, error_rate=0.001):
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hashes = max(1, int(round(self.size / capacity * math.log(2))))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key):
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, key):
+        for pos in self._positions(key):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, key):
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+
+class BloomVisitedStore(VisitedStore):
+    """
+    Bloom filter in front of another store. Links the filter has never seen are new for sure, so only the
+    (few) possibly visited ones are checked against the backing store.
+    The filter of a source is filled from the backing store the first time the source is checked
+    """
+
+    def __init__(self, store, capacity=1000000, error_rate=0.001):
+        self.store = store
+        self._filter = BloomFilter(capacity, error_rate)
+        self._loaded_sources = set()
+
+    @staticmethod
+    def _key(source_url, url):
+        return source_url + "\0" + url
+
+    def _load(self, source_url):
+        if source_url in self._loaded_sources:
+            return
+        for url in self.store.iter_visited(source_url):
+            self._filter.add(self._key(source_url, url))
+        self._loaded_sources.add(source_url)
+
+    def visited(self, source_url, urls):
+        self._load(source_url)
+        candidates = [url for url in urls if self._key(source_url, url) in self._filter]
+        if not candidates:
+            return set()
+        return self.store.visited(source_url, candidates)
+
+    def add(self, source_url, urls):
+        urls = list(urls)
+        self.store.add(source_url, urls)
+        for url in urls:
+            self._filter.add(self._key(source_url, url))
+
+    def iter_visited(self, source_url):
+        return self.store.iter_visited(source_url)
+
+    def close(self):
+        self.store.close()
+
+
+class FunctionVisitedStore(VisitedStore):
+    """
+    Adapter for a callable that accepts a source URL and returns its whole history of visited links.
+    Links recorded during the crawl are kept in memory, on top of that history
+    """
+
+    def __init__(self, get_visited_links_function):
+        self.get_visited_links_function = get_visited_links_function
+        self._added = MemoryVisitedStore()
+
+    def _history(self, source_url):
+        try:
+            return self.get_visited_links_function(source_url) or set()
+        except Exception as err:
+            raise Exception(
+                "\nXSA..........Error getting visited links for {0}: ".format(source_url) + str(err) + "\n")
+
+    def visited(self, source_url, urls):
+        history = self._history(source_url)
+        if not isinstance(history, (set, frozenset, dict)):
+            history = set(history)
+        return {url for url in urls if url in history} | self._added.visited(source_url, urls)
+
+    def add(self, source_url, urls):
+        self._added.add(source_url, urls)
+
+    def iter_visited(self, source_url):
+        yield from self._history(source_url)
+        yield from self._added.iter_visited(source_url)
+
+
+def as_visited_store(visited):
+    """
+    Args:
+        visited: VisitedStore instance, or callable that accepts a source URL and returns its visited links
+
+    Returns: VisitedStore instance
+
+    """
+    if isinstance(visited, VisitedStore):
+        return visited
+    if callable(visited):
+        return FunctionVisitedStore(visited)
+    raise AttributeError("Visited links must be given as a callable or a VisitedStore instance")
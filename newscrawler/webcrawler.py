@@ -1,149 +1,356 @@
 import asyncio
-import os
-import pytz
+import time
 
-from datetime import datetime
-from http_requests import create_client, get_valid_loop, add_async_callback, async_request, sync_request
+from http_requests import create_client, get_valid_loop, sync_request
 # from threading import Thread
 from urllib.parse import urlsplit
 
-# Para la libreria tldextract, usada por newspaper3k
-tldextract_cache_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), "public_suffix_list.dat")
-os.environ["TLDEXTRACT_CACHE"] = tldextract_cache_file
-
 import newspaper
 from newspaper.source import Category
 
-from .config import Article, categories_to_articles, construct_config, format_proxy, logger
-from .url_utilities import filter_articles
+from .categories import get_category_yields
+from .config import category_articles, construct_config, format_proxy, logger
+from .dedup import get_deduplicator
+from .feeds import feed_articles, get_feed_store
+from .httpcache import get_http_cache
+from .journal import open_journal
+from .memory import ArticleRecord, get_memory_budget
+from .network import DEFAULT_CONCURRENCY, DEFAULT_CONCURRENCY_PER_HOST, DEFAULT_TIMEOUT, Downloader
+from .parsing import get_parse_executor, parse_article
+from .politeness import get_politeness
+from .redirects import get_redirect_cache, normalize_source_url, resolve_urls
+from .sinks import ArticleSink, as_article_sink
+from .stats import CrawlStats
+from .url_utilities import URLClassifier, filter_articles, get_min_date, stale_url
+from .visited import MemoryVisitedStore, VisitedStore, as_visited_store
+
+DEFAULT_SURVEY_SOURCES = 50
+
+
+async def _fetch_page(url, downloader, http_cache=None, kind='page', cache_key=None, **request_kwargs):
+    """
+    Returns: Tuple (response, data), where 'data' is the information stored in the HTTP cache for the page (under
+             'cache_key', if given) if it has not changed since it was stored, or None
+    """
+    if http_cache is None:
+        return await downloader.fetch(url, **request_kwargs), None
+    return await http_cache.fetch(downloader, url, kind, cache_key, **request_kwargs)
 
 
-async def _define_magazine(url, client, get_visited_links_function, loop, **request_kwargs):
-    try:
-        response = async_request(url, client=client, close_client_at_end=False, **request_kwargs)
-        if response is None:
-            return url, []
-        html = response.text
-        real_url = response.http_response.url.strip("/") + "/"
+async def _download_categories(magazine, downloader, http_cache=None, **request_kwargs):
+    """
+    Asynchronous version of newspaper.Source.download_categories, which downloads every category page
+    concurrently through the shared downloader instead of newspaper's synchronous requests.
+    Categories whose page has not changed since the last run are removed from the magazine, as they do not
+    need to be parsed again
 
-        proxy = request_kwargs.get('proxy')
+    Returns: Tuple (responses, cached_links). The responses of the downloaded categories, and the article links
+             stored for the unchanged ones, both keyed by category URL
 
-        magazine = newspaper.build(url, dry=True, config=construct_config(proxy))
-        magazine.html = html
-        magazine.parse()
+    """
+    results = await asyncio.gather(
+        *[_fetch_page(category.url, downloader, http_cache, **request_kwargs) for category in magazine.categories],
+        return_exceptions=True)
+    responses, cached_links = {}, {}
+    for category, result in zip(magazine.categories, results):
+        if isinstance(result, Exception) or result[0] is None:
+            logger.warning(f"Deleting category {category.url} from source {magazine.url} due to download error")
+            continue
+        response, data = result
+        if data is not None:
+            cached_links[category.url] = data['links']
+            continue
+        category.html = response.text
+        responses[category.url] = response
+    magazine.categories = [c for c in magazine.categories if c.html]
+    return responses, cached_links
 
-        magazine.set_categories()
 
-        for cat in magazine.categories:
-            if cat.uri[-1] != "/":
-                cat.uri += "/"
-        if real_url not in [c.uri for c in magazine.categories]:
-            magazine.categories.append(Category(url=real_url))
-        await loop.run_in_executor(None, magazine.download_categories)
-        magazine.parse_categories()
-        # magazine.generate_articles(limit=10000)
-        articles_urls_set = set(categories_to_articles(magazine))
+async def _fetch_homepage(url, downloader, http_cache=None, redirect_cache=None, **request_kwargs):
+    """
+    Returns: Tuple (response, data), as _fetch_page, or None if the homepage could not be downloaded
+    """
+    stats = downloader.stats
+    fetch_url, resolved = url, False
+    if redirect_cache is not None:
+        # The homepage is requested where the source redirects to, saving a round trip
+        resolved, final_url = redirect_cache.get(url)
+        fetch_url = final_url or url
+    # Cached under the source URL, wherever it is requested, as it is saved by _define_magazine
+    response, source_data = await _fetch_page(fetch_url, downloader, http_cache, 'source', cache_key=url, source=url,
+                                              **request_kwargs)
+    if response is None:
+        stats.add_error('homepage', url)
+        stats.source(url).last_error = "Homepage {} could not be downloaded".format(fetch_url)
+        return None
+    if redirect_cache is not None and not resolved:
+        redirect_cache.set(url, normalize_source_url(response.http_response.url))
+    return response, source_data
 
-        logger.info(
-            "Pre-filtered articles size for {0}: ".format(url) + str(len(articles_urls_set)) + "\n")
 
-        curr_arts = filter_articles(source_url=url, art_urls=articles_urls_set,
-                                    get_visited_links_function=get_visited_links_function)
-        logger.info(
-            "Post-filtered articles size for {0}: ".format(url) + str(len(curr_arts)) + "\n")
-        return url, curr_arts
+def _feed_links(url, feed_links, mag_categories=None):
+    """
+    Links of the feeds of a source that are valid article links, by the same rules as the ones of its categories
+    """
+    classifier = URLClassifier(parent_url=url, same_domain=True, mag_categories=mag_categories)
+    return [link for link in classifier.classify(feed_links) if link]
+
+
+async def _define_magazine(url, downloader, visited_store, loop, http_cache=None, feed_store=None,
+                           category_yields=None, redirect_cache=None, min_date=None, newspaper_config=None,
+                           **request_kwargs):
+    stats = downloader.stats
+    try:
+        links = {}
+        homepage = None
+        if feed_store is not None:
+            if feed_store.get(url) is None:
+                # Feeds are looked for in the homepage, which the category walk needs too: it is downloaded once
+                with stats.timer('homepage', url):
+                    homepage = await _fetch_homepage(url, downloader, http_cache, redirect_cache, **request_kwargs)
+                if homepage is None:
+                    return url, []
+            with stats.timer('feeds', url):
+                feed_links = await feed_articles(url, downloader, feed_store, http_cache,
+                                                 homepage=homepage[0] if homepage else None, **request_kwargs)
+            if feed_links is not None and not feed_store.walk_due(url):
+                # Feeds list the newest articles, the category walk is only run from time to time
+                source_entry = http_cache.get(url, 'source') if http_cache is not None else None
+                mag_categories = None
+                if source_entry is not None:
+                    mag_categories = [Category(url=cat_url) for cat_url in source_entry['data']['categories']]
+                links[url + '#feeds'] = _feed_links(url, feed_links, mag_categories)
+                return url, _new_articles(url, links, visited_store, stats, min_date)
+
+        with stats.timer('homepage', url):
+            if homepage is None:
+                homepage = await _fetch_homepage(url, downloader, http_cache, redirect_cache, **request_kwargs)
+                if homepage is None:
+                    return url, []
+            response, source_data = homepage
+            real_url = normalize_source_url(response.http_response.url)
+
+            proxy = request_kwargs.get('proxy')
+
+            magazine = newspaper.build(url, dry=True, config=newspaper_config or construct_config(proxy))
+            if source_data is not None:
+                # Homepage has not changed since the last run, so neither have its categories
+                magazine.categories = [Category(url=cat_url) for cat_url in source_data['categories']]
+            else:
+                magazine.html = response.text
+                magazine.parse()
+
+                magazine.set_categories()
+
+                for cat in magazine.categories:
+                    if cat.url[-1] != "/":
+                        cat.url += "/"
+                if real_url not in [c.url for c in magazine.categories]:
+                    magazine.categories.append(Category(url=real_url))
+                if http_cache is not None:
+                    http_cache.save(url, response, 'source', categories=[c.url for c in magazine.categories])
+        if feed_store is not None and feed_links is not None:
+            links[url + '#feeds'] = _feed_links(url, feed_links, magazine.categories)
+
+        categories = list(magazine.categories)
+        if category_yields is not None:
+            selected, skipped = category_yields.select(url, [c.url for c in categories])
+            if skipped:
+                selected = set(selected)
+                magazine.categories = [c for c in categories if c.url in selected]
+                stats.source(url).categories_skipped += len(skipped)
+                logger.info("{} low-yield categories skipped for {}".format(len(skipped), url))
+        with stats.timer('categories', url):
+            responses, cached_links = await _download_categories(magazine, downloader, http_cache, source=url,
+                                                                 **request_kwargs)
+        # magazine.generate_articles(limit=10000)
+        with stats.timer('classification', url):
+            found_links = category_articles(magazine, categories)
+        if http_cache is not None:
+            for cat_url, cat_links in found_links.items():
+                http_cache.save(cat_url, responses[cat_url], links=cat_links)
+        links.update(cached_links)
+        links.update(found_links)
+        if feed_store is not None:
+            feed_store.walked(url)
+        new_links = _new_articles(url, links, visited_store, stats, min_date)
+        if category_yields is not None:
+            category_yields.record(url, {**cached_links, **found_links}, new_links)
+        return url, new_links
     except Exception as err:
+        stats.add_error('discovery', url)
+        stats.source(url).last_error = "{}: {}".format(type(err).__name__, err)
         logger.error(
             "_define_magazines:: Lanza un error de tipo " + str(type(err)) + " y texto " + str(err) + " para {}".format(
                 url))
         return url, []
 
 
-async def _process_articles(magazine_info, client, add_article_function, loop, **request_kwargs):
+def _new_articles(url, links, visited_store, stats, min_date=None):
+    """
+    Returns: List of the links found for a source (keyed by the category or feed they come from) not visited yet,
+             without the ones whose URL is dated before min_date
+    """
+    articles_urls_set = {art for cat_links in links.values() for art in cat_links}
+    if min_date is not None:
+        fresh = {art for art in articles_urls_set if not stale_url(art, min_date)}
+        if len(fresh) < len(articles_urls_set):
+            stats.source(url).stale_links += len(articles_urls_set) - len(fresh)
+            logger.info("{} links dated before {} dropped for {}".format(len(articles_urls_set) - len(fresh),
+                                                                          min_date, url))
+        articles_urls_set = fresh
+
+    logger.info(
+        "Pre-filtered articles size for {0}: ".format(url) + str(len(articles_urls_set)) + "\n")
+
+    with stats.timer('filtering', url):
+        curr_arts = filter_articles(source_url=url, art_urls=articles_urls_set,
+                                    get_visited_links_function=visited_store)
+    logger.info(
+        "Post-filtered articles size for {0}: ".format(url) + str(len(curr_arts)) + "\n")
+    stats.source(url).articles_found += len(curr_arts)
+    return curr_arts
+
+
+async def _process_articles(magazine_info, downloader, sink, loop, parse_executor=None,
+                            lean_extraction=False, min_date=None, **request_kwargs):
     if not isinstance(magazine_info, (tuple, list)) or len(magazine_info) != 2:
         logger.error(
             f"Magazine info is not properly formated: \nType: {type(magazine_info)} \nLength: {str(len(magazine_info))}")
         return
     source_url, articles_list = magazine_info
-    for article_url in articles_list:
-        try:
-            response = async_request(article_url, client=client, **request_kwargs)
-            if response is None:
-                continue
+    downloader.stats.add_queue('articles_pending', len(articles_list))
+    # Every article is scheduled at once, the downloader keeps the number of requests in flight bounded.
+    # The sink records them as visited once they are delivered, so next runs only get the new ones
+    await asyncio.gather(*[
+        _process_article(article_url, source_url, downloader, sink, loop, parse_executor, lean_extraction, min_date,
+                         **request_kwargs)
+        for article_url in articles_list
+    ])
+
+
+async def _process_article(article_url, source_url, downloader, sink, loop, parse_executor=None,
+                           lean_extraction=False, min_date=None, **request_kwargs):
+    stats = downloader.stats
+    budget = downloader.memory_budget
+    reserved = 0
+    try:
+        if not await downloader.allowed(article_url, **request_kwargs):
+            logger.info("Article '{}' disallowed by robots.txt".format(article_url))
+            return
+        if budget is not None:
+            reserved = await budget.acquire()
+        with stats.timer('article_fetch', source_url):
+            response = await downloader.fetch(article_url, source=source_url, **request_kwargs)
+        if response is None:
+            stats.add_error('article_fetch', source_url)
+            return
+        # Only the html is kept, and just until it is parsed
+        html, response = response.text, None
+        if budget is not None:
+            reserved = budget.resize(reserved, len(html))
 
-            proxy = request_kwargs.get('proxy')
-            text = response.text
-
-            article = Article(url=article_url, source_url=source_url, proxy=proxy)
-            article.set_html(text)
-            article.parse()
-            title = article.title or ""
-            url = article.url or ""
-            description = article.meta_description or title
-            text = article.text or ""
-            if type(article.publish_date) == datetime:
-                date = article.publish_date.strftime(format="%Y-%m-%d")
-            elif article.publish_date not in ['', 'None', None]:
-                date = article.publish_date.split()[0]
+        proxy = request_kwargs.get('proxy')
+        with stats.timer('parse', source_url):
+            if parse_executor is None:
+                fields = parse_article(article_url, html, source_url, proxy, lean_extraction, min_date)
             else:
-                now = datetime.now().replace(tzinfo=pytz.UTC)
-                str_now = now.strftime(format="%Y-%m-%d")
-                date = str_now
-
-            # new_url_as_set = set([url])
-            #
-            # try:
-            #     set_visited_links_function(source_url, new_url_as_set)
-            #     logger.info(
-            #         "Updated visited links for source {0} with link {1}\n".format(source_url, url))
-            # # En caso de que al actualizar los links, los conjuntos sean iguales, se lanza un ValueError
-            # except ValueError as err:
-            #     logger.warning(
-            #         "VALUE ERROR updating visited links with {0}: ".format(
-            #             url) + str(err) + "\n")
-            #     continue
-            # # Cualquier otra excepcion detiene la operacion
-            # except Exception as err:
-            #     logger.error(
-            #         "CRITICAL ERROR updating visited links with {0}: ".format(
-            #             url) + str(err) + "\n")
-            #     continue
-
-            text = text.strip().rstrip().replace("\'", "\"")
-            title = title.replace("\'", "\"")
-            description = description.replace("\'", "\"")
-
+                # Parsing is CPU bound: while it runs in the executor, the loop keeps on downloading
+                fields = await loop.run_in_executor(
+                    parse_executor, parse_article, article_url, html, source_url, proxy, lean_extraction, min_date)
+        html = None
+        if budget is not None:
+            budget.release(reserved)
+            reserved = 0
+        if fields is None:
+            # Published before min_date. The sink records it as visited, so it is not downloaded again
+            stats.source(source_url).stale_articles += 1
+            sink.discard((source_url, article_url))
+            logger.info("Article '{}' abandoned, published before {}".format(article_url, min_date))
+            return
+        url = fields["url"]
+
+        # new_url_as_set = set([url])
+        #
+        # try:
+        #     set_visited_links_function(source_url, new_url_as_set)
+        #     logger.info(
+        #         "Updated visited links for source {0} with link {1}\n".format(source_url, url))
+        # # En caso de que al actualizar los links, los conjuntos sean iguales, se lanza un ValueError
+        # except ValueError as err:
+        #     logger.warning(
+        #         "VALUE ERROR updating visited links with {0}: ".format(
+        #             url) + str(err) + "\n")
+        #     return
+        # # Cualquier otra excepcion detiene la operacion
+        # except Exception as err:
+        #     logger.error(
+        #         "CRITICAL ERROR updating visited links with {0}: ".format(
+        #             url) + str(err) + "\n")
+        #     return
+
+        if budget is not None:
+            download_dict = ArticleRecord(source=source_url, **fields)
+        else:
             download_dict = {
                 "source": source_url,
-                "url": url,
-                "title": title,
-                "text": text,
-                "date": date,
-                "description": description,
+                **fields
             }
 
-            add_article_function(download_dict)
-
+        # Waits here while the sink is behind, which slows the download pipeline down
+        with stats.timer('sink', source_url):
+            delivered = await sink.put(download_dict, (source_url, article_url))
+        stats.set_queue('sink_pending', sink.pending)
+        if delivered is not False:
+            # Counted in articles_processed by the sink, once delivered
             logger.info("Article '{}' successfully processed".format(url))
 
-        except Exception as err:
-            logger.error("_process_article:: " + str(err))
-            continue
-
+    except Exception as err:
+        stats.add_error('article', source_url)
+        logger.error("_process_article:: " + str(err))
+    finally:
+        if reserved:
+            budget.release(reserved)
+        stats.add_queue('articles_pending', -1)
 
-async def add_callback(url, client, get_visited_links_function, add_article_function,
-                       loop, **request_kwargs):
-    # coro = asyncio.ensure_future(_define_magazines(url, DOWNLOAD_INSTANCE, loop, PROXY, USER_AGENT, TIMEOUT))
-    # coro.add_done_callback(_process_article)
-    # return coro
 
-    future_fn = _define_magazine
-    future_fn_args = (url, client, get_visited_links_function, loop)
+def _discovery_failures(stats, url):
+    errors = stats.source(url).errors
+    return errors.get('homepage', 0) + errors.get('discovery', 0)
 
-    callback = _process_articles
-    callback_args = (client, add_article_function, loop)
 
-    return add_async_callback(future_fn, future_fn_args, request_kwargs, callback, callback_args, request_kwargs)
+async def add_callback(url, downloader, visited_store, sink,
+                       loop, parse_executor=None, http_cache=None, lean_extraction=False, feed_store=None,
+                       category_yields=None, journal=None, redirect_cache=None, min_date=None,
+                       newspaper_config=None, **request_kwargs):
+    """
+    Crawl a source: find its new articles and process them. With a journal, the articles found by an interrupted
+    run are processed instead, if there are any
+    Returns: Tuple (url, number of new articles found)
+    """
+    pending = journal.pending(url) if journal is not None else None
+    if pending is None:
+        failures = _discovery_failures(downloader.stats, url)
+        magazine_info = await _define_magazine(url, downloader, visited_store, loop, http_cache, feed_store,
+                                               category_yields, redirect_cache, min_date, newspaper_config,
+                                               **request_kwargs)
+        if _discovery_failures(downloader.stats, url) > failures:
+            # Nothing was found because of the failure: it is not recorded as a source without new articles
+            if journal is not None:
+                journal.source_failed(url)
+            return url, 0
+        if journal is not None:
+            journal.discovered(url, magazine_info[1])
+    else:
+        logger.info("Resuming {} with {} pending articles".format(url, len(pending)))
+        magazine_info = url, pending
+        # Articles delivered before the interruption never reached the visited store
+        visited_store.add(url, journal.delivered(url))
+    await _process_articles(magazine_info, downloader, sink, loop, parse_executor, lean_extraction, min_date,
+                            **request_kwargs)
+    if journal is not None:
+        journal.source_done(url)
+    return url, len(magazine_info[1])
 
 
 def find_redirection_url(url, proxy=None):
@@ -156,6 +363,7 @@ def find_redirection_url(url, proxy=None):
         url=url,
         method='head',
         proxy_cfg=req_proxy,
+        timeout=DEFAULT_TIMEOUT,
         kwargs={
             "logger": logger,
             "allow_redirects": True
@@ -164,79 +372,353 @@ def find_redirection_url(url, proxy=None):
     # response = requests.head(url=url, proxies=req_proxy, allow_redirects=True, timeout=TIMEOUT, headers=headers)
     if response is None:
         return
-    final_url = response.http_response.url.strip("/") + "/"
+    final_url = normalize_source_url(response.http_response.url)
     logger.info(f"URL '{final_url}' successfully verified")
     return final_url
 
 
-async def process_sources(
-        url_list, loop, get_visited_links_function, add_article_function, **request_kwargs):
-    async with create_client(loop=loop) as client:
-        results = [
-            add_callback(url, client, get_visited_links_function,
-                         add_article_function, loop, **request_kwargs) for url in url_list
-        ]
-        return await asyncio.gather(*results, loop=loop)
+async def _resolve_sources(urls, loop, concurrency, concurrency_per_host, redirect_cache, **request_kwargs):
+    async with create_client(loop=loop, connections_limit=concurrency,
+                             connections_limit_per_host=concurrency_per_host) as client:
+        downloader = Downloader(client, concurrency, concurrency_per_host)
+        return await resolve_urls(urls, downloader, redirect_cache, **request_kwargs)
 
 
-def scrap(urls, get_visited_links_function, add_article_function, request_kwargs=None):
+def find_redirection_urls(urls, proxy=None, request_kwargs=None, concurrency=None, concurrency_per_host=None,
+                          redirects=None):
     """
-    Scrap a collection of magazines URLs and extract new articles for each one of them
+    Batch version of find_redirection_url: the URLs are resolved concurrently through a shared client, with a
+    HEAD request, or a GET one if the server does not answer HEAD requests properly
     Args:
-        urls: List of URLs to be scraped
-        get_visited_links_function: Callable or API URL that accepts only one URL and returns its already visited links
-                                    Could be an which accepts a get request with
-        add_article_function: Callable that accepts a dictionary with an article information (at least 'source' and 'url' keys)
-        request_kwargs: Dictionary with the common options available for a http_requests.async_request function
+        urls: List of URLs to be resolved
+        proxy: Same as in find_redirection_url
+        request_kwargs: Same as in scrap
+        concurrency: Same as in scrap
+        concurrency_per_host: Same as in scrap
+        redirects: True, the path of a SQLite database, or a redirects.RedirectCache instance, where the final
+                   URLs are kept. Give the same one to scrap, so it requests the homepages at their final URL
 
-    Returns: None
+    Returns: Dictionary with the final URL of every URL, normalized as in find_redirection_url, or None for the
+             ones that could not be requested
 
     """
+    request_kwargs = dict(request_kwargs or {})
+    if proxy is not None:
+        request_kwargs.setdefault('proxy', proxy)
+    request_kwargs = _prepare_request_kwargs(request_kwargs)
     loop = get_valid_loop()
+    return loop.run_until_complete(_resolve_sources(
+        urls, loop, concurrency or DEFAULT_CONCURRENCY, concurrency_per_host or DEFAULT_CONCURRENCY_PER_HOST,
+        get_redirect_cache(redirects), **request_kwargs))
 
-    request_kwargs = request_kwargs or dict()
 
-    if not all([callable(func) for func in
-                (get_visited_links_function, add_article_function)]):
-        msg = "For scraping process, you need to specify two callable objects"
+async def process_sources(url_list, loop, get_visited_links_function, add_article_function,
+                          concurrency=None, concurrency_per_host=None, parse_executor=None, http_cache=None,
+                          politeness=None, stats=None, lean_extraction=False, feed_store=None, dedup=None,
+                          category_yields=None, journal=None, redirect_cache=None, memory_budget=None, min_date=None,
+                          client=None, session=None, newspaper_config=None, **request_kwargs):
+    """
+    Crawl a list of sources. 'client' (an aiohttp client session) and 'session' (a requests.Session) are the ones
+    of a crawler.Crawler, kept open between runs. Without a client, one is opened and closed here
+    """
+    concurrency = concurrency or DEFAULT_CONCURRENCY
+    concurrency_per_host = concurrency_per_host or DEFAULT_CONCURRENCY_PER_HOST
+    own_client = client is None
+    if own_client:
+        client = create_client(loop=loop, connections_limit=concurrency,
+                               connections_limit_per_host=concurrency_per_host)
+    try:
+        downloader = Downloader(client, concurrency, concurrency_per_host, politeness, stats, memory_budget, session)
+        visited_store = as_visited_store(get_visited_links_function)
+        sink = as_article_sink(add_article_function)
+        sink.stats = downloader.stats
+        sink.visited_store = visited_store
+        if dedup is not None:
+            sink.dedup = dedup
+        if journal is not None:
+            sink.journal = journal
+            finished = journal.finished_sources()
+            if finished:
+                logger.info("{} sources already finished by the interrupted run".format(len(finished)))
+                url_list = [url for url in url_list if url not in finished]
+            failed = journal.failed_sources()
+            if failed:
+                logger.info("{} sources failed in the interrupted run, they are crawled again".format(len(failed)))
+        sink.start()
+        results = [
+            add_callback(url, downloader, visited_store, sink, loop, parse_executor, http_cache, lean_extraction,
+                         feed_store, category_yields, journal, redirect_cache, min_date, newspaper_config,
+                         **request_kwargs)
+            for url in url_list
+        ]
+        try:
+            return await asyncio.gather(*results)
+        except asyncio.CancelledError:
+            # Nobody will wait for the pending articles
+            sink.cancel()
+            raise
+        finally:
+            await sink.close()
+            downloader.stats.set_queue('sink_pending', 0)
+    finally:
+        if own_client:
+            await client.close()
+
+
+def _check_scrap_functions(get_visited_links_function, add_article_function):
+    valid_sink = callable(add_article_function) or isinstance(add_article_function, ArticleSink)
+    valid_store = callable(get_visited_links_function) or isinstance(get_visited_links_function, VisitedStore)
+    if not valid_sink or not valid_store:
+        msg = "For scraping process, you need to specify two callable objects (or a VisitedStore and an ArticleSink)"
         logger.error(msg)
         raise AttributeError(msg)
 
+
+def _prepare_request_kwargs(request_kwargs):
+    request_kwargs = dict(request_kwargs or {})
     if 'proxy' in request_kwargs:
         request_kwargs['proxy'] = format_proxy(request_kwargs['proxy'])
     if 'logger' not in request_kwargs:
         request_kwargs['logger'] = logger
+    return request_kwargs
+
+
+def scrap(urls, get_visited_links_function, add_article_function, request_kwargs=None, concurrency=None,
+          concurrency_per_host=None, parse_executor=None, http_cache=None, politeness=None, lean_extraction=False,
+          feeds=None, dedup=None, category_yields=None, journal=None, resume=False, redirects=None,
+          memory_budget=None, max_age=None, since=None):
+    """
+    Scrap a collection of magazines URLs and extract new articles for each one of them
+    Args:
+        urls: List of URLs to be scraped
+        get_visited_links_function: Callable that accepts only one URL and returns its already visited links, or a
+                                    visited.VisitedStore instance. Processed articles are recorded in the store
+        add_article_function: Callable that accepts a dictionary with an article information (at least 'source' and 'url' keys),
+                              or a sinks.ArticleSink instance to deliver articles in batches. Synchronous callables
+                              are called out of the event loop thread
+        request_kwargs: Dictionary with the common options available for a http_requests.async_request function.
+                        'timeout' (seconds) bounds every request, network.DEFAULT_TIMEOUT by default, None for
+                        no timeout
+        concurrency: Maximum number of requests in flight for the whole scraping process
+        concurrency_per_host: Maximum number of requests in flight to the same host
+        parse_executor: Where articles are parsed. None parses them in the event loop thread, 'process' or 'thread'
+                        use a pool sized to the CPU cores, and a concurrent.futures.Executor instance is used as is
+        http_cache: Directory (or httpcache.HTTPCache instance) where homepages and category pages are cached.
+                    They are then requested conditionally, and not parsed again if they have not changed
+        politeness: True, or a politeness.Politeness instance, to rate limit the requests to each host and
+                    honour its robots.txt
+        lean_extraction: Extract only the kept fields of the articles (title, text, description and date),
+                         instead of running the full newspaper parse. Faster, with the same results
+        feeds: True, a directory, or a feeds.FeedStore instance, to find new articles in the RSS/Atom feeds and
+               news sitemaps of the sources. Their categories are then walked only every 'walk_interval' seconds
+               of the store, unless they have no feeds
+        dedup: True, the path of a SQLite database, or a dedup.Deduplicator instance, to drop near-duplicate
+               articles (wire stories, syndicated copies...) before they reach add_article_function
+        category_yields: True, the path of a SQLite database, or a categories.CategoryYields instance, to track
+                         how many new articles each category brings and download the low-yield ones less often
+        journal: Path of a SQLite database, or a journal.CrawlJournal instance, where the progress of the run is
+                 checkpointed: the articles found for each source, the ones delivered and the sources finished
+        resume: Go on from the journal of an interrupted run, instead of starting a new one. Finished sources are
+                skipped, and only the articles not delivered yet are downloaded for the others
+        redirects: True, the path of a SQLite database, or a redirects.RedirectCache instance (as filled by
+                   find_redirection_urls), to request the homepages where the sources redirect to
+        memory_budget: True, a number of bytes, or a memory.MemoryBudget instance, to bound the article pages
+                       held in memory (new downloads wait while it is spent) and drop responses bigger than its
+                       maximum size. Articles are then delivered as compact memory.ArticleRecord mappings
+                       instead of dictionaries
+        max_age: Maximum age of the articles, in seconds or as a datetime.timedelta. Links whose URL is dated
+                 before the cutoff are dropped without being requested, and articles whose publish date is before
+                 it are abandoned once parsed. Both are counted in the stats ('stale_links', 'stale_articles')
+        since: Oldest publish date of the articles (datetime.date, datetime.datetime or 'YYYY-MM-DD' string),
+               handled as max_age. If both are given, the latest cutoff is used
+
+    Returns: stats.CrawlStats instance with the timings, counters and errors of the crawl
+
+    """
+    loop = get_valid_loop()
+
+    _check_scrap_functions(get_visited_links_function, add_article_function)
+    request_kwargs = _prepare_request_kwargs(request_kwargs)
+    min_date = get_min_date(max_age, since)
+    journal = open_journal(journal, resume)
 
-    loop.run_until_complete(
+    stats = CrawlStats()
+    parse_executor, own_executor = get_parse_executor(parse_executor)
+    try:
+        loop.run_until_complete(
+            process_sources(
+                urls, loop, get_visited_links_function, add_article_function,
+                concurrency=concurrency, concurrency_per_host=concurrency_per_host, parse_executor=parse_executor,
+                http_cache=get_http_cache(http_cache), politeness=get_politeness(politeness), stats=stats,
+                lean_extraction=lean_extraction, feed_store=get_feed_store(feeds), dedup=get_deduplicator(dedup),
+                category_yields=get_category_yields(category_yields), journal=journal,
+                redirect_cache=get_redirect_cache(redirects), memory_budget=get_memory_budget(memory_budget),
+                min_date=min_date, **request_kwargs))
+    finally:
+        if own_executor:
+            parse_executor.shutdown()
+    return stats.finish()
+
+
+async def scrap_stream(urls, get_visited_links_function, request_kwargs=None, concurrency=None,
+                       concurrency_per_host=None, parse_executor=None, http_cache=None, politeness=None,
+                       max_pending=100, stats=None, lean_extraction=False, feeds=None, dedup=None,
+                       category_yields=None, journal=None, resume=False, redirects=None, memory_budget=None,
+                       max_age=None, since=None):
+    """
+    Asynchronous generator version of scrap, to be used inside a running asyncio application.
+    Articles are yielded as soon as they are processed. Closing the generator, or cancelling the task consuming
+    it, stops the downloads in flight
+    Args:
+        urls: List of URLs to be scraped
+        get_visited_links_function: Same as in scrap
+        request_kwargs: Same as in scrap
+        concurrency: Same as in scrap
+        concurrency_per_host: Same as in scrap
+        parse_executor: Same as in scrap
+        http_cache: Same as in scrap
+        politeness: Same as in scrap
+        max_pending: Maximum number of processed articles waiting to be consumed. Downloads stop while it is
+                     reached
+        stats: stats.CrawlStats instance to be filled along the crawl
+        lean_extraction: Same as in scrap
+        feeds: Same as in scrap
+        dedup: Same as in scrap
+        category_yields: Same as in scrap
+        journal: Same as in scrap. Articles count as delivered once they are waiting to be consumed
+        resume: Same as in scrap
+        redirects: Same as in scrap
+        memory_budget: Same as in scrap
+        max_age: Same as in scrap
+        since: Same as in scrap
+
+    Returns: Asynchronous iterator of article dictionaries, like the ones received by scrap's add_article_function
+
+    >>> async for article in scrap_stream(urls, visited_store):
+    ...     await index(article)
+
+    """
+    _check_scrap_functions(get_visited_links_function, lambda article: None)
+    request_kwargs = _prepare_request_kwargs(request_kwargs)
+    min_date = get_min_date(max_age, since)
+    journal = open_journal(journal, resume)
+    loop = asyncio.get_event_loop()
+
+    articles = asyncio.Queue(maxsize=max_pending)
+    parse_executor, own_executor = get_parse_executor(parse_executor)
+    producer = asyncio.ensure_future(
         process_sources(
-            urls, loop, get_visited_links_function, add_article_function, **request_kwargs))
+            urls, loop, get_visited_links_function, ArticleSink(articles.put, max_pending=1),
+            concurrency=concurrency, concurrency_per_host=concurrency_per_host, parse_executor=parse_executor,
+            http_cache=get_http_cache(http_cache), politeness=get_politeness(politeness), stats=stats,
+            lean_extraction=lean_extraction, feed_store=get_feed_store(feeds), dedup=get_deduplicator(dedup),
+            category_yields=get_category_yields(category_yields), journal=journal,
+            redirect_cache=get_redirect_cache(redirects), memory_budget=get_memory_budget(memory_budget),
+            min_date=min_date, **request_kwargs))
+    getter = None
+    try:
+        while True:
+            getter = asyncio.ensure_future(articles.get())
+            done, _ = await asyncio.wait([getter, producer], return_when=asyncio.FIRST_COMPLETED)
+            if getter in done:
+                yield getter.result()
+                continue
+            getter.cancel()
+            # Every article is already in the queue once the producer has finished
+            while not articles.empty():
+                yield articles.get_nowait()
+            producer.result()
+            return
+    finally:
+        if getter is not None:
+            getter.cancel()
+        if not producer.done():
+            producer.cancel()
+            await asyncio.gather(producer, return_exceptions=True)
+        if own_executor:
+            parse_executor.shutdown(wait=False)
+
+
+async def survey_sources(urls, request_kwargs=None, concurrency=None, concurrency_per_host=None, max_sources=None,
+                         http_cache=None, politeness=None, redirects=None, stats=None):
+    """
+    Asynchronous generator that finds the current article links of many sources, through the same pipeline as a
+    crawl (homepage, categories, classification), without downloading any article. Sources are surveyed
+    concurrently, and every result is yielded as soon as its source is done
+    Args:
+        urls: List of URLs of the sources
+        request_kwargs: Same as in scrap
+        concurrency: Same as in scrap
+        concurrency_per_host: Same as in scrap
+        max_sources: Maximum number of sources surveyed at the same time. Defaults to DEFAULT_SURVEY_SOURCES
+        http_cache: Same as in scrap
+        politeness: Same as in scrap
+        redirects: Same as in scrap
+        stats: stats.CrawlStats instance to be filled along the survey
+
+    Returns: Asynchronous iterator of dictionaries with 'url', 'article_urls' (every valid article link found,
+             visited or not), 'seconds', 'stages' (seconds spent in each stage) and 'error' (reason of the failure,
+             or None) keys
+
+    >>> async for result in survey_sources(urls, max_sources=50):
+    ...     print(result['url'], len(result['article_urls']), result['error'])
+
+    """
+    request_kwargs = _prepare_request_kwargs(request_kwargs)
+    loop = asyncio.get_event_loop()
+    concurrency = concurrency or DEFAULT_CONCURRENCY
+    concurrency_per_host = concurrency_per_host or DEFAULT_CONCURRENCY_PER_HOST
+    stats = stats if stats is not None else CrawlStats()
+    http_cache = get_http_cache(http_cache)
+    redirect_cache = get_redirect_cache(redirects)
+    # Nothing is visited, so every link found is kept
+    visited_store = MemoryVisitedStore()
+    slots = asyncio.Semaphore(max_sources or DEFAULT_SURVEY_SOURCES)
+
+    async with create_client(loop=loop, connections_limit=concurrency,
+                             connections_limit_per_host=concurrency_per_host) as client:
+        downloader = Downloader(client, concurrency, concurrency_per_host, get_politeness(politeness), stats)
+
+        async def survey(url):
+            async with slots:
+                start = time.perf_counter()
+                _, article_urls = await _define_magazine(url, downloader, visited_store, loop, http_cache,
+                                                         redirect_cache=redirect_cache, **request_kwargs)
+                seconds = time.perf_counter() - start
+            source = stats.source(url)
+            return {
+                "url": url,
+                "article_urls": article_urls,
+                "seconds": seconds,
+                "stages": {stage: s.seconds for stage, s in source.stages.items()},
+                "error": source.last_error,
+            }
+
+        tasks = [asyncio.ensure_future(survey(url)) for url in urls]
+        try:
+            for next_result in asyncio.as_completed(tasks):
+                yield await next_result
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def _survey_one(url, request_kwargs):
+    return [result async for result in survey_sources([url], request_kwargs)][0]
 
 
 def source_current_state(url, proxy):
-    response = sync_request(url=url, method='get', proxy_cfg=format_proxy(proxy), kwargs={"logger": logger})
-    if response is None:
+    """
+    Current article links of a source, visited or not
+    Returns: Tuple (url, article links), or None if they could not be found
+    """
+    result = get_valid_loop().run_until_complete(_survey_one(url, {'proxy': proxy}))
+    if result["error"] is not None:
+        logger.warning("source_current_state:: {}: {}".format(url, result["error"]))
         return
-    logger.info(f"URL '{url}' successfully verified")
-    html = response.text
-    real_url = response.http_response.url.strip("/") + "/"
-
-    magazine = newspaper.build(real_url, dry=True, config=construct_config(proxy))
-    magazine.html = html
-    magazine.parse()
-
-    magazine.set_categories()
-
-    for cat in magazine.categories:
-        if cat.url[-1] != "/":
-            cat.url += "/"
-    if real_url not in [c.url for c in magazine.categories]:
-        magazine.categories.append(Category(url=real_url))
-    magazine.download_categories()
-    magazine.parse_categories()
-    # magazine.generate_articles()
-    articles_urls = list(set(categories_to_articles(magazine)))
-    logger.info(f"{len(articles_urls)} new articles to be added for source {url}")
-    return url, articles_urls
+    logger.info(f"{len(result['article_urls'])} new articles to be added for source {url}")
+    return url, result["article_urls"]
 
 
 # source_url, articles_list = await _define_magazine(url, client, get_visited_links_function, loop, **request_kwargs)
@@ -6,7 +6,7 @@ setup(
     author="Jose Alberto Varona Labrada",
     author_email="jovalab92@gmail.com",
     description="News site monitoring library",
-    python_requires=">=3.6",
+    python_requires=">=3.7",
     url="https://github.com/JoseVL92/newscrawler",
     download_url="https://github.com/JoseVL92/newscrawler/archive/refs/tags/v0.1.tar.gz",
     packages=find_packages(),
@@ -18,7 +18,6 @@ setup(
         'Development Status :: 3 - Alpha',
         'License :: OSI Approved :: MIT License',
         'Programming Language :: Python :: 3',
-        'Programming Language :: Python :: 3.6',
         'Programming Language :: Python :: 3.7',
         'Programming Language :: Python :: 3.8',
         'Programming Language :: Python :: 3.9',
@@ -0,0 +1,27 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+from fixture_server import FixtureServer, make_corpus
+
+
+@pytest.fixture
+def corpus(tmp_path):
+    """
+    Directory of a small synthetic corpus: 2 sites, with 2 categories of 3 articles each
+    """
+    directory = str(tmp_path / "corpus")
+    os.mkdir(directory)
+    make_corpus(directory, sites=2, categories=2, articles=3)
+    return directory
+
+
+@pytest.fixture
+def server(corpus):
+    with FixtureServer(corpus) as fixture_server:
+        yield fixture_server
@@ -0,0 +1,19 @@
+import asyncio
+
+from newscrawler.crawler import Crawler
+from newscrawler.visited import MemoryVisitedStore
+
+
+def test_crawl_leaves_the_event_loop(server):
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    try:
+        articles = []
+        with Crawler(MemoryVisitedStore(), articles.append) as crawler:
+            stats = crawler.crawl(list(server.urls.values()))
+            assert asyncio.get_event_loop() is loop
+        assert stats.articles_processed == 12
+        assert len(articles) == 12
+    finally:
+        asyncio.set_event_loop(None)
+        loop.close()
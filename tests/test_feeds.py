@@ -0,0 +1,55 @@
+import os
+
+import pytest
+
+from fixture_server import FixtureServer, make_corpus
+
+from newscrawler.feeds import FeedStore
+from newscrawler.visited import MemoryVisitedStore
+from newscrawler.webcrawler import scrap
+
+
+@pytest.fixture
+def feed_server(tmp_path):
+    corpus = str(tmp_path / "corpus")
+    make_corpus(corpus, sites=1, categories=2, articles=3, feeds=True)
+    root = os.path.join(corpus, "site00")
+    category = sorted(name for name in os.listdir(root) if os.path.isdir(os.path.join(root, name)))[0]
+    # An off-site article and a category page, which the category walk would not take as articles
+    extra = ("<item><title>Elsewhere</title><link>http://elsewhere.example.com/2020/01/01/"
+             "an-article-of-another-site-entirely.html</link></item>"
+             "<item><title>Category</title><link>/{}/</link></item>").format(category)
+    feed_path = os.path.join(root, "feed.xml")
+    with open(feed_path) as f:
+        feed = f.read()
+    with open(feed_path, "w") as f:
+        f.write(feed.replace("</channel>", extra + "</channel>"))
+    with FixtureServer(corpus) as server:
+        yield server
+
+
+def test_feed_links_are_classified(feed_server):
+    url = feed_server.urls["site00"]
+    articles = []
+    stats = scrap([url], MemoryVisitedStore(), articles.append, feeds=True)
+    assert stats.articles_found == 6
+    assert len(articles) == 6
+
+
+def test_feed_discovery_reuses_the_homepage(feed_server):
+    url = feed_server.urls["site00"]
+    scrap([url], MemoryVisitedStore(), lambda article: None)
+    without_feeds = [path for _, _, path in feed_server.requests].count("/")
+    del feed_server.requests[:]
+    scrap([url], MemoryVisitedStore(), lambda article: None, feeds=True)
+    assert [path for _, _, path in feed_server.requests].count("/") == without_feeds
+
+
+def test_feed_links_are_classified_between_walks(feed_server, tmp_path):
+    url = feed_server.urls["site00"]
+    feed_store = FeedStore()
+    http_cache = str(tmp_path / "cache")
+    scrap([url], MemoryVisitedStore(), lambda article: None, feeds=feed_store, http_cache=http_cache)
+    # The categories are not walked again, only the feeds are read
+    stats = scrap([url], MemoryVisitedStore(), lambda article: None, feeds=feed_store, http_cache=http_cache)
+    assert stats.articles_found == 2
@@ -0,0 +1,31 @@
+import os
+
+from newscrawler.httpcache import HTTPCache
+from newscrawler.redirects import RedirectCache
+from newscrawler.visited import MemoryVisitedStore
+from newscrawler.webcrawler import scrap
+
+
+class RecordingCache(HTTPCache):
+    def __init__(self, directory):
+        HTTPCache.__init__(self, directory)
+        self.homepages = []
+
+    async def fetch(self, downloader, url, kind='page', cache_key=None, **request_kwargs):
+        response, data = await HTTPCache.fetch(self, downloader, url, kind, cache_key, **request_kwargs)
+        if kind == 'source':
+            self.homepages.append((url, data is not None))
+        return response, data
+
+
+def test_homepage_cached_with_redirects(corpus, server, tmp_path):
+    # Directories requested without their trailing slash are redirected
+    category = sorted(os.listdir(os.path.join(corpus, "site00")))[0]
+    source = server.urls["site00"] + category
+    http_cache = RecordingCache(str(tmp_path / "cache"))
+    redirects = RedirectCache()
+
+    scrap([source], MemoryVisitedStore(), lambda article: None, http_cache=http_cache, redirects=redirects)
+    scrap([source], MemoryVisitedStore(), lambda article: None, http_cache=http_cache, redirects=redirects)
+
+    assert http_cache.homepages == [(source, False), (source + "/", True)]
@@ -0,0 +1,13 @@
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_import_is_lazy():
+    # Heavy dependencies are only imported by the modules that need them, on first use
+    code = ("import sys, newscrawler; "
+            "print(','.join(m for m in ('newspaper', 'aiohttp', 'tldextract') if m in sys.modules))")
+    result = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == ""
@@ -0,0 +1,40 @@
+from newscrawler.journal import CrawlJournal
+from newscrawler.visited import MemoryVisitedStore
+from newscrawler.webcrawler import scrap
+
+
+def test_resume_after_sink_failure(server, tmp_path):
+    urls = list(server.urls.values())
+    journal = str(tmp_path / "journal.db")
+
+    def failing_sink(article):
+        raise IOError("storage is down")
+
+    scrap(urls, MemoryVisitedStore(), failing_sink, journal=journal)
+    check = CrawlJournal(journal)
+    pending = sum(len(check.pending(url)) for url in urls)
+    delivered = sum(len(check.delivered(url)) for url in urls)
+    check.close()
+    assert pending == 12
+    assert delivered == 0
+
+    articles = []
+    scrap(urls, MemoryVisitedStore(), articles.append, journal=journal, resume=True)
+    assert len({article["url"] for article in articles}) == 12
+
+
+def test_failed_source_is_not_finished(server, tmp_path):
+    # Nothing listens on port 1: its homepage can not be downloaded
+    unreachable = "http://127.0.0.1:1/"
+    urls = list(server.urls.values())
+    journal = str(tmp_path / "journal.db")
+
+    articles = []
+    scrap(urls + [unreachable], MemoryVisitedStore(), articles.append, journal=journal)
+    assert len(articles) == 12
+    check = CrawlJournal(journal)
+    assert check.failed_sources() == {unreachable}
+    assert check.finished_sources() == set(urls)
+    # On resume, its articles are looked for again
+    assert check.pending(unreachable) is None
+    check.close()
@@ -0,0 +1,40 @@
+import tracemalloc
+
+import pytest
+
+from fixture_server import FixtureServer, make_corpus
+
+from newscrawler.memory import MemoryBudget
+from newscrawler.visited import MemoryVisitedStore
+from newscrawler.webcrawler import scrap
+
+KB = 1024
+MB = 1024 * KB
+PAGE_PADDING = 200 * KB
+# A crawl keeping every page (or its DOM) would need more than PAGE_PADDING per article
+MAX_PEAK_PER_ARTICLE = 64 * KB
+
+
+@pytest.fixture
+def padded_server(tmp_path):
+    corpus = str(tmp_path / "padded")
+    make_corpus(corpus, sites=1, categories=2, articles=40, page_padding=PAGE_PADDING)
+    with FixtureServer(corpus) as server:
+        yield server
+
+
+def test_peak_memory_per_article(server, padded_server):
+    # Lazy imports and caches are filled first, so only the crawl is measured
+    scrap(list(server.urls.values()), MemoryVisitedStore(), lambda article: None, lean_extraction=True)
+
+    budget = MemoryBudget(4 * MB)
+    articles = []
+    tracemalloc.start()
+    try:
+        scrap(list(padded_server.urls.values()), MemoryVisitedStore(), lambda article: articles.append(article["url"]),
+              lean_extraction=True, memory_budget=budget)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    assert len(articles) >= 60
+    assert peak / len(articles) < MAX_PEAK_PER_ARTICLE
@@ -0,0 +1,43 @@
+import threading
+import time
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from newscrawler import network
+from newscrawler.visited import MemoryVisitedStore
+from newscrawler.webcrawler import scrap
+
+
+class _StalledHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        time.sleep(self.server.stall)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def stalled_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _StalledHandler)
+    server.daemon_threads = True
+    server.stall = 10
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield "http://127.0.0.1:%d/" % server.server_address[1]
+    server.shutdown()
+    server.server_close()
+
+
+def test_stalled_server_times_out(stalled_server):
+    start = time.perf_counter()
+    stats = scrap([stalled_server], MemoryVisitedStore(), lambda article: None, request_kwargs={"timeout": 0.5})
+    assert time.perf_counter() - start < 5
+    assert stats.errors.get("homepage") == 1
+
+
+def test_default_timeout(stalled_server, monkeypatch):
+    monkeypatch.setattr(network, "DEFAULT_TIMEOUT", 0.5)
+    start = time.perf_counter()
+    scrap([stalled_server], MemoryVisitedStore(), lambda article: None)
+    assert time.perf_counter() - start < 5
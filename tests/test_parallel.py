@@ -0,0 +1,66 @@
+import asyncio
+import gc
+import multiprocessing
+import multiprocessing.queues
+import queue
+import time
+import types
+
+from newscrawler import parallel
+from newscrawler.visited import MemoryVisitedStore
+
+
+class LateQueue(multiprocessing.queues.Queue):
+    """
+    Queue whose first read times out once every worker has exited, as if their last items had arrived right after
+    """
+
+    def __init__(self, maxsize, ctx):
+        multiprocessing.queues.Queue.__init__(self, maxsize, ctx=ctx)
+        self.late = True
+
+    def get(self, block=True, timeout=None):
+        if self.late and block:
+            self.late = False
+            while multiprocessing.active_children():
+                time.sleep(0.05)
+            raise queue.Empty
+        return multiprocessing.queues.Queue.get(self, block, timeout)
+
+
+def _discard_sink():
+    return lambda article: None
+
+
+def _collecting_sink():
+    # Anything the worker dropped from the parent is collected, and closed, now
+    gc.collect()
+    return lambda article: None
+
+
+def test_items_of_exited_workers_are_not_lost(server, monkeypatch):
+    context = multiprocessing.get_context('fork')
+    late_context = types.SimpleNamespace(Process=context.Process,
+                                         Queue=lambda maxsize: LateQueue(maxsize, ctx=context))
+    monkeypatch.setattr(parallel, 'multiprocessing', types.SimpleNamespace(get_context=lambda method: late_context))
+
+    stats = parallel.scrap_parallel(list(server.urls.values()), MemoryVisitedStore(), sink_factory=_discard_sink,
+                                    workers=2)
+    assert 'worker' not in stats.errors
+    assert stats.articles_processed == 12
+
+
+def test_parent_loop_works_after_forked_workers(server):
+    # Only the current event loop refers to the loop, as when a previous scrap created it
+    asyncio.set_event_loop(asyncio.new_event_loop())
+    try:
+        parallel.scrap_parallel(list(server.urls.values()), MemoryVisitedStore(), sink_factory=_collecting_sink,
+                                workers=2, start_method='fork')
+        loop = asyncio.get_event_loop()
+        # The wakeup of the loop comes through its self-pipe, which the workers must leave registered
+        start = time.perf_counter()
+        loop.run_until_complete(asyncio.wait_for(loop.run_in_executor(None, time.sleep, 0.1), 2))
+        assert time.perf_counter() - start < 1
+    finally:
+        asyncio.get_event_loop().close()
+        asyncio.set_event_loop(None)
@@ -0,0 +1,32 @@
+import glob
+import os
+import random
+
+import pytest
+
+from bench_lean_extraction import make_article
+
+from newscrawler.parsing import parse_article
+
+
+def _corpus_articles(corpus):
+    for path in sorted(glob.glob(os.path.join(corpus, "*", "*", "*", "*", "*", "*.html"))):
+        site, relative = os.path.relpath(path, corpus).split(os.sep, 1)
+        with open(path, encoding="utf-8") as f:
+            yield "http://{}.example.com/{}".format(site, relative.replace(os.sep, "/")), f.read()
+
+
+def test_lean_extraction_parity_on_the_corpus(corpus):
+    articles = list(_corpus_articles(corpus))
+    assert len(articles) == 12
+    for url, html in articles:
+        source_url = "/".join(url.split("/", 3)[:3]) + "/"
+        assert parse_article(url, html, source_url, lean=True) == parse_article(url, html, source_url)
+
+
+@pytest.mark.parametrize("index", range(40))
+def test_lean_extraction_parity(index):
+    # English and Spanish articles, with and without metadata, one after the other
+    url, html = make_article(random.Random(index), index)
+    source_url = "https://www.example-news.com/"
+    assert parse_article(url, html, source_url, lean=True) == parse_article(url, html, source_url)
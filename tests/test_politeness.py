@@ -0,0 +1,71 @@
+import asyncio
+import threading
+import time
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import aiohttp
+import pytest
+
+from newscrawler.network import Downloader
+from newscrawler.politeness import RobotsCache
+
+
+class _RobotsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        status, body = self.server.robots
+        self.send_response(status)
+        self.send_header("Content-Type", "text/html" if status >= 400 else "text/plain")
+        self.end_headers()
+        self.wfile.write(body.encode("utf-8"))
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def robots_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _RobotsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _load(url):
+    async def load():
+        async with aiohttp.ClientSession() as client:
+            cache = RobotsCache(ttl=3600, failure_ttl=60)
+            parser = await cache.get(url, Downloader(client))
+            expires = next(iter(cache._entries.values()))[0]
+            return parser.can_fetch("*", url + "section/article.html"), expires - time.monotonic()
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(load())
+    finally:
+        loop.close()
+
+
+@pytest.mark.parametrize("status, body, allowed, ttl", [
+    (200, "User-agent: *\nDisallow: /section/\n", False, 3600),
+    (200, "User-agent: *\nDisallow: /private/\n", True, 3600),
+    # An HTML error page is not read as rules
+    (401, "<html><body>Unauthorized</body></html>", False, 3600),
+    (403, "<html><body>Forbidden</body></html>", False, 3600),
+    (404, "<html><body>Not found</body></html>", True, 3600),
+    (500, "<html><body>Internal error</body></html>", False, 60),
+    (503, "<html><body>Unavailable</body></html>", False, 60),
+])
+def test_robots_status(robots_server, status, body, allowed, ttl):
+    robots_server.robots = status, body
+    can_fetch, expires = _load("http://127.0.0.1:%d/" % robots_server.server_address[1])
+    assert can_fetch == allowed
+    assert ttl - 5 < expires <= ttl
+
+
+def test_robots_download_failure():
+    # Nothing listens on port 1
+    can_fetch, expires = _load("http://127.0.0.1:1/")
+    assert can_fetch
+    assert expires <= 60
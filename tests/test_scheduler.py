@@ -0,0 +1,32 @@
+import asyncio
+import time
+
+from fixture_server import FixtureServer
+
+from newscrawler.scheduler import RecrawlScheduler
+from newscrawler.visited import MemoryVisitedStore
+
+
+def test_duration_with_every_slot_busy(corpus):
+    with FixtureServer(corpus, latency=1.0) as server:
+        scheduler = RecrawlScheduler(MemoryVisitedStore(), lambda article: None, max_sources=1)
+        for url in server.urls.values():
+            scheduler.add_source(url)
+        start = time.perf_counter()
+        scheduler.run_forever(duration=0.2)
+        assert time.perf_counter() - start < 1.0
+
+
+def test_duration_of_a_previous_run_does_not_stop_the_next():
+    scheduler = RecrawlScheduler(MemoryVisitedStore(), lambda article: None)
+    loop = asyncio.new_event_loop()
+    try:
+        # Stopped before its duration
+        loop.call_later(0.1, scheduler.stop)
+        loop.run_until_complete(scheduler.run(duration=0.5))
+        loop.call_later(1.0, scheduler.stop)
+        start = time.perf_counter()
+        loop.run_until_complete(scheduler.run())
+        assert time.perf_counter() - start >= 0.9
+    finally:
+        loop.close()
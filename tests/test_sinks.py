@@ -0,0 +1,20 @@
+from newscrawler.visited import MemoryVisitedStore
+from newscrawler.webcrawler import scrap
+
+
+def test_failed_deliveries_are_not_visited(server):
+    urls = list(server.urls.values())
+    visited = MemoryVisitedStore()
+
+    def failing_sink(article):
+        raise IOError("storage is down")
+
+    stats = scrap(urls, visited, failing_sink)
+    assert stats.articles_processed == 0
+    assert all(not list(visited.iter_visited(url)) for url in urls)
+
+    articles = []
+    stats = scrap(urls, visited, articles.append)
+    assert stats.articles_processed == 12
+    assert len({article["url"] for article in articles}) == 12
+    assert sum(len(list(visited.iter_visited(url))) for url in urls) == 12